@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# aat_admission.py
+"""
+AAT热层准入控制（TinyLFU风格）
+用计数草图(count-min sketch)估计访问频率，热层放不下时，
+候选对象必须比它将要挤出的每一个受害者都更热才允许写入，
+避免一次性的大检查点读取把大量小而热的层挤出Redis；
+多个命名空间共享热层时按配额与公平份额挑选受害者，一个租户不能挤光其他租户的热数据
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from aat_namespaces import display_name, namespace_of
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-Admission")
+
+
+class CountMinSketch:
+    """计数草图 - 饱和8位计数器，累计到采样窗口后整体减半实现老化"""
+
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.uint8)
+        self.sample_size = 10 * width
+        self.additions = 0
+
+    def _indexes(self, key):
+        return [hash((row, key)) % self.width for row in range(self.depth)]
+
+    def increment(self, key):
+        """记录一次访问"""
+        for row, index in enumerate(self._indexes(key)):
+            if self.table[row, index] < 255:
+                self.table[row, index] += 1
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table >>= 1
+            self.additions //= 2
+
+    def estimate(self, key):
+        """估计访问频率"""
+        return int(min(self.table[row, index] for row, index in enumerate(self._indexes(key))))
+
+
+class HotTierAdmission:
+    """热层准入 - 频率草图 + 按大小挑选受害者比较 + Redis内存用量核算"""
+
+    def __init__(self, capacity_bytes, ttl, memory_info=None, sketch_width=4096, sketch_depth=4,
+                 max_object_fraction=0.25, info_refresh_interval=5.0,
+                 quotas=None, default_quota=0, fair_share=True):
+        self.capacity_bytes = capacity_bytes
+        self.ttl = ttl
+        self.max_object_fraction = max_object_fraction
+        self.sketch = CountMinSketch(sketch_width, sketch_depth)
+
+        # 读取Redis INFO memory的回调，返回dict；只用来按未跟踪的占用调低有效容量，不可用时按配置预算核算
+        self.memory_info = memory_info
+        self.info_refresh_interval = info_refresh_interval
+        self.redis_used_bytes = None
+        self.redis_max_bytes = 0
+        self.last_info_time = 0
+
+        # 命名空间 -> 热层字节配额（0表示不设配额）；超出公平份额的命名空间优先被挤出
+        self.quotas = dict(quotas or {})
+        self.default_quota = default_quota
+        self.fair_share = fair_share
+
+        # 热层驻留对象：文件名 -> (大小, 过期时间)，末尾为最近写入/访问
+        self.resident = OrderedDict()
+        self.resident_bytes = 0
+        self.namespace_bytes = {}
+        self.bytes_since_info = 0
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'admitted': 0,
+            'rejected': 0,
+            'rejected_too_large': 0,
+            'rejected_quota': 0,
+            'victims': 0
+        }
+
+    def record_access(self, filename):
+        """记录访问（包括命中），热层驻留对象同时刷新LRU位置"""
+        with self.lock:
+            self.sketch.increment(filename)
+            if filename in self.resident:
+                self.resident.move_to_end(filename)
+
+    def _refresh_memory_info(self):
+        """按间隔从Redis刷新内存用量"""
+        now = time.time()
+        if self.memory_info is None or now - self.last_info_time < self.info_refresh_interval:
+            return
+
+        self.last_info_time = now
+        try:
+            info = self.memory_info()
+            self.redis_used_bytes = info['used_memory']
+            self.redis_max_bytes = info.get('maxmemory', 0)
+            self.bytes_since_info = 0
+        except Exception as e:
+            logger.debug(f"Redis内存信息不可用，按跟踪字节核算: {e}")
+            self.redis_used_bytes = None
+
+    def _expire(self):
+        """清理已按TTL过期的驻留记录"""
+        now = time.time()
+        for filename in [f for f, (_, expires) in self.resident.items() if expires <= now]:
+            self._forget(filename)
+
+    def _forget(self, filename):
+        """移除驻留记录，返回其大小（持锁调用）"""
+        old = self.resident.pop(filename, None)
+        if old is None:
+            return None
+        self.resident_bytes -= old[0]
+        namespace = namespace_of(filename)
+        self.namespace_bytes[namespace] -= old[0]
+        if not self.namespace_bytes[namespace]:
+            del self.namespace_bytes[namespace]
+        return old[0]
+
+    def quota_of(self, namespace):
+        """命名空间的热层配额，0表示不设配额"""
+        return self.quotas.get(namespace, self.default_quota)
+
+    def _share_of(self, namespace, capacity, active):
+        """命名空间的公平份额：有配额按配额，否则在活跃命名空间间均分容量"""
+        return self.quota_of(namespace) or capacity / max(len(active), 1)
+
+    def budget(self):
+        """配置预算与Redis maxmemory取小（判定过大对象用）"""
+        if self.redis_max_bytes:
+            return min(self.capacity_bytes, self.redis_max_bytes)
+        return self.capacity_bytes
+
+    def untracked_bytes(self):
+        """Redis中不属于已跟踪对象的占用（其他数据、重启前写入的对象等），未知为0"""
+        if self.redis_used_bytes is None:
+            return 0
+        return max(0, self.redis_used_bytes + self.bytes_since_info - self.resident_bytes)
+
+    def capacity(self):
+        """有效容量：配置了maxmemory时，扣除未跟踪的占用后与预算取小"""
+        if self.redis_max_bytes:
+            return max(0, min(self.capacity_bytes, self.redis_max_bytes - self.untracked_bytes()))
+        return self.capacity_bytes
+
+    def used_bytes(self):
+        """已跟踪的热层对象字节"""
+        return self.resident_bytes
+
+    def admit(self, filename, size, pinned=False):
+        """准入判定，返回 (是否写入, 需要先挤出的受害者列表)
+
+        pinned 用于显式要求常驻热层的写入（keep_hot）：不与受害者比较频率，仍受大小上限、配额与容量约束；
+        已驻留对象增长（流式写入的后续批次）不重复计入 admitted
+        """
+        with self.lock:
+            self._refresh_memory_info()
+            self._expire()
+
+            capacity = self.capacity()
+            if size > self.budget() * self.max_object_fraction:
+                self.stats['rejected'] += 1
+                self.stats['rejected_too_large'] += 1
+                logger.info(f"✗ 热层拒绝过大对象: {filename} ({size / 1024 / 1024:.2f}MB)")
+                return False, []
+
+            # 已驻留的旧版本会被覆盖，不重复计算
+            current = self.resident.get(filename, (0, 0))[0]
+            namespace = namespace_of(filename)
+            candidate_freq = float('inf') if pinned else self.sketch.estimate(filename)
+
+            # 1. 命名空间配额：超出时只能挤出本命名空间的对象
+            victims = []
+            quota = self.quota_of(namespace)
+            if quota:
+                if size > quota:
+                    self.stats['rejected'] += 1
+                    self.stats['rejected_quota'] += 1
+                    logger.info(f"✗ 热层拒绝: {filename} 超过命名空间 {display_name(namespace)} 的配额")
+                    return False, []
+                namespace_overflow = self.namespace_bytes.get(namespace, 0) - current + size - quota
+                if namespace_overflow > 0:
+                    victims = self._select_victims(
+                        filename, candidate_freq, namespace_overflow,
+                        [lambda victim_namespace: victim_namespace == namespace])
+                    if victims is None:
+                        self.stats['rejected'] += 1
+                        self.stats['rejected_quota'] += 1
+                        return False, []
+
+            # 2. 总容量：优先挤出超出公平份额的命名空间，自身超出份额时只能挤出自己的对象；
+            # 受害者只能来自已跟踪的对象，超出它们所能腾出的部分（未跟踪的占用）交给Redis maxmemory淘汰
+            freed = sum(self.resident[victim][0] for victim in victims)
+            overflow = min(self.used_bytes() - current + size - capacity, self.used_bytes() - current) - freed
+            if overflow > 0:
+                more = self._select_victims(
+                    filename, candidate_freq, overflow, self._victim_order(namespace, size - current, capacity),
+                    exclude=set(victims))
+                if more is None:
+                    self.stats['rejected'] += 1
+                    return False, []
+                victims += more
+
+            if not current:
+                self.stats['admitted'] += 1
+            if victims:
+                self.stats['victims'] += len(victims)
+                reason = 'keep_hot' if pinned else f"频率 {candidate_freq}"
+                logger.info(f"✓ 热层准入: {filename} ({reason}), 挤出 {len(victims)} 个对象")
+            return True, victims
+
+    def _victim_order(self, namespace, growth, capacity):
+        """受害者的挑选顺序：依次尝试的命名空间条件列表"""
+        if not self.fair_share:
+            return [lambda victim_namespace: True]
+
+        active = set(self.namespace_bytes) | {namespace}
+        projected = self.namespace_bytes.get(namespace, 0) + growth
+        if len(active) > 1 and projected > self._share_of(namespace, capacity, active):
+            # 候选所在命名空间已超出份额：只能挤出自己的对象
+            return [lambda victim_namespace: victim_namespace == namespace]
+
+        over_share = {
+            other for other in active
+            if self.namespace_bytes.get(other, 0) > self._share_of(other, capacity, active)}
+        return [lambda victim_namespace: victim_namespace in over_share,
+                lambda victim_namespace: victim_namespace not in over_share]
+
+    def _select_victims(self, filename, candidate_freq, needed, passes, exclude=()):
+        """按条件顺序从LRU端挑选受害者直到腾出 needed 字节，候选必须比每个受害者都更热；
+        腾不出足够空间返回None（持锁调用）"""
+        victims, freed = [], 0
+        for accept in passes:
+            for victim, (victim_size, _) in self.resident.items():
+                if freed >= needed:
+                    return victims
+                if victim == filename or victim in exclude or victim in victims:
+                    continue
+                if not accept(namespace_of(victim)):
+                    continue
+                if self.sketch.estimate(victim) >= candidate_freq:
+                    logger.debug(f"✗ 热层拒绝: {filename} (频率 {candidate_freq}) 不热于受害者 {victim}")
+                    return None
+                victims.append(victim)
+                freed += victim_size
+        return victims if freed >= needed else None
+
+    def on_insert(self, filename, size):
+        """对象已写入热层"""
+        with self.lock:
+            self._forget(filename)
+            self.resident[filename] = (size, time.time() + self.ttl)
+            self.resident_bytes += size
+            namespace = namespace_of(filename)
+            self.namespace_bytes[namespace] = self.namespace_bytes.get(namespace, 0) + size
+            self.bytes_since_info += size
+
+    def on_evict(self, filename):
+        """对象已从热层移除"""
+        with self.lock:
+            size = self._forget(filename)
+            if size is not None:
+                self.bytes_since_info -= size
+
+    def get_stats(self):
+        """获取准入统计"""
+        decisions = self.stats['admitted'] + self.stats['rejected']
+        return {
+            **self.stats,
+            'admission_rate': self.stats['admitted'] / decisions if decisions > 0 else 0,
+            'resident_objects': len(self.resident),
+            'resident_bytes': self.resident_bytes,
+            'used_bytes': self.used_bytes(),
+            'untracked_bytes': self.untracked_bytes(),
+            'capacity_bytes': self.capacity(),
+            'namespaces': self.get_namespace_stats()
+        }
+
+    def get_namespace_stats(self):
+        """各命名空间的热层用量与配额"""
+        with self.lock:
+            namespaces = set(self.namespace_bytes) | set(self.quotas)
+            return {
+                display_name(namespace): {
+                    'resident_bytes': self.namespace_bytes.get(namespace, 0),
+                    'quota_bytes': self.quota_of(namespace)
+                }
+                for namespace in sorted(namespaces)
+            }
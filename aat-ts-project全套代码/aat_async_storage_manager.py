@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# aat_async_storage_manager.py
+"""
+AAT异步存储管理器
+热层读写走 redis.asyncio，MinIO/本地模型加载等阻塞调用交给有界线程池，
+单个事件循环即可同时保持数百个张量读取在途，而不必每个请求占用一个线程
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from aat_storage_manager_v2 import AATStorageManagerV2
+from aat_semantic_prefetcher import AsyncSemanticPrefetcher
+from aat_strategy_engine import StorageTier
+from aat_hot_shards import AsyncShardedRedisClient, parse_endpoint
+from aat_tier_backends import AsyncKeyValueClient
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-AsyncStorageManager")
+
+
+class AsyncAATStorageManager:
+    """异步存储管理器 - 复用同步管理器的策略、缓存与分块布局，只替换IO路径"""
+
+    def __init__(self, manager=None, config_path="aat_strategy_config.yaml"):
+        self.manager = manager or AATStorageManagerV2(config_path)
+        config = self.manager.strategy_engine.config
+
+        # 阻塞调用的有界线程池
+        self.executor = ThreadPoolExecutor(
+            max_workers=config['async_io']['max_workers'],
+            thread_name_prefix="aat-async")
+
+        # 异步Redis客户端 - 连接按需建立，与同步管理器共享Redis熔断器：
+        # 同步客户端不可用或已熔断时热层直接视为未命中
+        # 阻塞式连接池：在途请求超过连接数时排队等待，而不是报错
+        # 热层配置为进程内后端时使用同一后端的异步外观；分片时与同步客户端共享哈希环
+        if self.manager.hot_backend is not None:
+            self.redis_client = AsyncKeyValueClient(self.manager.hot_backend)
+        elif self.manager.hot_ring is not None:
+            self.redis_client = AsyncShardedRedisClient(
+                self.manager.hot_ring, lambda endpoint: self._connect_redis(*parse_endpoint(endpoint)))
+        else:
+            redis_config = config['connections']['redis']
+            self.redis_client = self._connect_redis(redis_config['host'], redis_config['port'])
+        self.redis_breaker = self.manager.redis_breaker
+
+        self.prefetcher = AsyncSemanticPrefetcher(
+            self, self.manager.prefetcher,
+            max_concurrent=config['prefetch']['max_concurrent'])
+
+        logger.info(f"AAT异步存储管理器初始化完成 - 线程池上限: {config['async_io']['max_workers']}")
+
+    def _connect_redis(self, host, port):
+        """单个Redis实例的异步客户端（阻塞式连接池）"""
+        from redis import asyncio as aioredis
+
+        config = self.manager.strategy_engine.config
+        redis_config = config['connections']['redis']
+        pool = aioredis.BlockingConnectionPool(
+            host=host, port=port, db=redis_config['db'],
+            max_connections=config['async_io']['max_connections'],
+            socket_timeout=redis_config['socket_timeout'],
+            socket_connect_timeout=redis_config['connect_timeout'],
+            socket_keepalive=True,
+            health_check_interval=redis_config['health_check_interval'],
+            decode_responses=False
+        )
+        return aioredis.Redis(connection_pool=pool)
+
+    async def run_blocking(self, func, *args):
+        """在有界线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def aget_data(self, filename, size=0, offset=0, as_numpy=False, dtype=np.uint8):
+        """异步数据获取"""
+        return (await self.aget_many([(filename, size, offset)], as_numpy, dtype))[0]
+
+    async def aget_many(self, requests, as_numpy=False, dtype=np.uint8):
+        """异步批量数据获取 - 热层一次流水线往返，未命中并发加载，结果按请求顺序返回
+
+        返回bytes-like缓冲区；as_numpy=True 时返回 numpy.frombuffer 只读视图
+        """
+        manager = self.manager
+        results = [None] * len(requests)
+        contexts = [manager._begin_request(filename, size) for filename, size, _ in requests]
+
+        # 0. L0进程内缓存
+        pending = []
+        for i, (filename, size, offset) in enumerate(requests):
+            data = manager._get_from_memory_cache(filename, size, offset, contexts[i][1])
+            if data is not None:
+                self.prefetcher.prefetch_async(filename)
+                results[i] = data
+            else:
+                pending.append(i)
+
+        # 1. 热层
+        hot_indexes = [i for i in pending if contexts[i][0] in [StorageTier.HOT, StorageTier.WARM]]
+        if hot_indexes:
+            hot_results = await self.aget_ranges_from_hot_layer([requests[i] for i in hot_indexes])
+            for i, data in zip(hot_indexes, hot_results):
+                if data is not None:
+                    manager._record_hot_hit(requests[i][0], contexts[i][1])
+                    self.prefetcher.prefetch_async(requests[i][0])
+                    results[i] = data
+
+        # 2-4. 温层/冷层等阻塞路径交给线程池并发执行
+        missing = [i for i in pending if results[i] is None]
+        if missing:
+            loaded = await asyncio.gather(*(
+                self.run_blocking(manager._get_from_lower_tiers, *requests[i], *contexts[i], False)
+                for i in missing
+            ))
+            for i, data in zip(missing, loaded):
+                self.prefetcher.prefetch_async(requests[i][0])
+                results[i] = data
+
+        if as_numpy:
+            return [manager.as_numpy(data, dtype) for data in results]
+        return results
+
+    async def aget_ranges_from_hot_layer(self, requests):
+        """从热层异步批量按范围读取，未命中项为None"""
+        if not self.manager._redis_available():
+            return [None] * len(requests)
+
+        store = self.manager.hot_store
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            plans = store.queue_ranges(pipe, requests)
+            states, missing_keys = store.collect_ranges(requests, plans, await pipe.execute())
+            missing_blocks = await self.redis_client.mget(missing_keys) if missing_keys else []
+            self.redis_breaker.record_success()
+            return store.finish_ranges(requests, states, missing_blocks)
+        except Exception as e:
+            self.redis_breaker.record_failure(e)
+            logger.error(f"异步Redis批量读取失败: {e}")
+            return [None] * len(requests)
+
+    async def ahot_layer_contains(self, filename):
+        """检查文件是否已在热层"""
+        if not self.manager._redis_available():
+            return False
+
+        try:
+            exists = await self.redis_client.exists(self.manager.hot_store.manifest_key(filename))
+            self.redis_breaker.record_success()
+            return bool(exists)
+        except Exception as e:
+            self.redis_breaker.record_failure(e)
+            logger.error(f"异步Redis检查失败 {filename}: {e}")
+            return False
+
+    async def acache_to_hot_layer(self, filename, data):
+        """异步缓存数据到热层 - 压缩编码在线程池中完成"""
+        if not self.manager._redis_available() or not self.manager._admit_to_hot(filename, len(data)):
+            return False
+
+        try:
+            engine = self.manager.strategy_engine
+            ttl = engine.get_cache_ttl(StorageTier.HOT)
+            compress = engine.should_compress(filename, len(data))
+
+            hot_store = self.manager.hot_store
+
+            def encode():
+                codec = self.manager.select_codec(filename, data, StorageTier.HOT) if compress else None
+                return hot_store.build_entries(filename, data, compress, codec)
+
+            def put_deduplicated():
+                codec = self.manager.select_codec(filename, data, StorageTier.HOT) if compress else None
+                return hot_store.put(filename, data, ttl, compress, codec)
+
+            if hot_store.dedup:
+                # 去重布局要登记块引用、释放被覆盖清单的引用，沿用同步写入路径，放到线程池中执行
+                await self.run_blocking(put_deduplicated)
+            else:
+                entries = await self.run_blocking(encode)
+                hot_store.forget_manifest(filename)
+
+                pipe = self.redis_client.pipeline(transaction=True)
+                for key, value in entries:
+                    pipe.setex(key, ttl, value)
+                await pipe.execute()
+            self.redis_breaker.record_success()
+            if self.manager.admission is not None:
+                self.manager.admission.on_insert(filename, len(data))
+
+            logger.info(f"✓ 数据异步缓存到热层: {filename}")
+            return True
+        except Exception as e:
+            self.redis_breaker.record_failure(e)
+            logger.error(f"异步热层缓存失败: {e}")
+            return False
+
+    def get_performance_stats(self):
+        """获取性能统计"""
+        return self.manager.get_performance_stats()
+
+    async def aclose(self):
+        """停止预取任务并释放连接与线程池"""
+        await self.prefetcher.stop()
+        await self.redis_client.aclose()
+        self.executor.shutdown(wait=False)
+        logger.info("AAT异步存储管理器已关闭")
+
+
+if __name__ == "__main__":
+    async def _demo():
+        manager = AsyncAATStorageManager()
+        files = ['embedding.bin', 'layer0.bin', 'layer1.bin', 'output.bin']
+
+        results = await manager.aget_many([(f, 4096, 0) for f in files])
+        for file, data in zip(files, results):
+            print(f"{file}: {len(data)} bytes")
+
+        # 并发发起大量读取
+        reads = [manager.aget_data(files[i % len(files)], 4096, (i * 4096) % 65536) for i in range(200)]
+        print(f"并发读取完成: {len(await asyncio.gather(*reads))} 个请求")
+        print(f"性能统计: {manager.get_performance_stats()}")
+        await manager.aclose()
+
+    asyncio.run(_demo())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# aat_backend_health.py
+"""
+AAT后端健康管理 - 熔断器
+后端连续失败后熔断，熔断期间的请求在微秒级直接跳过该层，
+而不是每次都等待一个完整的超时
+"""
+
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-BackendHealth")
+
+
+class CircuitBreaker:
+    """熔断器 - closed / open / half_open 三态"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'trips': 0,  # 熔断次数
+            'rejected': 0,  # 熔断期间被直接拒绝的请求数
+            'failures': 0,
+            'last_error': None
+        }
+
+    def allow(self):
+        """是否允许请求访问后端；熔断超时后放行一个探测请求"""
+        if self.state == self.CLOSED:
+            return True
+
+        with self.lock:
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info(f"熔断器半开，放行探测请求: {self.name}")
+                return True
+
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        """记录一次成功调用"""
+        if self.state == self.CLOSED and self.consecutive_failures == 0:
+            return
+
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info(f"✓ 后端恢复，熔断器关闭: {self.name}")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self, error=None):
+        """记录一次失败调用，达到阈值或半开探测失败时熔断"""
+        with self.lock:
+            self.consecutive_failures += 1
+            self.stats['failures'] += 1
+            if error is not None:
+                self.stats['last_error'] = str(error)
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.stats['trips'] += 1
+                    logger.warning(f"⚡ 后端熔断: {self.name} (连续失败 {self.consecutive_failures} 次)")
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+    def reset(self):
+        """强制关闭熔断器（如重连成功后）"""
+        with self.lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def get_state(self):
+        """获取熔断器状态"""
+        return {
+            'name': self.name,
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'opened_at': self.opened_at if self.state != self.CLOSED else None,
+            **self.stats
+        }
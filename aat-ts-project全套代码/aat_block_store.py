@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# aat_block_store.py
+"""
+AAT热层分块存储
+将层文件切分为定长数据块存入Redis，并附带一个小清单(manifest)，
+按 (offset, size) 读取时只拉取并解压覆盖到的块
+
+块值格式：定长小端头部 + 负载
+  magic(4s) | version(B) | codec(B) | 保留(2x) | 原始长度(Q) | 负载crc32(I)
+codec为按对象选定的编码（见 CodecSelector），压缩无收益的块记为不压缩
+
+去重模式下块按内容摘要寻址（所有文件共享同一份块），清单中按顺序记录各块摘要；
+每个内容寻址块带引用计数，不再被任何清单引用的块随即删除
+"""
+
+import json
+import logging
+import struct
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from aat_compression import CompressionAlgorithm
+from aat_content_store import chunk_digest
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-BlockStore")
+
+BLOCK_MAGIC = b'AATV'
+BLOCK_VERSION = 1
+BLOCK_HEADER = struct.Struct('<4sBBxxQI')
+
+# 编码方式 <-> 头部codec编号
+CODEC_IDS = {
+    CompressionAlgorithm.NONE: 0,
+    CompressionAlgorithm.GZIP: 1,
+    CompressionAlgorithm.ZLIB: 2,
+    CompressionAlgorithm.ZSTD: 3,
+    CompressionAlgorithm.LZ4: 4
+}
+CODECS_BY_ID = {codec_id: algo for algo, codec_id in CODEC_IDS.items()}
+
+
+class HotBlockStore:
+    """热层分块存储 - 定长块 + 清单"""
+
+    def __init__(self, redis_client, compression_manager, block_size=256 * 1024, key_prefix="file",
+                 memory_cache=None, dedup=False):
+        self.redis_client = redis_client
+        self.compression_manager = compression_manager
+        self.block_size = block_size
+        self.key_prefix = key_prefix
+        # 可选的L0缓存，读到的块解压后顺带填充
+        self.memory_cache = memory_cache
+        # 内容寻址：相同内容的块只存一份
+        self.dedup = dedup
+        # 最近读到的去重清单：文件名 -> (原始清单, 解析结果)，
+        # 命中时块键已知，清单与数据块仍在同一次往返中取回，清单不一致再补取
+        self.manifests = OrderedDict()
+        self.max_cached_manifests = 4096
+        # 读写路径在多个线程中并发调用，清单缓存与统计计数都在锁内修改
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'blocks_written': 0,
+            'blocks_deduplicated': 0,
+            'bytes_deduplicated': 0,
+            'blocks_freed': 0
+        }
+
+        logger.info(f"热层分块存储初始化完成，块大小: {block_size // 1024}KB, 去重: {dedup}")
+
+    def manifest_key(self, filename):
+        """清单键"""
+        return f"{self.key_prefix}:{filename}:manifest"
+
+    def block_key(self, filename, index):
+        """数据块键"""
+        return f"{self.key_prefix}:{filename}:blk:{index}"
+
+    @staticmethod
+    def block_span(size, offset, block_size):
+        """计算覆盖 [offset, offset + size) 的首尾块编号"""
+        first = offset // block_size
+        last = (offset + max(size, 1) - 1) // block_size
+        return first, last
+
+    def forget_manifest(self, filename):
+        """丢弃本地缓存的清单（文件被重写或删除时）"""
+        with self.lock:
+            self.manifests.pop(filename, None)
+
+    def _count(self, **deltas):
+        """累加统计计数"""
+        with self.lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def get_stats(self):
+        """统计快照"""
+        with self.lock:
+            return dict(self.stats)
+
+    def chunk_key(self, digest):
+        """内容寻址数据块键"""
+        return f"{self.key_prefix}:cas:{digest}"
+
+    def ref_key(self, digest):
+        """内容寻址数据块的引用计数键"""
+        return f"{self.key_prefix}:cas:{digest}:refs"
+
+    def block_keys(self, filename, size, offset, block_size=None):
+        """覆盖指定范围的首块编号及各块键（按位置寻址的布局）"""
+        first, last = self.block_span(size, offset, block_size or self.block_size)
+        return first, [self.block_key(filename, i) for i in range(first, last + 1)]
+
+    def manifest_block_keys(self, filename, manifest, size, offset):
+        """按清单解析覆盖指定范围的首块编号及各块键"""
+        first, last = self.block_span(size, offset, manifest['block_size'])
+        if 'digests' in manifest:
+            return first, [self.chunk_key(digest) for digest in manifest['digests'][first:last + 1]]
+        return first, [self.block_key(filename, i) for i in range(first, last + 1)]
+
+    def _split(self, data):
+        """按块大小切分为视图"""
+        block_size = self.block_size
+        view = memoryview(data)
+        return [view[i:i + block_size] for i in range(0, len(view), block_size)]
+
+    def build_entries(self, filename, data, compress=True, codec=None):
+        """编码整个文件为 [(键, 值), ...]，清单排在最后；codec为None时使用默认编码"""
+        blocks = self._split(data)
+        if not self.dedup:
+            entries = [(self.block_key(filename, index), self.encode_block(block, compress, codec))
+                       for index, block in enumerate(blocks)]
+            entries.append((self.manifest_key(filename), self.build_manifest(len(data))))
+            return entries
+
+        digests = [chunk_digest(block) for block in blocks]
+        unique = dict(zip(digests, blocks))
+        entries = [(self.chunk_key(digest), self.encode_block(block, compress, codec))
+                   for digest, block in unique.items()]
+        entries.append((self.manifest_key(filename), self.build_manifest(len(data), digests)))
+        return entries
+
+    def build_manifest(self, size, digests=None):
+        """生成清单；去重布局附带各块摘要"""
+        manifest = {
+            'size': size,
+            'block_size': self.block_size,
+            'blocks': (size + self.block_size - 1) // self.block_size,
+            'created': time.time()
+        }
+        if digests is not None:
+            manifest['digests'] = digests
+        return json.dumps(manifest)
+
+    def put(self, filename, data, ttl, compress=True, codec=None):
+        """按块写入整个文件，清单最后写入"""
+        self.forget_manifest(filename)
+        if self.dedup:
+            blocks = self._split(data)
+            digests = self._put_unique_blocks(blocks, ttl, compress, codec)
+            self._replace_manifest(filename, ttl, self.build_manifest(len(data), digests))
+            logger.debug(f"分块写入(去重): {filename} ({len(data)} bytes, {len(blocks)} 块)")
+            return True
+
+        entries = self.build_entries(filename, data, compress, codec)
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        for key, value in entries:
+            pipe.setex(key, ttl, value)
+        pipe.execute()
+
+        logger.debug(f"分块写入: {filename} ({len(data)} bytes, {len(entries) - 1} 块)")
+        return True
+
+    def _put_unique_blocks(self, blocks, ttl, compress=True, codec=None):
+        """写入内容寻址块并登记引用，返回各块摘要
+
+        先用一次往返续期已存在的块（续期保证共享块不早于新清单过期）并增加引用计数，只编码并写入缺失的块；
+        块每出现一次计一次引用，清单删除、覆盖或写入放弃时按同一摘要列表释放
+        """
+        digests = [chunk_digest(block) for block in blocks]
+        unique = dict(zip(digests, blocks))
+        references = Counter(digests)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for digest in unique:
+            pipe.expire(self.chunk_key(digest), ttl)
+            pipe.incrby(self.ref_key(digest), references[digest])
+            pipe.expire(self.ref_key(digest), ttl)
+        present = pipe.execute()[0::3]
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        written = 0
+        # 重复块：本次写入内部的重复，加上已存在于热层的块
+        deduplicated = len(blocks) - len(unique)
+        bytes_deduplicated = sum(len(block) for block in blocks) - sum(len(block) for block in unique.values())
+        for (digest, block), exists in zip(unique.items(), present):
+            if exists:
+                deduplicated += 1
+                bytes_deduplicated += len(block)
+                continue
+            pipe.setex(self.chunk_key(digest), ttl, self.encode_block(block, compress, codec))
+            written += 1
+        if written:
+            pipe.execute()
+        self._count(blocks_written=written, blocks_deduplicated=deduplicated,
+                    bytes_deduplicated=bytes_deduplicated)
+        return digests
+
+    def _release_blocks(self, digests):
+        """释放一组块引用（摘要可重复），删除引用归零的块，返回删除的块数
+
+        清单随TTL过期时不释放引用，引用计数与块续期时使用相同TTL，一并过期
+        """
+        references = Counter(digests)
+        if not references:
+            return 0
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for digest, count in references.items():
+            pipe.incrby(self.ref_key(digest), -count)
+        remaining = pipe.execute()
+
+        unreferenced = [digest for digest, left in zip(references, remaining) if left <= 0]
+        if unreferenced:
+            self.redis_client.delete(*[key for digest in unreferenced
+                                       for key in (self.chunk_key(digest), self.ref_key(digest))])
+            self._count(blocks_freed=len(unreferenced))
+        return len(unreferenced)
+
+    def _replace_manifest(self, filename, ttl, manifest):
+        """写入去重清单，并释放被覆盖的旧清单持有的块引用"""
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.get(self.manifest_key(filename))
+        pipe.setex(self.manifest_key(filename), ttl, manifest)
+        old = pipe.execute()[0]
+        if old is not None:
+            self._release_blocks(json.loads(old).get('digests', []))
+
+    def put_blocks(self, filename, first_index, blocks, ttl, compress=True, codec=None):
+        """流式写入连续的若干块；清单未写入前读者视为未命中
+
+        去重布局返回各块摘要，由写入方汇总后交给 put_manifest
+        """
+        if self.dedup:
+            return self._put_unique_blocks(blocks, ttl, compress, codec)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for index, block in enumerate(blocks, first_index):
+            pipe.setex(self.block_key(filename, index), ttl, self.encode_block(block, compress, codec))
+        pipe.execute()
+        return None
+
+    def discard_blocks(self, filename, count, digests=None):
+        """删除流式写入中已写入、尚无清单的块（放弃热层写入时调用）
+
+        按位置寻址的布局删除前count个块；去重布局释放本次写入登记的块引用
+        """
+        if self.dedup:
+            return self._release_blocks(digests or [])
+        if count == 0:
+            return 0
+        return self.redis_client.delete(*(self.block_key(filename, i) for i in range(count)))
+
+    def put_manifest(self, filename, size, ttl, digests=None):
+        """流式写入结束后写入清单，文件此时才对读者可见"""
+        self.forget_manifest(filename)
+        if digests is not None:
+            self._replace_manifest(filename, ttl, self.build_manifest(size, digests))
+        else:
+            self.redis_client.setex(self.manifest_key(filename), ttl, self.build_manifest(size))
+
+    def get_range(self, filename, size, offset):
+        """读取指定范围，未命中返回None"""
+        return self.get_ranges([(filename, size, offset)])[0]
+
+    def get_ranges(self, requests):
+        """批量按范围读取 - 清单与数据块通常在同一次流水线往返中获取"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        plans = self.queue_ranges(pipe, requests)
+        states, missing_keys = self.collect_ranges(requests, plans, pipe.execute())
+        missing_blocks = self.redis_client.mget(missing_keys) if missing_keys else []
+        return self.finish_ranges(requests, states, missing_blocks)
+
+    def queue_ranges(self, pipe, requests):
+        """第一次往返：每个请求排入清单读取，块键可预知时同时排入数据块读取
+
+        块键可预知：按位置寻址的布局，或本地已缓存该文件的去重清单
+        """
+        plans = []
+        for filename, size, offset in requests:
+            pipe.get(self.manifest_key(filename))
+            with self.lock:
+                cached = self.manifests.get(filename)
+            if cached is not None:
+                first, keys = self.manifest_block_keys(filename, cached[1], size, offset)
+            elif not self.dedup:
+                first, keys = self.block_keys(filename, size, offset)
+            else:
+                first, keys = 0, []
+            if keys:
+                pipe.mget(keys)
+            plans.append((first, keys))
+        return plans
+
+    def collect_ranges(self, requests, plans, replies):
+        """解析第一次往返的结果，返回各请求的状态与需要补取的块键
+
+        状态为None表示未命中，否则为 [清单, 首块编号, 数据块或None(待补取)]
+        """
+        states, missing_keys = [], []
+        position = 0
+        for (filename, size, offset), (first, keys) in zip(requests, plans):
+            raw_manifest = replies[position]
+            raw_blocks = replies[position + 1] if keys else []
+            position += 2 if keys else 1
+
+            if raw_manifest is None:
+                self.forget_manifest(filename)
+                states.append(None)
+                continue
+
+            with self.lock:
+                cached = self.manifests.get(filename)
+            manifest = cached[1] if cached is not None and cached[0] == raw_manifest else json.loads(raw_manifest)
+            if 'digests' in manifest:
+                self._remember_manifest(filename, raw_manifest, manifest)
+
+            # 清单与预取时的假设不一致（首次读取去重文件、文件已重写、块大小配置已变更）则补取
+            expected_first, expected_keys = self.manifest_block_keys(filename, manifest, size, offset)
+            if expected_first != first or expected_keys != keys:
+                states.append([manifest, expected_first, None, expected_keys])
+                missing_keys.extend(expected_keys)
+            else:
+                states.append([manifest, first, raw_blocks, keys])
+        return states, missing_keys
+
+    def finish_ranges(self, requests, states, missing_blocks):
+        """分配补取到的数据块并裁剪出各请求的结果"""
+        results = []
+        position = 0
+        for (filename, size, offset), state in zip(requests, states):
+            if state is None:
+                results.append(None)
+                continue
+
+            manifest, first, raw_blocks, keys = state
+            if raw_blocks is None:
+                raw_blocks = missing_blocks[position:position + len(keys)]
+                position += len(keys)
+            results.append(self.slice_blocks(filename, size, offset, manifest, first, raw_blocks))
+        return results
+
+    def _remember_manifest(self, filename, raw_manifest, manifest):
+        """缓存去重清单，超过上限时丢弃最久未用的"""
+        with self.lock:
+            self.manifests[filename] = (raw_manifest, manifest)
+            self.manifests.move_to_end(filename)
+            while len(self.manifests) > self.max_cached_manifests:
+                self.manifests.popitem(last=False)
+
+    def slice_blocks(self, filename, size, offset, manifest, first, raw_blocks):
+        """根据清单裁剪、解码从first开始取回的数据块"""
+        if size <= 0 or offset >= manifest['size']:
+            return b''
+
+        block_size = manifest['block_size']
+        last = min(self.block_span(size, offset, block_size)[1], manifest['blocks'] - 1)
+        blocks = self._decode_blocks(raw_blocks[:last - first + 1])
+        if blocks is None:
+            return None
+
+        if self.memory_cache is not None and block_size == self.memory_cache.block_size:
+            self.memory_cache.put_blocks(filename, manifest['size'], first, blocks)
+
+        # 先在各块的视图上裁剪；单块直接返回视图，多块一次性拼接
+        start = offset - first * block_size
+        end = min(offset + size, manifest['size']) - first * block_size
+        views = []
+        for index, block in enumerate(blocks):
+            block_start = index * block_size
+            if block_start >= end:
+                break
+            views.append(memoryview(block)[max(start - block_start, 0):end - block_start])
+        return views[0] if len(views) == 1 else b''.join(views)
+
+    def get_manifest(self, filename):
+        """读取清单，不在热层返回None"""
+        raw_manifest = self.redis_client.get(self.manifest_key(filename))
+        return json.loads(raw_manifest) if raw_manifest is not None else None
+
+    def get(self, filename):
+        """读取整个文件，未命中返回None"""
+        manifest = self.get_manifest(filename)
+        if manifest is None:
+            return None
+
+        if manifest['blocks'] == 0:
+            return b''
+
+        _, keys = self.manifest_block_keys(filename, manifest, manifest['size'], 0)
+        raw_blocks = self.redis_client.mget(keys)
+        blocks = self._decode_blocks(raw_blocks)
+        return b''.join(blocks) if blocks is not None else None
+
+    def exists(self, filename):
+        """文件是否在热层"""
+        return bool(self.redis_client.exists(self.manifest_key(filename)))
+
+    def delete(self, filename):
+        """删除清单及全部数据块；内容寻址块按引用计数释放，仍被其他文件引用的块保留"""
+        self.forget_manifest(filename)
+        manifest = self.get_manifest(filename)
+        keys = [self.manifest_key(filename)]
+        if manifest is not None and 'digests' not in manifest:
+            keys.extend(self.block_key(filename, i) for i in range(manifest['blocks']))
+        deleted = self.redis_client.delete(*keys) > 0
+        # 只有删掉清单的一方释放引用，并发删除不会重复释放
+        if deleted and manifest is not None and 'digests' in manifest:
+            self._release_blocks(manifest['digests'])
+        return deleted
+
+    def _decode_blocks(self, raw_blocks):
+        """解码数据块；任一块缺失（如TTL先过期）或损坏视为未命中"""
+        if any(raw is None for raw in raw_blocks):
+            return None
+        blocks = [self.decode_block(raw) for raw in raw_blocks]
+        if any(block is None for block in blocks):
+            return None
+        return blocks
+
+    def encode_block(self, chunk, compress=True, codec=None):
+        """编码单个数据块：头部 + 负载（压缩无收益时存原始数据）
+
+        头部与负载直接写入预分配的缓冲区，负载只复制一次；返回memoryview（Redis客户端不接受bytearray）
+        """
+        payload, algo = chunk, CompressionAlgorithm.NONE
+        if compress:
+            if codec is None:
+                compressed_data, compressed_algo = self.compression_manager.compress(chunk)
+            else:
+                compressed_data, compressed_algo = self.compression_manager.compress(
+                    chunk, codec.algorithm, codec.level)
+            if compressed_algo != CompressionAlgorithm.NONE and len(compressed_data) < len(chunk):
+                payload, algo = compressed_data, compressed_algo
+
+        block = bytearray(BLOCK_HEADER.size + len(payload))
+        BLOCK_HEADER.pack_into(block, 0, BLOCK_MAGIC, BLOCK_VERSION, CODEC_IDS[algo], len(chunk), zlib.crc32(payload))
+        block[BLOCK_HEADER.size:] = payload
+        return memoryview(block)
+
+    def decode_block(self, raw):
+        """解码单个数据块 - 在memoryview上解析头部，未压缩负载直接返回视图，不做拷贝
+
+        不是数据块格式或校验失败返回None
+        """
+        if raw[:4] != BLOCK_MAGIC or len(raw) < BLOCK_HEADER.size:
+            logger.warning("热层数据块格式无法识别")
+            return None
+
+        _, version, codec_id, raw_length, checksum = BLOCK_HEADER.unpack_from(raw)
+        payload = memoryview(raw)[BLOCK_HEADER.size:]
+        algo = CODECS_BY_ID.get(codec_id)
+        if version != BLOCK_VERSION or algo is None or zlib.crc32(payload) != checksum:
+            logger.warning(f"热层数据块校验失败 (version={version}, codec={codec_id})")
+            return None
+
+        if algo == CompressionAlgorithm.NONE:
+            return payload
+        data = self.compression_manager.decompress(payload, algo)
+        if len(data) != raw_length:
+            logger.warning(f"热层数据块解压长度不符: {len(data)} != {raw_length}")
+            return None
+        return data
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# aat_checkpoint_writer.py
+"""
+AAT检查点流式写入
+按块接收数据，增量压缩后经有界队列交给后台线程做MinIO分段上传，
+内存占用只与分段大小和队列深度有关，与文件大小无关；
+开启冷层去重时改为按内容寻址分片上传（已存在的分片跳过），最后写入清单；
+版本化写入时各分片存为相对父版本的差分，差分链过长由后台重定基；
+可选地把原始数据块同步写入热层，使最新版本写完即可被热读
+"""
+
+import logging
+import queue
+import re
+import threading
+
+from aat_compression import CompressionAlgorithm, TensorFilter, clip_regions
+from aat_real_model_loader import TensorLayoutScanner
+from aat_strategy_engine import StorageTier
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-CheckpointWriter")
+
+# 队列中每项压缩数据的大小
+QUEUE_CHUNK_SIZE = 1024 * 1024
+
+# 对象元数据中记录编码方式，读路径据此解压
+CODEC_METADATA_KEY = "x-amz-meta-aat-codec"
+
+# 张量过滤后的字节平面要足够长才能体现压缩收益，过滤时按该字节数采样选择编码
+FILTERED_SAMPLE_SIZE = 512 * 1024
+
+# 版本号命名：checkpoint_v3.ckpt 的父版本为 checkpoint_v2.ckpt
+_VERSIONED_NAME = re.compile(r'^(.*_v)(\d+)(\.[^.]*)?$')
+
+
+class _QueueReader:
+    """把上传队列包装成 put_object 所需的流对象"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pending = memoryview(b'')
+        self.eof = False
+
+    def read(self, size=-1):
+        out = bytearray()
+        while not self.eof and (size < 0 or len(out) < size):
+            if not self.pending:
+                chunk = self.chunks.get()
+                if chunk is None:
+                    self.eof = True
+                    break
+                if isinstance(chunk, BaseException):
+                    # 抛出后MinIO客户端会中止分段上传
+                    raise chunk
+                self.pending = memoryview(chunk)
+
+            take = len(self.pending) if size < 0 else min(size - len(out), len(self.pending))
+            out += self.pending[:take]
+            self.pending = self.pending[take:]
+        return bytes(out)
+
+
+class CheckpointWriter:
+    """检查点流式写入器 - write() 追加数据，close() 完成上传，abort() 放弃本次写入"""
+
+    def __init__(self, storage_manager, filename, keep_hot=None, compress=None, parent=None):
+        self.manager = storage_manager
+        self.filename = filename
+
+        config = storage_manager.strategy_engine.config
+        write_config = config['checkpoint_write']
+        self.part_size = write_config['part_size']
+        self.keep_hot = write_config['keep_latest_hot'] if keep_hot is None else keep_hot
+        if compress is None:
+            compress = write_config['compress'] and config['compression']['enabled']
+
+        if not storage_manager._minio_available():
+            raise IOError(f"MinIO不可用，无法写入: {filename}")
+
+        # 分片布局：每个分片单独压缩并按内容寻址
+        self.chunked = config['dedup']['cold_enabled']
+        self.chunk_size = storage_manager.chunk_store.chunk_size
+        self.chunk_pending = bytearray()
+        self.entries = []
+
+        # 版本化写入：父版本的分片条目，在作废旧副本之前解析（父版本可以是文件自身的上一版）
+        self.delta_config = config['delta']
+        self.parent = None
+        self.parent_entries = None
+        if self.chunked and self.delta_config['enabled']:
+            self.parent, self.parent_entries = self._resolve_parent(parent)
+
+        # 增量压缩器（单对象布局，上传开始时即写入编码元数据，使用固定编码）；
+        # 分片布局由上传线程用首个分片为该对象选择冷层编码
+        self.algorithm = CompressionAlgorithm.NONE
+        self.compress_level = write_config['compress_level']
+        self.compressor = None
+        self.select_codec = False
+        if compress:
+            compression_manager = storage_manager.compression_manager
+            self.algorithm = compression_manager.default_algorithm
+            if self.chunked:
+                self.select_codec = True
+            else:
+                self.compressor = compression_manager.compressobj(self.algorithm, self.compress_level)
+
+        # 分片布局下边写边解析张量头，压缩前按元素宽度转置各分片内的张量数据
+        self.scanner = None
+        if compress and self.chunked and storage_manager.chunk_store.tensor_filter != TensorFilter.NONE:
+            self.scanner = TensorLayoutScanner()
+
+        self.bytes_written = 0
+        self.bytes_uploaded = 0
+        self.closed = False
+        self.out_buffer = bytearray()
+
+        # 热层流式写入：凑满一个块就写一个块，清单在close时最后写入
+        self.hot_pending = bytearray()
+        self.hot_blocks = 0
+        self.hot_bytes = 0
+        self.hot_digests = []
+        self.hot_ttl = storage_manager.strategy_engine.get_cache_ttl(StorageTier.HOT)
+
+        # 旧版本的各层副本全部作废，热层清单先删除，写入期间读者不会看到新旧混合的块
+        storage_manager.invalidate_cached_copies(filename)
+
+        self.chunks = queue.Queue(maxsize=write_config['queue_depth'])
+        self.upload_error = None
+        self.upload_thread = threading.Thread(
+            target=self._upload_chunks if self.chunked else self._upload,
+            name=f"aat-upload-{filename}", daemon=True)
+        self.upload_thread.start()
+
+        codec_name = 'auto' if self.select_codec else self.algorithm.value
+        logger.info(f"开始流式写入: {filename} (压缩: {codec_name}, 分片去重: {self.chunked}, "
+                    f"父版本: {self.parent}, 热层: {self.keep_hot})")
+
+    def _resolve_parent(self, parent):
+        """确定差分的父版本，返回 (父文件名, 分片条目)；没有可用的分片布局父版本时返回 (None, None)
+
+        未指定时按命名推断：checkpoint_vN 取 checkpoint_v(N-1)，否则取文件自身的上一版
+        """
+        chunk_store = self.manager.chunk_store
+        if parent is not None:
+            candidates = [parent]
+        elif self.delta_config['auto_parent']:
+            candidates = []
+            match = _VERSIONED_NAME.match(self.filename)
+            if match and int(match.group(2)) > 1:
+                candidates.append(f"{match.group(1)}{int(match.group(2)) - 1}{match.group(3) or ''}")
+            candidates.append(self.filename)
+        else:
+            return None, None
+
+        for candidate in candidates:
+            try:
+                entries = chunk_store.get_entries(candidate)
+            except Exception as e:
+                logger.warning(f"父版本清单读取失败 {candidate}: {e}")
+                continue
+            if entries is not None:
+                return candidate, entries
+        return None, None
+
+    def _upload(self):
+        """后台分段上传，数据来自队列"""
+        manager = self.manager
+        try:
+            manager._guarded_call(
+                manager.minio_breaker, manager.minio_client.put_object,
+                manager.bucket_name, self.filename, _QueueReader(self.chunks),
+                length=-1, part_size=self.part_size,
+                metadata={CODEC_METADATA_KEY: self.algorithm.value})
+        except Exception as e:
+            self._fail_upload(e)
+
+    def _upload_chunks(self):
+        """后台按内容寻址分片上传，已存在的分片跳过"""
+        chunk_store = self.manager.chunk_store
+        try:
+            while True:
+                chunk = self.chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                index = len(self.entries)
+                regions = self.scanner.regions_in(index * self.chunk_size, len(chunk)) if self.scanner else None
+                if self.select_codec:
+                    self._select_cold_codec(chunk, regions)
+                if self.parent_entries is not None and index < len(self.parent_entries):
+                    entry, uploaded = chunk_store.put_delta_chunk(
+                        chunk, self.parent_entries[index], self.algorithm, self.compress_level,
+                        self.delta_config['max_delta_ratio'], regions)
+                else:
+                    entry, uploaded = chunk_store.put_chunk(chunk, self.algorithm, self.compress_level, regions)
+                self.entries.append(entry)
+                self.bytes_uploaded += uploaded
+        except Exception as e:
+            self._fail_upload(e)
+
+    def _select_cold_codec(self, sample, regions=None):
+        """按首个分片为该对象选择冷层编码（在上传线程中执行），采样与实际写入一样先做张量过滤"""
+        manager = self.manager
+        sample_size = None
+        regions = clip_regions(regions or [], FILTERED_SAMPLE_SIZE)
+        if regions:
+            sample = manager.compression_manager.filter(
+                sample[:FILTERED_SAMPLE_SIZE], regions, manager.chunk_store.tensor_filter)
+            sample_size = len(sample)
+        codec = manager.select_codec(self.filename, sample, StorageTier.COLD, sample_size)
+        self.algorithm = codec.algorithm
+        if codec.level is not None:
+            self.compress_level = codec.level
+        self.select_codec = False
+        logger.info(f"冷层编码: {self.filename} -> {codec.name}")
+
+    def _fail_upload(self, error):
+        """记录上传错误并排空队列，避免写入方阻塞"""
+        self.upload_error = error
+        while True:
+            try:
+                self.chunks.get_nowait()
+            except queue.Empty:
+                break
+
+    def _enqueue(self, item):
+        """放入上传队列；队列满时阻塞，上传线程已退出则报错"""
+        while True:
+            if self.upload_error is not None:
+                raise IOError(f"MinIO上传失败 {self.filename}: {self.upload_error}")
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if not self.upload_thread.is_alive():
+                    raise IOError(f"MinIO上传线程已退出: {self.filename}")
+
+    def _emit(self, data, final=False):
+        """累积压缩输出，凑满一项后入队"""
+        self.out_buffer += data
+        if len(self.out_buffer) >= QUEUE_CHUNK_SIZE or (final and self.out_buffer):
+            self.bytes_uploaded += len(self.out_buffer)
+            self._enqueue(bytes(self.out_buffer))
+            self.out_buffer = bytearray()
+
+    def write(self, chunk):
+        """追加一段数据，返回写入字节数"""
+        if self.closed:
+            raise ValueError(f"写入器已关闭: {self.filename}")
+
+        self.bytes_written += len(chunk)
+        if self.chunked:
+            if self.scanner is not None:
+                self.scanner.feed(chunk)
+            self.chunk_pending += chunk
+            while len(self.chunk_pending) >= self.chunk_size:
+                self._enqueue(bytes(self.chunk_pending[:self.chunk_size]))
+                del self.chunk_pending[:self.chunk_size]
+        else:
+            self._emit(self.compressor.compress(chunk) if self.compressor else chunk)
+
+        if self.keep_hot:
+            self.hot_pending += chunk
+            self._flush_hot_blocks()
+        return len(chunk)
+
+    def _flush_hot_blocks(self, final=False):
+        """把凑满的块（final时含末尾残块）写入热层；热层出错或准入未通过则放弃本次热层写入
+
+        与读路径一样经过热层准入：每批写入前按已写入的字节数重新判定，通过后记账，
+        检查点因此同样受热层预算与命名空间配额约束，并出现在热集快照中；
+        keep_hot 是显式要求，准入不比较访问频率，首批写入前记一次访问，使其驻留后不被任意新对象挤出
+        """
+        manager = self.manager
+        block_size = manager.hot_store.block_size
+        count = len(self.hot_pending) // block_size
+        if final and len(self.hot_pending) % block_size:
+            count += 1
+        if count == 0:
+            return
+
+        blocks = [bytes(self.hot_pending[i * block_size:(i + 1) * block_size]) for i in range(count)]
+        del self.hot_pending[:count * block_size]
+
+        hot_bytes = self.hot_bytes + sum(len(block) for block in blocks)
+        if self.hot_blocks == 0 and manager.admission is not None:
+            manager.admission.record_access(self.filename)
+        if not manager._admit_to_hot(self.filename, hot_bytes, pinned=True):
+            logger.info(f"↷ 热层准入未通过，改为只写冷层: {self.filename}")
+            self._discard_hot()
+            self.hot_pending = bytearray()
+            return
+
+        compress = manager.strategy_engine.should_compress(self.filename, block_size)
+        codec = manager.select_codec(self.filename, blocks[0], StorageTier.HOT) if compress else None
+        if manager._redis_available():
+            try:
+                digests = manager._guarded_call(
+                    manager.redis_breaker, manager.hot_store.put_blocks,
+                    self.filename, self.hot_blocks, blocks, self.hot_ttl, compress, codec)
+                if digests is not None:
+                    self.hot_digests.extend(digests)
+                self.hot_blocks += count
+                self.hot_bytes = hot_bytes
+                if manager.admission is not None:
+                    manager.admission.on_insert(self.filename, hot_bytes)
+                return
+            except Exception as e:
+                logger.warning(f"热层流式写入失败，改为只写冷层 {self.filename}: {e}")
+
+        self._discard_hot()
+        self.hot_pending = bytearray()
+
+    def close(self):
+        """完成写入：冲刷压缩器、等待上传结束，成功后写入热层清单"""
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.chunked:
+            if self.chunk_pending:
+                self._enqueue(bytes(self.chunk_pending))
+                self.chunk_pending = bytearray()
+        elif self.compressor:
+            self._emit(self.compressor.flush(), final=True)
+        else:
+            self._emit(b'', final=True)
+        self._enqueue(None)
+        self.upload_thread.join()
+
+        manager = self.manager
+        chain_length = 0
+        if self.chunked and self.upload_error is None:
+            try:
+                chain_length = manager.chunk_store.put_manifest(
+                    self.filename, self.bytes_written, self.entries, self.parent)
+            except Exception as e:
+                self.upload_error = e
+
+        if self.upload_error is not None:
+            self._discard_hot()
+            raise IOError(f"MinIO上传失败 {self.filename}: {self.upload_error}")
+
+        if self.keep_hot:
+            self._flush_hot_blocks(final=True)
+        if self.keep_hot:
+            try:
+                manager._guarded_call(
+                    manager.redis_breaker, manager.hot_store.put_manifest,
+                    self.filename, self.bytes_written, self.hot_ttl,
+                    self.hot_digests if manager.hot_store.dedup else None)
+            except Exception as e:
+                logger.warning(f"热层清单写入失败 {self.filename}: {e}")
+                self._discard_hot()
+
+        manager.on_object_written(self.filename)
+        if chain_length > self.delta_config['max_chain_length']:
+            manager.schedule_rebase(self.filename)
+        logger.info(f"✓ 流式写入完成: {self.filename} ({self.bytes_written / 1024 / 1024:.2f}MB -> "
+                    f"{self.bytes_uploaded / 1024 / 1024:.2f}MB, 热层: {self.keep_hot})")
+
+    def abort(self):
+        """放弃本次写入，未完成的分段上传由MinIO客户端中止"""
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.upload_thread.is_alive():
+            try:
+                self._enqueue(IOError(f"写入已取消: {self.filename}"))
+            except IOError:
+                pass
+            self.upload_thread.join()
+        self._discard_hot()
+        logger.warning(f"⚠ 流式写入已取消: {self.filename}")
+
+    def _discard_hot(self):
+        """丢弃已写入热层的块 - 清单尚未写入，按已写入的块逐个删除（去重布局释放块引用），并撤销准入记账"""
+        manager = self.manager
+        if self.hot_blocks:
+            try:
+                manager._guarded_call(
+                    manager.redis_breaker, manager.hot_store.discard_blocks,
+                    self.filename, self.hot_blocks, self.hot_digests)
+            except Exception as e:
+                logger.warning(f"热层残留块删除失败，随TTL过期 {self.filename}: {e}")
+            manager.evict_from_hot_layer(self.filename)
+        self.hot_blocks = 0
+        self.hot_bytes = 0
+        self.hot_digests = []
+        self.keep_hot = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -3,8 +3,26 @@ import logging
 import gzip
 import zlib
 import pickle
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
+# 可选编码库：未安装时对应编码不可用，编码选择自动跳过
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AAT-Compression")
 
@@ -12,15 +30,152 @@ logger = logging.getLogger("AAT-Compression")
 class CompressionAlgorithm(Enum):
     GZIP = "gzip"
     ZLIB = "zlib"
+    ZSTD = "zstd"
+    LZ4 = "lz4"
     NONE = "none"
 
 
+# 未指定级别时的压缩级别（gzip/zlib与标准库默认一致）
+DEFAULT_LEVELS = {
+    CompressionAlgorithm.GZIP: 9,
+    CompressionAlgorithm.ZLIB: 6,
+    CompressionAlgorithm.ZSTD: 3,
+    CompressionAlgorithm.LZ4: 0
+}
+
+
+@dataclass(frozen=True)
+class CodecChoice:
+    algorithm: CompressionAlgorithm
+    level: int = None  # None表示该编码的默认级别
+
+    @property
+    def name(self):
+        if self.level is None or self.algorithm == CompressionAlgorithm.NONE:
+            return self.algorithm.value
+        return f"{self.algorithm.value}:{self.level}"
+
+
+def parse_codec(spec):
+    """'zstd:3' / 'lz4' -> CodecChoice"""
+    name, _, level = spec.partition(':')
+    return CodecChoice(CompressionAlgorithm(name), int(level) if level else None)
+
+
+class TensorFilter(Enum):
+    """压缩前的张量数据预处理：按元素宽度转置字节/位，使符号、指数等高度相关的部分连续排列"""
+    NONE = "none"
+    BYTE_SHUFFLE = "byteshuffle"
+    BIT_SHUFFLE = "bitshuffle"
+
+
+# 过滤后数据的头部：magic(4s) | version(B) | filter(B) | 区域数(I)，其后每个区域：起点(Q) | 长度(Q) | 元素宽度(B)
+FILTER_MAGIC = b'AATS'
+FILTER_VERSION = 1
+FILTER_HEADER = struct.Struct('<4sBBI')
+FILTER_REGION = struct.Struct('<QQB')
+FILTER_IDS = {TensorFilter.NONE: 0, TensorFilter.BYTE_SHUFFLE: 1, TensorFilter.BIT_SHUFFLE: 2}
+FILTERS_BY_ID = {filter_id: mode for mode, filter_id in FILTER_IDS.items()}
+
+
+def clip_regions(regions, length):
+    """只保留 [0, length) 内的张量数据区（按元素截断）"""
+    clipped = []
+    for start, size, itemsize in regions:
+        size = min(size, max(0, length - start)) // itemsize * itemsize
+        if size:
+            clipped.append((start, size, itemsize))
+    return clipped
+
+
+def _byte_shuffle(source, target, itemsize):
+    target.reshape(itemsize, -1)[:] = source.reshape(-1, itemsize).T
+
+
+def _byte_unshuffle(source, target, itemsize):
+    # 逆变换逐列写回比整体转置快（每次读取连续的一个字节平面）
+    planes, elements = source.reshape(itemsize, -1), target.reshape(-1, itemsize)
+    for i in range(itemsize):
+        elements[:, i] = planes[i]
+
+
+def _bit_shuffle(source, target, itemsize):
+    # 按8个元素一组打包位平面，不足8个的尾部元素保持原样
+    size = len(source) // itemsize // 8 * 8 * itemsize
+    bits = np.unpackbits(source[:size].reshape(-1, itemsize), axis=1)
+    target[:size] = np.packbits(np.ascontiguousarray(bits.T), axis=1).ravel()
+
+
+def _bit_unshuffle(source, target, itemsize):
+    size = len(source) // itemsize // 8 * 8 * itemsize
+    bits = np.unpackbits(source[:size].reshape(itemsize * 8, -1), axis=1)
+    target[:size] = np.packbits(np.ascontiguousarray(bits.T), axis=1).ravel()
+
+
+_TRANSFORMS = {
+    TensorFilter.BYTE_SHUFFLE: (_byte_shuffle, _byte_unshuffle),
+    TensorFilter.BIT_SHUFFLE: (_bit_shuffle, _bit_unshuffle)
+}
+
+
+def _transform_regions(data, regions, mode, inverse):
+    """对各数据区做（逆）转置，区域外的字节原样保留"""
+    out = bytearray(data)
+    source, target = np.frombuffer(data, dtype=np.uint8), np.frombuffer(out, dtype=np.uint8)
+    transform = _TRANSFORMS[mode][1 if inverse else 0]
+    for start, size, itemsize in regions:
+        if itemsize > 1:
+            transform(source[start:start + size], target[start:start + size], itemsize)
+    return out
+
+
+class _LZ4StreamCompressor:
+    """lz4帧压缩器的 compress()/flush() 外观，与 zlib.compressobj 用法一致"""
+
+    def __init__(self, level):
+        self.compressor = lz4_frame.LZ4FrameCompressor(compression_level=level)
+        self.header = self.compressor.begin()
+
+    def compress(self, data):
+        header, self.header = self.header, b''
+        return header + self.compressor.compress(data)
+
+    def flush(self):
+        header, self.header = self.header, b''
+        return header + self.compressor.flush()
+
+
 class CompressionManager:
     def __init__(self, default_algorithm=CompressionAlgorithm.GZIP):
+        if not self.is_available(default_algorithm):
+            logger.warning(f"⚠ 压缩算法 {default_algorithm.value} 不可用（未安装对应库），改用gzip")
+            default_algorithm = CompressionAlgorithm.GZIP
         self.default_algorithm = default_algorithm
+        # zstd压缩/解压上下文不能跨线程共享，每个线程各持一份
+        self.local = threading.local()
         logger.info(f"压缩管理器初始化，默认算法: {default_algorithm.value}")
 
-    def compress(self, data, algorithm=None):
+    @staticmethod
+    def is_available(algorithm):
+        """编码是否可用（zstd/lz4依赖可选库）"""
+        if algorithm == CompressionAlgorithm.ZSTD:
+            return zstandard is not None
+        if algorithm == CompressionAlgorithm.LZ4:
+            return lz4_frame is not None
+        return True
+
+    def _zstd_compressor(self, level):
+        compressors = self.local.__dict__.setdefault('zstd_compressors', {})
+        if level not in compressors:
+            compressors[level] = zstandard.ZstdCompressor(level=level)
+        return compressors[level]
+
+    def _zstd_decompressor(self):
+        if not hasattr(self.local, 'zstd_decompressor'):
+            self.local.zstd_decompressor = zstandard.ZstdDecompressor()
+        return self.local.zstd_decompressor
+
+    def compress(self, data, algorithm=None, level=None):
         """压缩数据"""
         if algorithm is None:
             algorithm = self.default_algorithm
@@ -29,10 +184,19 @@ class CompressionManager:
             return data, algorithm
 
         try:
+            if not self.is_available(algorithm):
+                raise ValueError(f"压缩算法不可用（未安装对应库）: {algorithm.value}")
+            if level is None:
+                level = DEFAULT_LEVELS[algorithm]
+
             if algorithm == CompressionAlgorithm.GZIP:
-                compressed = gzip.compress(data)
+                compressed = gzip.compress(data, compresslevel=level)
             elif algorithm == CompressionAlgorithm.ZLIB:
-                compressed = zlib.compress(data)
+                compressed = zlib.compress(data, level)
+            elif algorithm == CompressionAlgorithm.ZSTD:
+                compressed = self._zstd_compressor(level).compress(data)
+            elif algorithm == CompressionAlgorithm.LZ4:
+                compressed = lz4_frame.compress(data, compression_level=level)
             else:
                 raise ValueError(f"不支持的压缩算法: {algorithm}")
 
@@ -50,6 +214,23 @@ class CompressionManager:
             logger.error(f"压缩失败: {e}")
             return data, CompressionAlgorithm.NONE
 
+    def compressobj(self, algorithm, level=None):
+        """流式压缩器（compress()/flush()），输出可由 decompress 整体解压"""
+        if level is None:
+            level = DEFAULT_LEVELS[algorithm]
+        if not self.is_available(algorithm):
+            raise ValueError(f"压缩算法不可用（未安装对应库）: {algorithm.value}")
+
+        if algorithm in (CompressionAlgorithm.GZIP, CompressionAlgorithm.ZLIB):
+            wbits = 31 if algorithm == CompressionAlgorithm.GZIP else zlib.MAX_WBITS
+            return zlib.compressobj(level, zlib.DEFLATED, wbits)
+        if algorithm == CompressionAlgorithm.ZSTD:
+            # 独立的压缩上下文：流式压缩期间同一线程仍可做整块压缩
+            return zstandard.ZstdCompressor(level=level).compressobj()
+        if algorithm == CompressionAlgorithm.LZ4:
+            return _LZ4StreamCompressor(level)
+        raise ValueError(f"不支持的压缩算法: {algorithm}")
+
     def decompress(self, data, algorithm):
         """解压数据"""
         if algorithm == CompressionAlgorithm.NONE or not data:
@@ -60,6 +241,19 @@ class CompressionManager:
                 decompressed = gzip.decompress(data)
             elif algorithm == CompressionAlgorithm.ZLIB:
                 decompressed = zlib.decompress(data)
+            elif algorithm == CompressionAlgorithm.ZSTD:
+                if zstandard is None:
+                    raise ValueError("zstd不可用（未安装zstandard）")
+                decompressor = self._zstd_decompressor()
+                try:
+                    decompressed = decompressor.decompress(data)
+                except zstandard.ZstdError:
+                    # 流式压缩的帧头部不带原始长度，改用流式解压
+                    decompressed = decompressor.decompressobj().decompress(data)
+            elif algorithm == CompressionAlgorithm.LZ4:
+                if lz4_frame is None:
+                    raise ValueError("lz4不可用（未安装lz4）")
+                decompressed = lz4_frame.decompress(data)
             else:
                 raise ValueError(f"不支持的压缩算法: {algorithm}")
 
@@ -70,6 +264,46 @@ class CompressionManager:
             logger.error(f"解压失败: {e}")
             return data
 
+    @staticmethod
+    def filter(data, regions, mode):
+        """对张量数据区做字节/位转置，返回带区域表头部的数据；regions 为 [(起点, 长度, 元素宽度)]"""
+        header = FILTER_HEADER.pack(FILTER_MAGIC, FILTER_VERSION, FILTER_IDS[mode], len(regions))
+        table = b''.join(FILTER_REGION.pack(*region) for region in regions)
+        return header + table + _transform_regions(data, regions, mode, inverse=False)
+
+    @staticmethod
+    def unfilter(data):
+        """filter 的逆变换：按头部记录的区域还原原始数据"""
+        magic, version, filter_id, count = FILTER_HEADER.unpack_from(data)
+        mode = FILTERS_BY_ID.get(filter_id)
+        if magic != FILTER_MAGIC or version != FILTER_VERSION or mode is None:
+            raise ValueError(f"无法识别的张量过滤头部 (version={version}, filter={filter_id})")
+        regions = [FILTER_REGION.unpack_from(data, FILTER_HEADER.size + i * FILTER_REGION.size)
+                   for i in range(count)]
+        body = memoryview(data)[FILTER_HEADER.size + count * FILTER_REGION.size:]
+        if mode == TensorFilter.NONE:
+            return bytes(body)
+        return _transform_regions(body, regions, mode, inverse=True)
+
+    def probe(self, sample, codecs, decode_runs=3):
+        """在样本上试压缩各编码，返回 [{'codec', 'ratio', 'decode_seconds'}]（解码耗时取多次最小值）"""
+        results = []
+        for codec in codecs:
+            compressed, algorithm = self.compress(sample, codec.algorithm, codec.level)
+            if algorithm == CompressionAlgorithm.NONE:
+                continue
+            decode_seconds = float('inf')
+            for _ in range(decode_runs):
+                start = time.perf_counter()
+                self.decompress(compressed, algorithm)
+                decode_seconds = min(decode_seconds, time.perf_counter() - start)
+            results.append({
+                'codec': codec,
+                'ratio': len(compressed) / len(sample),
+                'decode_seconds': decode_seconds
+            })
+        return results
+
     def should_compress(self, data, min_savings=0.1):
         """判断是否值得压缩"""
         if not data or len(data) < 1024:  # 小于1KB不压缩
@@ -79,4 +313,106 @@ class CompressionManager:
         test_compressed, _ = self.compress(data[:min(8192, len(data))])
         savings = 1 - (len(test_compressed) / len(data))
 
-        return savings >= min_savings
\ No newline at end of file
+        return savings >= min_savings
+
+
+class CodecSelector:
+    """按对象、按层选择编码
+
+    每个对象在每一层只取一次样本（与 should_compress 一样探测前8KB），试压缩该层的候选编码，
+    以 压缩率 / 层读取带宽 + 每字节解码耗时 估算读出一个原始字节的时间，取最小者；
+    不压缩同样参与比较，所以带宽高的热层倾向解码快的编码或不压缩，带宽低的冷层倾向高压缩率
+    """
+
+    def __init__(self, compression_manager, candidates, read_bandwidth, sample_size=8192,
+                 min_savings=0.1, auto_select=True, max_objects=65536):
+        self.compression_manager = compression_manager
+        self.read_bandwidth = read_bandwidth
+        self.sample_size = sample_size
+        self.min_savings = min_savings
+        self.auto_select = auto_select
+        self.max_objects = max_objects
+        self.fixed = CodecChoice(compression_manager.default_algorithm)
+
+        # 层 -> 可用的候选编码（未安装的可选编码直接跳过）
+        self.candidates = {}
+        for tier, specs in candidates.items():
+            codecs = [parse_codec(spec) for spec in specs]
+            skipped = [codec.name for codec in codecs if not compression_manager.is_available(codec.algorithm)]
+            if skipped:
+                logger.info(f"{tier}层候选编码不可用（未安装对应库），跳过: {', '.join(skipped)}")
+            self.candidates[tier] = [codec for codec in codecs
+                                     if compression_manager.is_available(codec.algorithm)]
+
+        self.lock = threading.Lock()
+        self.choices = OrderedDict()  # (对象名, 层) -> CodecChoice，LRU
+        self.stats = {
+            'probes': 0,
+            'cached': 0,
+            'choices': {}  # "层:编码" -> 选中次数
+        }
+
+    def select(self, name, data, tier, sample_size=None):
+        """对象在某一层的编码；关闭自动选择或该层没有候选时返回固定编码
+
+        sample_size 覆盖配置的采样字节数（张量过滤后的数据需要更长的样本）
+        """
+        if not self.auto_select or not self.candidates.get(tier):
+            return self.fixed
+
+        key = (name, tier)
+        with self.lock:
+            codec = self.choices.get(key)
+            if codec is not None:
+                self.choices.move_to_end(key)
+                self.stats['cached'] += 1
+                return codec
+
+        codec = self._probe(bytes(memoryview(data)[:sample_size or self.sample_size]), tier)
+        with self.lock:
+            self.choices[key] = codec
+            while len(self.choices) > self.max_objects:
+                self.choices.popitem(last=False)
+            self.stats['probes'] += 1
+            label = f"{tier}:{codec.name}"
+            self.stats['choices'][label] = self.stats['choices'].get(label, 0) + 1
+        logger.debug(f"编码选择: {name} @ {tier} -> {codec.name}")
+        return codec
+
+    def _probe(self, sample, tier):
+        bandwidth = self.read_bandwidth[tier]
+        best = CodecChoice(CompressionAlgorithm.NONE)
+        if not sample:
+            return best
+
+        best_cost = 1 / bandwidth
+        for result in self.compression_manager.probe(sample, self.candidates[tier]):
+            if 1 - result['ratio'] < self.min_savings:
+                continue
+            cost = result['ratio'] / bandwidth + result['decode_seconds'] / len(sample)
+            if cost < best_cost:
+                best, best_cost = result['codec'], cost
+        return best
+
+    def cached(self, name, tier):
+        """已选定的编码，尚未采样返回None"""
+        with self.lock:
+            return self.choices.get((name, tier))
+
+    def forget(self, name):
+        """对象被覆盖写入：丢弃各层的选择，下次写入重新采样"""
+        with self.lock:
+            for tier in self.candidates:
+                self.choices.pop((name, tier), None)
+
+    def get_stats(self):
+        """获取编码选择统计"""
+        with self.lock:
+            return {
+                'probes': self.stats['probes'],
+                'cached': self.stats['cached'],
+                'objects': len(self.choices),
+                'choices': dict(self.stats['choices']),
+                'candidates': {tier: [codec.name for codec in codecs]
+                               for tier, codecs in self.candidates.items()}
+            }
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# aat_content_store.py
+"""
+AAT内容寻址存储
+数据按定长分片计算内容摘要，相同内容只存一份；每个文件只保存一个按顺序引用分片摘要的清单。
+热层数据块与冷层分片共用同一摘要函数，微调产生的各版本检查点中未改动的张量不再重复占用容量
+
+冷层布局：
+  cas/<摘要前2位>/<摘要>  分片对象（元数据记录压缩方式与张量过滤）
+  <文件名>                 清单对象（元数据标记为分片布局）
+
+版本化检查点：清单中的分片条目可以是相对父版本对应分片的差分（按位异或后压缩），
+条目内固定引用基准分片条目，父文件之后被覆盖也不影响解码；差分链过长时由后台重定基为完整分片；
+重定基或覆盖写入后不再被任何清单引用的分片由后台垃圾回收删除
+  完整分片条目: "<摘要>"
+  差分分片条目: {"id": 完整内容摘要, "delta": 差分分片摘要, "base": 基准条目, "depth": 链长}
+"""
+
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from aat_checkpoint_writer import CODEC_METADATA_KEY
+from aat_compression import CompressionAlgorithm, TensorFilter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-ContentStore")
+
+CHUNK_PREFIX = "cas/"
+
+# 对象元数据中记录存储布局
+LAYOUT_METADATA_KEY = "x-amz-meta-aat-layout"
+CHUNKED_LAYOUT = "chunked"
+
+# 分片压缩前做过字节/位转置时记录过滤方式，解码时先解压再逆变换
+FILTER_METADATA_KEY = "x-amz-meta-aat-filter"
+
+# 差分中被改动元素不足该比例时不做张量过滤：稀疏差分转置后零段被打散，反而更难压缩
+DENSE_DELTA_FRACTION = 0.4
+
+
+def chunk_digest(data):
+    """分片内容摘要"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def entry_id(entry):
+    """分片条目对应的完整内容摘要"""
+    return entry if isinstance(entry, str) else entry['id']
+
+
+def entry_depth(entry):
+    """分片条目的差分链长，完整分片为0"""
+    return 0 if isinstance(entry, str) else entry['depth']
+
+
+def entry_chunks(entry):
+    """解码分片条目需要的全部分片对象摘要，差分条目包含整条基准链"""
+    digests = []
+    while not isinstance(entry, str):
+        digests.append(entry['delta'])
+        entry = entry['base']
+    digests.append(entry)
+    return digests
+
+
+def xor_bytes(data, base):
+    """按位异或；基准较短时超出部分视为0，较长时截断"""
+    out = np.frombuffer(data, dtype=np.uint8).copy()
+    overlap = min(len(out), len(base))
+    out[:overlap] ^= np.frombuffer(base, dtype=np.uint8, count=overlap)
+    return out.data
+
+
+def changed_fraction(delta, regions):
+    """差分在各张量数据区内非零元素（即被改动元素）的比例"""
+    buffer = np.frombuffer(delta, dtype=np.uint8)
+    changed = total = 0
+    for start, size, itemsize in regions:
+        changed += np.count_nonzero(buffer[start:start + size].reshape(-1, itemsize).any(axis=1))
+        total += size // itemsize
+    return changed / total if total else 0.0
+
+
+class ColdChunkStore:
+    """冷层内容寻址分片存储 - 分片去重写入、清单读写、按范围并行读取"""
+
+    def __init__(self, storage_manager, chunk_size=4 * 1024 * 1024, max_known_chunks=100000, cache_bytes=0,
+                 tensor_filter=TensorFilter.NONE):
+        self.manager = storage_manager
+        self.chunk_size = chunk_size
+        self.tensor_filter = tensor_filter
+
+        # 已解码分片缓存：内容摘要 -> 数据，差分写入时父版本分片多数可直接命中
+        self.decoded = OrderedDict()
+        self.decoded_bytes = 0
+        self.cache_bytes = cache_bytes
+
+        # 已确认存在的分片摘要，省去重复的stat请求
+        self.known_chunks = set()
+        self.max_known_chunks = max_known_chunks
+        self.lock = threading.Lock()
+
+        # 垃圾回收：不可达分片摘要 -> 首次发现不可达的时间
+        self.unreachable = {}
+
+        self.stats = {
+            'chunks_written': 0,
+            'chunks_deduplicated': 0,
+            'bytes_written': 0,
+            'bytes_deduplicated': 0,
+            'delta_chunks': 0,
+            'delta_bytes_saved': 0,
+            'filtered_chunks': 0,
+            'rebased_files': 0,
+            'gc_runs': 0,
+            'chunks_collected': 0,
+            'bytes_collected': 0
+        }
+
+    @staticmethod
+    def chunk_name(digest):
+        """分片对象名"""
+        return f"{CHUNK_PREFIX}{digest[:2]}/{digest}"
+
+    @staticmethod
+    def is_chunked(metadata):
+        """对象元数据是否标记为分片布局"""
+        return (metadata or {}).get(LAYOUT_METADATA_KEY) == CHUNKED_LAYOUT
+
+    def _remember(self, digest):
+        with self.lock:
+            if len(self.known_chunks) >= self.max_known_chunks:
+                self.known_chunks.clear()
+            self.known_chunks.add(digest)
+
+    def _touch(self, entry):
+        """写入方引用了这些分片：重新计算其不可达宽限期，清单写入前不会被回收"""
+        with self.lock:
+            for digest in entry_chunks(entry):
+                self.unreachable.pop(digest, None)
+
+    def has_chunk(self, digest):
+        """分片是否已存在于冷层"""
+        if digest in self.known_chunks:
+            return True
+
+        manager = self.manager
+        try:
+            manager._guarded_call(
+                manager.minio_breaker, manager.minio_client.stat_object,
+                manager.bucket_name, self.chunk_name(digest))
+        except manager.answered_errors:
+            return False
+        self._remember(digest)
+        return True
+
+    def _encode(self, data, algorithm, level, regions=None):
+        """压缩分片，无收益时返回原始数据；返回 (负载, 编码方式, 是否经过张量过滤)
+
+        regions 为分片内张量数据区 [(起点, 长度, 元素宽度)]，压缩前按配置的方式转置
+        """
+        if algorithm != CompressionAlgorithm.NONE:
+            compression_manager = self.manager.compression_manager
+            filtered = bool(regions) and self.tensor_filter != TensorFilter.NONE
+            source = compression_manager.filter(data, regions, self.tensor_filter) if filtered else data
+            compressed, codec = compression_manager.compress(source, algorithm, level)
+            if codec != CompressionAlgorithm.NONE and len(compressed) < len(data):
+                return compressed, codec, filtered
+        return data, CompressionAlgorithm.NONE, False
+
+    def _upload(self, digest, payload, codec, filtered=False):
+        """上传分片对象"""
+        manager = self.manager
+        metadata = {CODEC_METADATA_KEY: codec.value}
+        if filtered:
+            metadata[FILTER_METADATA_KEY] = self.tensor_filter.value
+        manager._guarded_call(
+            manager.minio_breaker, manager.minio_client.put_object,
+            manager.bucket_name, self.chunk_name(digest), io.BytesIO(payload), len(payload),
+            metadata=metadata)
+        self._remember(digest)
+        with self.lock:
+            self.stats['chunks_written'] += 1
+            self.stats['bytes_written'] += len(payload)
+            if filtered:
+                self.stats['filtered_chunks'] += 1
+
+    def put_chunk(self, data, algorithm=CompressionAlgorithm.NONE, level=1, regions=None):
+        """写入一个分片（已存在则跳过），返回 (摘要, 实际上传字节数)"""
+        digest = chunk_digest(data)
+        self.cache_chunk(digest, data)
+        self._touch(digest)
+        if self.has_chunk(digest):
+            with self.lock:
+                self.stats['chunks_deduplicated'] += 1
+                self.stats['bytes_deduplicated'] += len(data)
+            return digest, 0
+
+        payload, codec, filtered = self._encode(data, algorithm, level, regions)
+        self._upload(digest, payload, codec, filtered)
+        return digest, len(payload)
+
+    def put_delta_chunk(self, data, base_entry, algorithm=CompressionAlgorithm.ZLIB, level=1, max_ratio=0.5,
+                        regions=None):
+        """相对基准分片写入差分，返回 (分片条目, 实际上传字节数)
+
+        内容与基准相同时直接引用基准条目；差分压缩后超过原始大小的 max_ratio 时改存完整分片
+        """
+        chunk_id = chunk_digest(data)
+        self._touch(base_entry)
+        if chunk_id == entry_id(base_entry):
+            with self.lock:
+                self.stats['chunks_deduplicated'] += 1
+                self.stats['bytes_deduplicated'] += len(data)
+            return base_entry, 0
+
+        delta = xor_bytes(data, self.read_entry(base_entry))
+        if algorithm == CompressionAlgorithm.NONE:
+            algorithm = CompressionAlgorithm.ZLIB  # 差分大部分为0，不压缩没有意义
+        # 差分与原分片逐字节对齐，稠密差分（如全量微调）同样按张量数据区转置
+        dense = regions and changed_fraction(delta, regions) >= DENSE_DELTA_FRACTION
+        payload, codec, filtered = self._encode(delta, algorithm, level, regions if dense else None)
+        if len(payload) > len(data) * max_ratio:
+            return self.put_chunk(data, algorithm, level, regions)
+
+        self.cache_chunk(chunk_id, data)
+        delta_digest = chunk_digest(delta)
+        self._touch(delta_digest)
+        uploaded = 0
+        if not self.has_chunk(delta_digest):
+            self._upload(delta_digest, payload, codec, filtered)
+            uploaded = len(payload)
+        with self.lock:
+            self.stats['delta_chunks'] += 1
+            self.stats['delta_bytes_saved'] += len(data) - len(payload)
+
+        entry = {'id': chunk_id, 'delta': delta_digest, 'base': base_entry, 'depth': entry_depth(base_entry) + 1}
+        return entry, uploaded
+
+    def put_manifest(self, filename, size, entries, parent=None, chunk_size=None):
+        """写入清单对象，文件此时才对读者可见；返回最长差分链长"""
+        depth = max((entry_depth(entry) for entry in entries), default=0)
+        body = json.dumps({
+            'size': size,
+            'chunk_size': chunk_size or self.chunk_size,
+            'chunks': entries,
+            'parent': parent,
+            'depth': depth,
+            'created': time.time()
+        }).encode()
+
+        manager = self.manager
+        manager._guarded_call(
+            manager.minio_breaker, manager.minio_client.put_object,
+            manager.bucket_name, filename, io.BytesIO(body), len(body),
+            metadata={CODEC_METADATA_KEY: CompressionAlgorithm.NONE.value, LAYOUT_METADATA_KEY: CHUNKED_LAYOUT})
+        return depth
+
+    def _get(self, object_name):
+        """读取整个对象，返回 (数据, 响应头)"""
+        manager = self.manager
+        response = manager._guarded_call(
+            manager.minio_breaker, manager.minio_client.get_object, manager.bucket_name, object_name)
+        try:
+            return response.read(), response.headers
+        finally:
+            response.close()
+            response.release_conn()
+
+    def get_manifest(self, filename):
+        """读取清单"""
+        body, _ = self._get(filename)
+        return json.loads(body)
+
+    def get_entries(self, filename):
+        """分片布局文件的分片条目列表；文件不存在或不是分片布局返回None"""
+        manager = self.manager
+        try:
+            stat = manager._guarded_call(
+                manager.minio_breaker, manager.minio_client.stat_object, manager.bucket_name, filename)
+            if not self.is_chunked(stat.metadata):
+                return None
+            manifest = self.get_manifest(filename)
+        except manager.answered_errors:
+            return None
+        if manifest['chunk_size'] != self.chunk_size:
+            return None
+        return manifest['chunks']
+
+    def read_chunk(self, digest):
+        """读取并解码单个分片对象"""
+        data, headers = self._get(self.chunk_name(digest))
+        data = self.manager._decode_cold_object(data, headers.get(CODEC_METADATA_KEY))
+        if headers.get(FILTER_METADATA_KEY):
+            data = self.manager.compression_manager.unfilter(data)
+        return data
+
+    def read_entry(self, entry):
+        """读取分片条目的完整内容，差分条目沿链解码并校验"""
+        chunk_id = entry_id(entry)
+        data = self._cached(chunk_id)
+        if data is not None:
+            return data
+
+        if isinstance(entry, str):
+            data = self.read_chunk(entry)
+        else:
+            data = xor_bytes(self.read_chunk(entry['delta']), self.read_entry(entry['base']))
+            if chunk_digest(data) != chunk_id:
+                raise IOError(f"差分分片解码校验失败: {chunk_id}")
+        self.cache_chunk(chunk_id, data)
+        return data
+
+    def cache_chunk(self, chunk_id, data):
+        """放入已解码分片缓存"""
+        if len(data) > self.cache_bytes:
+            return
+        with self.lock:
+            if chunk_id in self.decoded:
+                self.decoded.move_to_end(chunk_id)
+                return
+            self.decoded[chunk_id] = bytes(data)
+            self.decoded_bytes += len(data)
+            while self.decoded_bytes > self.cache_bytes:
+                _, evicted = self.decoded.popitem(last=False)
+                self.decoded_bytes -= len(evicted)
+
+    def _cached(self, chunk_id):
+        with self.lock:
+            data = self.decoded.get(chunk_id)
+            if data is not None:
+                self.decoded.move_to_end(chunk_id)
+            return data
+
+    def rebase(self, filename, algorithm=CompressionAlgorithm.NONE, level=1):
+        """把差分分片物化为完整分片，截断差分链；文件期间被重写则放弃"""
+        manifest = self.get_manifest(filename)
+        if manifest['depth'] == 0:
+            return False
+
+        entries = []
+        for entry in manifest['chunks']:
+            if isinstance(entry, str):
+                entries.append(entry)
+            else:
+                digest, _ = self.put_chunk(self.read_entry(entry), algorithm, level)
+                entries.append(digest)
+
+        if self.get_manifest(filename)['created'] != manifest['created']:
+            logger.info(f"重定基期间文件已被重写，放弃: {filename}")
+            return False
+
+        self.put_manifest(filename, manifest['size'], entries, manifest.get('parent'), manifest['chunk_size'])
+        with self.lock:
+            self.stats['rebased_files'] += 1
+        logger.info(f"✓ 差分链重定基完成: {filename} (原链长 {manifest['depth']})")
+        return True
+
+    def collect_garbage(self, grace_seconds=3600):
+        """回收不被任何清单引用的分片（标记-清除），返回删除的分片数
+
+        标记：遍历桶内分片布局的清单，差分条目沿基准链标记；
+        清除：分片持续不可达超过宽限期才删除，写入中尚未写清单、或宽限期内又被写入方引用的分片因此保留；
+        任一清单读取失败时抛出异常，本轮不删除任何分片
+        """
+        manager = self.manager
+        objects = manager._guarded_call(
+            manager.minio_breaker,
+            lambda: list(manager.minio_client.list_objects(manager.bucket_name, recursive=True)))
+
+        chunks, reachable = {}, set()
+        for obj in objects:
+            name = obj.object_name
+            if name.startswith(CHUNK_PREFIX):
+                chunks[name.rsplit('/', 1)[-1]] = obj.size
+                continue
+            try:
+                stat = manager._guarded_call(
+                    manager.minio_breaker, manager.minio_client.stat_object, manager.bucket_name, name)
+                if not self.is_chunked(stat.metadata):
+                    continue
+                manifest = self.get_manifest(name)
+            except manager.answered_errors:
+                continue  # 列出后被删除
+            for entry in manifest['chunks']:
+                reachable.update(entry_chunks(entry))
+
+        now = time.time()
+        doomed = []
+        with self.lock:
+            # 已删除或重新可达的分片不再计时
+            self.unreachable = {digest: since for digest, since in self.unreachable.items()
+                                if digest in chunks and digest not in reachable}
+            for digest in chunks:
+                if digest in reachable:
+                    continue
+                since = self.unreachable.setdefault(digest, now)
+                if now - since >= grace_seconds:
+                    doomed.append(digest)
+                    del self.unreachable[digest]
+                    self.known_chunks.discard(digest)
+
+        collected = collected_bytes = 0
+        for digest in doomed:
+            try:
+                manager._guarded_call(
+                    manager.minio_breaker, manager.minio_client.remove_object,
+                    manager.bucket_name, self.chunk_name(digest))
+            except manager.answered_errors:
+                continue
+            collected += 1
+            collected_bytes += chunks[digest]
+
+        with self.lock:
+            self.stats['gc_runs'] += 1
+            self.stats['chunks_collected'] += collected
+            self.stats['bytes_collected'] += collected_bytes
+        logger.info(f"♻ 冷层分片回收: 可达 {len(reachable)} 个, 待回收 {len(self.unreachable)} 个, "
+                    f"删除 {collected} 个 ({collected_bytes / 1024 / 1024:.2f}MB)")
+        return collected
+
+    def read(self, filename, size=None, offset=0, manifest=None):
+        """读取分片布局的对象；size为None时读到末尾。覆盖到的分片并行拉取"""
+        manifest = manifest or self.get_manifest(filename)
+        total = manifest['size']
+        end = total if size is None else min(offset + size, total)
+        if offset >= end:
+            return b''
+
+        chunk_size = manifest['chunk_size']
+        first, last = offset // chunk_size, (end - 1) // chunk_size
+        chunks = list(self.manager.cold_fetch_executor.map(self.read_entry, manifest['chunks'][first:last + 1]))
+
+        start = offset - first * chunk_size
+        stop = end - first * chunk_size
+        if len(chunks) == 1:
+            return memoryview(chunks[0])[start:stop]
+        return memoryview(b''.join(chunks))[start:stop]
+
+    def get_stats(self):
+        """获取去重统计"""
+        total = self.stats['bytes_written'] + self.stats['bytes_deduplicated']
+        return {
+            **self.stats,
+            'dedup_ratio': self.stats['bytes_deduplicated'] / total if total > 0 else 0,
+            'known_chunks': len(self.known_chunks),
+            'decoded_cache_bytes': self.decoded_bytes
+        }
@@ -142,8 +142,7 @@ class AATFinalTester:
         if self.manager.redis_client:
             for file in files:
                 try:
-                    cache_key = f"file:{file}"
-                    self.manager.redis_client.delete(cache_key)
+                    self.manager.evict_from_hot_layer(file)
                 except Exception as e:
                     logger.debug(f"清空缓存 {file} 时忽略错误: {e}")
 
@@ -5,11 +5,14 @@ import logging
 import time
 import stat
 import errno
+import threading
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import fuse
 from aat_storage_manager_v2 import AATStorageManagerV2
+from aat_read_ahead import ReadAhead
+from aat_namespaces import RESERVED_MODELS, make_namespace
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AAT-FUSE-V2")
@@ -28,6 +31,30 @@ class AATFUSEV2(Operations):
         self.files = self._create_virtual_filesystem()
         self.file_data_cache = {}
 
+        # 打开中的流式写入器：文件句柄 -> (路径, 写入器)
+        self.writers = {}
+        # 多线程模式下open/create并发调用，文件句柄在锁内分配
+        self.next_fh = 1
+        self.fh_lock = threading.Lock()
+
+        # 文件内顺序预读：文件句柄 -> 预读流
+        self.read_ahead = self._init_read_ahead()
+        self.streams = {}
+
+    def _init_read_ahead(self):
+        """初始化顺序预读"""
+        config = self.storage_manager.strategy_engine.config['read_ahead']
+        if not config['enabled']:
+            logger.info("顺序预读未启用")
+            return None
+
+        return ReadAhead(
+            block_size=config['block_size'],
+            initial_window=config['initial_window'],
+            max_window=config['max_window'],
+            trigger_reads=config['trigger_reads'],
+            max_workers=config['max_workers'])
+
     def _create_virtual_filesystem(self):
         """创建虚拟文件系统"""
         base_attrs = {
@@ -57,8 +84,22 @@ class AATFUSEV2(Operations):
             '/checkpoint.ckpt': {**base_attrs, 'st_mode': stat.S_IFREG | 0o644, 'st_size': 50 * 1024 * 1024},
         }
 
+        # 命名空间目录：/模型/版本/
+        for namespace in self.storage_manager.list_namespaces():
+            model, version = namespace.split('/')
+            files[f'/{model}'] = {**base_attrs, 'st_mode': stat.S_IFDIR | 0o755, 'st_size': 4096}
+            files[f'/{model}/{version}'] = {**base_attrs, 'st_mode': stat.S_IFDIR | 0o755, 'st_size': 4096}
+
         return files
 
+    @staticmethod
+    def _object_name(path):
+        """FUSE路径 -> 对象名（命名空间目录即对象名前缀）"""
+        return path.lstrip('/')
+
+    def _is_dir(self, path):
+        return path in self.files and stat.S_ISDIR(self.files[path]['st_mode'])
+
     def getattr(self, path, fh=None):
         logger.info(f"getattr: {path}")
         if path in self.files:
@@ -70,16 +111,141 @@ class AATFUSEV2(Operations):
 
     def readdir(self, path, fh):
         logger.info(f"readdir: {path}")
-        if path == '/':
-            return ['.', '..'] + [f[1:] for f in self.files.keys() if f != '/']
-        raise FuseOSError(errno.ENOENT)
+        if not self._is_dir(path):
+            raise FuseOSError(errno.ENOENT)
+        prefix = path.rstrip('/') + '/'
+        return ['.', '..'] + [f[len(prefix):] for f in self.files
+                              if f != path and f.startswith(prefix) and '/' not in f[len(prefix):]]
+
+    def mkdir(self, path, mode):
+        """只允许两级目录：/模型/版本，对应一个命名空间"""
+        logger.info(f"mkdir: {path}")
+        parts = self._object_name(path).split('/')
+        if path in self.files:
+            raise FuseOSError(errno.EEXIST)
+        if len(parts) > 2 or not self._is_dir(os.path.dirname(path)):
+            raise FuseOSError(errno.EPERM)
+        try:
+            if len(parts) == 2:
+                make_namespace(*parts)
+            elif parts[0] in RESERVED_MODELS:
+                raise ValueError(f"保留的模型名: {parts[0]}")
+        except ValueError as e:
+            logger.error(f"非法的命名空间目录 {path}: {e}")
+            raise FuseOSError(errno.EINVAL)
+
+        now = time.time()
+        self.files[path] = {
+            'st_mode': stat.S_IFDIR | 0o755, 'st_size': 4096,
+            'st_ctime': now, 'st_mtime': now, 'st_atime': now, 'st_nlink': 2,
+            'st_uid': os.getuid(), 'st_gid': os.getgid(),
+        }
 
     def open(self, path, flags):
         logger.info(f"open: {path} (flags: {flags})")
         if path not in self.files:
             raise FuseOSError(errno.ENOENT)
-        if flags & 3 != 0:  # 写操作
-            raise FuseOSError(errno.EROFS)
+        if self._is_dir(path):
+            raise FuseOSError(errno.EISDIR)
+        if flags & 3 != 0:  # 写操作：整文件顺序覆盖写
+            return self._open_writer(path)
+        return self._open_reader(path)
+
+    def _allocate_fh(self):
+        """分配一个新的文件句柄"""
+        with self.fh_lock:
+            fh = self.next_fh
+            self.next_fh += 1
+        return fh
+
+    def _open_reader(self, path):
+        """为读打开分配文件句柄，启用预读时为其创建顺序流
+
+        流的文件大小取存储中对象的实际大小（虚拟文件表中的大小可能只是占位值），
+        避免预读越过对象末尾去拉取降级数据；大小未知时才用 st_size
+        """
+        if self.read_ahead is None:
+            return 0
+
+        filename = self._object_name(path)
+        file_size = self.storage_manager.get_object_size(filename)
+        if file_size is None:
+            file_size = self.files[path]['st_size']
+
+        fh = self._allocate_fh()
+        self.streams[fh] = self.read_ahead.open(
+            lambda size, offset: self.storage_manager.get_data(filename, size, offset),
+            file_size, filename)
+        return fh
+
+    def create(self, path, mode, fi=None):
+        logger.info(f"create: {path}")
+        # 文件只能位于根目录（默认命名空间）或 /模型/版本 目录下
+        parent = os.path.dirname(path)
+        if not self._is_dir(parent) or (parent != '/' and parent.count('/') == 1):
+            raise FuseOSError(errno.EPERM)
+        now = time.time()
+        self.files[path] = {
+            'st_mode': stat.S_IFREG | 0o644, 'st_size': 0,
+            'st_ctime': now, 'st_mtime': now, 'st_atime': now, 'st_nlink': 1,
+            'st_uid': os.getuid(), 'st_gid': os.getgid(),
+        }
+        return self._open_writer(path)
+
+    def _open_writer(self, path):
+        """为写打开分配文件句柄并创建流式写入器"""
+        try:
+            writer = self.storage_manager.open_writer(self._object_name(path))
+        except Exception as e:
+            logger.error(f"打开写入失败 {path}: {e}")
+            raise FuseOSError(errno.EIO)
+
+        fh = self._allocate_fh()
+        self.writers[fh] = (path, writer)
+        return fh
+
+    def write(self, path, data, offset, fh):
+        entry = self.writers.get(fh)
+        if entry is None:
+            raise FuseOSError(errno.EBADF)
+
+        writer = entry[1]
+        # 流式写入只支持顺序追加
+        if offset != writer.bytes_written:
+            logger.error(f"不支持非顺序写入 {path}: offset {offset}, 已写入 {writer.bytes_written}")
+            raise FuseOSError(errno.ESPIPE)
+
+        try:
+            return writer.write(data)
+        except Exception as e:
+            logger.error(f"写入失败 {path}: {e}")
+            raise FuseOSError(errno.EIO)
+
+    def truncate(self, path, length, fh=None):
+        # 写入器总是整文件覆盖，只接受截断为0
+        if path not in self.files:
+            raise FuseOSError(errno.ENOENT)
+        if length != 0:
+            raise FuseOSError(errno.EINVAL)
+
+    def release(self, path, fh):
+        stream = self.streams.pop(fh, None)
+        if stream is not None:
+            stream.close()
+            return 0
+
+        entry = self.writers.pop(fh, None)
+        if entry is None:
+            return 0
+
+        writer = entry[1]
+        try:
+            writer.close()
+            self.files[path]['st_size'] = writer.bytes_written
+            self.files[path]['st_mtime'] = time.time()
+        except Exception as e:
+            logger.error(f"写入提交失败 {path}: {e}")
+            raise FuseOSError(errno.EIO)
         return 0
 
     def read(self, path, size, offset, fh):
@@ -88,11 +254,18 @@ class AATFUSEV2(Operations):
         if path not in self.files:
             raise FuseOSError(errno.ENOENT)
 
-        filename = os.path.basename(path)
+        filename = self._object_name(path)
 
         try:
-            # 使用智能存储管理器获取数据
-            data = self.storage_manager.get_data(filename, size, offset)
+            # 顺序流由预读缓冲满足，其余使用智能存储管理器获取数据
+            stream = self.streams.get(fh)
+            if stream is not None:
+                data = stream.read(size, offset)
+            else:
+                data = self.storage_manager.get_data(filename, size, offset)
+            # 冷层并行拉取等路径返回bytearray，FUSE回调需要bytes
+            if not isinstance(data, bytes):
+                data = bytes(data)
             logger.info(f"✓ 返回数据: {len(data)} bytes")
             return data
 
@@ -100,6 +273,12 @@ class AATFUSEV2(Operations):
             logger.error(f"读取失败 {path}: {e}")
             return b''
 
+    def destroy(self, path):
+        """卸载：停止预读线程池"""
+        if self.read_ahead is not None:
+            logger.info(f"顺序预读统计: {self.read_ahead.get_stats()}")
+            self.read_ahead.close()
+
     def statfs(self, path):
         return {
             'f_bsize': 4096,
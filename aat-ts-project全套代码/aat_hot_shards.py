@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+# aat_hot_shards.py
+"""
+AAT热层分片
+按一致性哈希（带虚拟节点）把热层的键分布到多个Redis实例上，
+对热层代码呈现单个Redis客户端的接口；成员变化时只迁移归属改变的键；
+每个分片有独立的熔断器，一个分片故障时只有落在该分片上的读取按未命中处理，其余分片照常服务
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aat_backend_health import CircuitBreaker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-HotShards")
+
+# 热层代码写入的所有键都以此开头（清单、数据块、内容寻址块）
+HOT_KEY_PATTERN = "file:*"
+
+
+def _key_hash(key):
+    """键 -> 64位哈希"""
+    if isinstance(key, str):
+        key = key.encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+
+def _key_list(keys, args):
+    """兼容 mget(keys) 与 mget(k1, k2, ...) 两种调用方式"""
+    if isinstance(keys, (str, bytes)):
+        return [keys, *args]
+    return [*keys, *args]
+
+
+# 流水线中写命令的占位：所在分片不可用时整条流水线失败，读命令则按未命中处理
+_WRITE = object()
+
+
+class ShardError(ConnectionError):
+    """单个分片熔断中或调用失败 - 已计入该分片的熔断器，不应再计入整个热层的熔断器"""
+
+    def __init__(self, node, error):
+        super().__init__(f"热层分片 {node} 不可用: {error}")
+        self.node = node
+
+
+def parse_endpoint(endpoint):
+    """'host:port' -> (host, port)"""
+    host, _, port = endpoint.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+class ConsistentHashRing:
+    """一致性哈希环 - 每个节点放置若干虚拟节点，增删节点只影响相邻区间的键"""
+
+    def __init__(self, nodes=(), virtual_nodes=160):
+        self.virtual_nodes = virtual_nodes
+        self.lock = threading.Lock()
+        # (有序的虚拟节点哈希, 对应的节点)：增删节点时构建新的数组，以一次赋值整体发布，读者不加锁
+        self.table = ((), ())
+        self.members = frozenset()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return sorted(self.members)
+
+    def _publish(self, members):
+        """按成员重建虚拟节点数组并整体替换（持锁调用）"""
+        placed = sorted((_key_hash(f"{node}#{replica}"), node)
+                        for node in members for replica in range(self.virtual_nodes))
+        self.table = (tuple(point for point, _ in placed), tuple(owner for _, owner in placed))
+        self.members = frozenset(members)
+
+    def add(self, node):
+        """加入节点，已存在返回False"""
+        with self.lock:
+            if node in self.members:
+                return False
+            self._publish(self.members | {node})
+            return True
+
+    def remove(self, node):
+        """移除节点，不存在返回False"""
+        with self.lock:
+            if node not in self.members:
+                return False
+            self._publish(self.members - {node})
+            return True
+
+    def node_for(self, key):
+        """键所属的节点：顺时针方向的第一个虚拟节点"""
+        points, owners = self.table
+        if not points:
+            raise LookupError("哈希环为空，没有可用的热层分片")
+        index = bisect.bisect(points, _key_hash(key))
+        return owners[index % len(owners)]
+
+    def group(self, keys):
+        """按节点分组：{节点: [(原位置, 键)]}"""
+        groups = {}
+        for position, key in enumerate(keys):
+            groups.setdefault(self.node_for(key), []).append((position, key))
+        return groups
+
+
+class _ShardedPipeline:
+    """分片流水线 - 命令按键拆到各分片的流水线，execute时各分片并行执行后按原顺序拼回
+
+    transaction=True 时每个分片内部是事务，跨分片不保证原子性（热层写入本来就允许部分可见前被清单兜底）
+    """
+
+    def __init__(self, client, transaction):
+        self.client = client
+        self.transaction = transaction
+        self.pipes = {}  # 节点 -> 该分片的流水线
+        self.fallbacks = {}  # 节点 -> 各命令在分片不可用时的结果（写命令为 _WRITE）
+        self.commands = []  # (命令, [(节点, 分片内序号, 子键位置)])
+
+    def _queue(self, node, fallback, method, *args):
+        pipe = self.pipes.get(node)
+        if pipe is None:
+            pipe = self.pipes[node] = self.client.shard(node).pipeline(transaction=self.transaction)
+            self.fallbacks[node] = []
+        getattr(pipe, method)(*args)
+        self.fallbacks[node].append(fallback)
+        return len(self.fallbacks[node]) - 1
+
+    def _single(self, command, fallback, key, *args):
+        node = self.client.ring.node_for(key)
+        self.commands.append((command, [(node, self._queue(node, fallback, command, key, *args), None)]))
+        return self
+
+    def _fan_out(self, command, keys, fallback):
+        """多键命令：每个分片排一条只含本分片键的同名命令；fallback(键数) 为分片不可用时的结果"""
+        parts = []
+        for node, members in self.client.ring.group(keys).items():
+            index = self._queue(node, fallback(len(members)), command, *[key for _, key in members])
+            parts.append((node, index, [position for position, _ in members]))
+        self.commands.append((command, parts, len(keys)))
+        return self
+
+    def get(self, key):
+        return self._single('get', None, key)
+
+    def set(self, key, value, ex=None):
+        return self._single('set', _WRITE, key, value, ex)
+
+    def setex(self, key, ttl, value):
+        return self._single('setex', _WRITE, key, ttl, value)
+
+    def expire(self, key, ttl):
+        return self._single('expire', _WRITE, key, ttl)
+
+    def incrby(self, key, amount=1):
+        return self._single('incrby', _WRITE, key, amount)
+
+    def mget(self, keys, *args):
+        return self._fan_out('mget', _key_list(keys, args), lambda count: [None] * count)
+
+    def delete(self, *keys):
+        return self._fan_out('delete', keys, lambda count: _WRITE)
+
+    def exists(self, *keys):
+        return self._fan_out('exists', keys, lambda count: 0)
+
+    def _take(self):
+        pipes, commands, fallbacks = self.pipes, self.commands, self.fallbacks
+        self.pipes, self.fallbacks, self.commands = {}, {}, []
+        return pipes, commands, fallbacks
+
+    @staticmethod
+    def _degrade(results, fallbacks):
+        """不可用分片上只排了读命令时按未命中处理，排了写命令则抛出"""
+        for node, result in results.items():
+            if isinstance(result, ShardError):
+                if any(fallback is _WRITE for fallback in fallbacks[node]):
+                    raise result
+                results[node] = fallbacks[node]
+        return results
+
+    @staticmethod
+    def _assemble(commands, results):
+        replies = []
+        for command in commands:
+            name, parts = command[0], command[1]
+            if name == 'mget':
+                values = [None] * command[2]
+                for node, index, positions in parts:
+                    for position, value in zip(positions, results[node][index]):
+                        values[position] = value
+                replies.append(values)
+            elif name in ('delete', 'exists'):
+                replies.append(sum(results[node][index] for node, index, _ in parts))
+            else:
+                node, index, _ = parts[0]
+                replies.append(results[node][index])
+        return replies
+
+    def execute(self):
+        pipes, commands, fallbacks = self._take()
+        results = self.client.run_on_shards(
+            {node: pipe.execute for node, pipe in pipes.items()}, return_errors=True)
+        return self._assemble(commands, self._degrade(results, fallbacks))
+
+
+class ShardedRedisClient:
+    """分片Redis客户端 - 对热层代码呈现单个Redis客户端的接口，每个分片经各自的熔断器访问"""
+
+    def __init__(self, ring, clients, failure_threshold=5, reset_timeout=10.0):
+        self.ring = ring
+        self.clients = dict(clients)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {node: self._new_breaker(node) for node in self.clients}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="aat-shard")
+        self.stats = {
+            'rebalances': 0,
+            'keys_moved': 0,
+            'bytes_moved': 0,
+            'last_rebalance_ms': 0.0
+        }
+
+    def shard(self, node):
+        return self.clients[node]
+
+    def _new_breaker(self, node):
+        return CircuitBreaker(f"redis:{node}", self.failure_threshold, self.reset_timeout)
+
+    def breaker(self, node):
+        """分片的熔断器"""
+        breaker = self.breakers.get(node)
+        if breaker is None:
+            breaker = self.breakers.setdefault(node, self._new_breaker(node))
+        return breaker
+
+    def _guarded(self, node, call):
+        """经分片的熔断器调用：熔断中直接失败，失败只计入该分片"""
+        breaker = self.breaker(node)
+        if not breaker.allow():
+            raise ShardError(node, "熔断中")
+        try:
+            result = call()
+        except Exception as e:
+            breaker.record_failure(e)
+            raise ShardError(node, e) from e
+        breaker.record_success()
+        return result
+
+    def run_on_shards(self, calls, return_errors=False):
+        """{节点: 无参调用} -> {节点: 结果}，多个分片时并行执行
+
+        return_errors 为True时，不可用分片的结果为 ShardError 而不是抛出
+        """
+        def run(node, call):
+            try:
+                return self._guarded(node, call)
+            except ShardError as e:
+                if return_errors:
+                    return e
+                raise
+
+        if len(calls) <= 1:
+            return {node: run(node, call) for node, call in calls.items()}
+        futures = {node: self.executor.submit(run, node, call) for node, call in calls.items()}
+        return {node: future.result() for node, future in futures.items()}
+
+    def _call(self, key, method, *args, **kwargs):
+        """在键所属的分片上调用单键命令"""
+        node = self.ring.node_for(key)
+        client = self.clients[node]
+        return self._guarded(node, lambda: getattr(client, method)(*args, **kwargs))
+
+    def get(self, key):
+        try:
+            return self._call(key, 'get', key)
+        except ShardError:
+            return None  # 不可用分片上的读取按未命中处理
+
+    def set(self, key, value, ex=None):
+        return self._call(key, 'set', key, value, ex=ex)
+
+    def setex(self, key, ttl, value):
+        return self._call(key, 'setex', key, ttl, value)
+
+    def expire(self, key, ttl):
+        return self._call(key, 'expire', key, ttl)
+
+    def incrby(self, key, amount=1):
+        return self._call(key, 'incrby', key, amount)
+
+    def mget(self, keys, *args):
+        return self.pipeline(transaction=False).mget(keys, *args).execute()[0]
+
+    def delete(self, *keys):
+        return self.pipeline(transaction=False).delete(*keys).execute()[0]
+
+    def exists(self, *keys):
+        return self.pipeline(transaction=False).exists(*keys).execute()[0]
+
+    def pipeline(self, transaction=True):
+        return _ShardedPipeline(self, transaction)
+
+    def ping(self):
+        """任一分片可达即可用；不可达的分片由各自的熔断器隔离"""
+        results = self.run_on_shards(
+            {node: client.ping for node, client in self.clients.items()}, return_errors=True)
+        if all(isinstance(result, ShardError) for result in results.values()):
+            raise next(iter(results.values()))
+        return True
+
+    def probe(self):
+        """探测未闭合熔断器的分片（健康检查调用），恢复的分片重新承接读写"""
+        for node, client in list(self.clients.items()):
+            if self.breaker(node).state != CircuitBreaker.CLOSED:
+                try:
+                    self._guarded(node, client.ping)
+                except ShardError:
+                    pass
+
+    def info(self, section=None):
+        """汇总可达分片的内存信息；任一分片不设上限则总上限视为不限"""
+        results = self.run_on_shards(
+            {node: (lambda client=client: client.info(section)) for node, client in self.clients.items()},
+            return_errors=True)
+        infos = {node: info for node, info in results.items() if not isinstance(info, ShardError)}
+        if not infos:
+            raise next(iter(results.values()))
+        max_memory = [info.get('maxmemory', 0) for info in infos.values()]
+        return {
+            'used_memory': sum(info.get('used_memory', 0) for info in infos.values()),
+            'maxmemory': sum(max_memory) if all(max_memory) else 0,
+            'shards': len(infos)
+        }
+
+    def add_shard(self, node, client):
+        """加入分片并迁移归属改变的键"""
+        with self.lock:
+            self.clients[node] = client
+            if not self.ring.add(node):
+                return 0
+            logger.info(f"⇅ 热层分片加入: {node}，开始重新平衡")
+            return self._rebalance()
+
+    def remove_shard(self, node):
+        """移除分片：先从环上摘除，再把它持有的键迁到新的归属分片"""
+        with self.lock:
+            if self.ring.members == {node}:
+                logger.warning(f"⚠ 不能移除最后一个热层分片: {node}")
+                return 0
+            if not self.ring.remove(node):
+                return 0
+            logger.info(f"⇅ 热层分片移除: {node}，开始迁出数据")
+            client = self.clients[node]
+            try:
+                moved = self._rebalance()
+            finally:
+                del self.clients[node]
+                self.breakers.pop(node, None)
+                client.close()
+            return moved
+
+    def rebalance(self):
+        """扫描所有分片，把不属于该分片的键迁到归属分片"""
+        with self.lock:
+            return self._rebalance()
+
+    def _rebalance(self, batch_size=500):
+        start = time.time()
+        moved = 0
+        for node, client in list(self.clients.items()):
+            try:
+                batch = []
+                for key in client.scan_iter(match=HOT_KEY_PATTERN, count=batch_size):
+                    if self.ring.node_for(key) != node:
+                        batch.append(key)
+                    if len(batch) >= batch_size:
+                        moved += self._move_keys(client, batch)
+                        batch = []
+                if batch:
+                    moved += self._move_keys(client, batch)
+            except Exception as e:
+                logger.error(f"热层分片 {node} 重新平衡失败: {e}")
+
+        self.stats['rebalances'] += 1
+        self.stats['keys_moved'] += moved
+        self.stats['last_rebalance_ms'] = (time.time() - start) * 1000
+        logger.info(f"✓ 热层重新平衡完成: 迁移 {moved} 个键, 耗时 {self.stats['last_rebalance_ms']:.1f}ms")
+        return moved
+
+    def _move_keys(self, source, keys):
+        """把一批键从源分片复制到归属分片（保留剩余TTL，不覆盖期间写入的新值），再从源分片删除"""
+        pipe = source.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.pttl(key)
+        replies = pipe.execute()
+
+        targets = {}
+        for key, value, ttl in zip(keys, replies[0::2], replies[1::2]):
+            if value is None or ttl == -2:
+                continue
+            targets.setdefault(self.ring.node_for(key), []).append((key, value, ttl))
+
+        moved = 0
+        for node, items in targets.items():
+            pipe = self.clients[node].pipeline(transaction=False)
+            for key, value, ttl in items:
+                pipe.set(key, value, px=ttl if ttl > 0 else None, nx=True)
+            pipe.execute()
+            moved += len(items)
+            self.stats['bytes_moved'] += sum(len(value) for _, value, _ in items)
+
+        source.delete(*keys)
+        return moved
+
+    def get_stats(self):
+        """获取分片统计"""
+        return {
+            **self.stats,
+            'shards': self.ring.nodes,
+            'breakers': {node: breaker.get_state() for node, breaker in self.breakers.items()}
+        }
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+        self.executor.shutdown(wait=False)
+
+
+class _AsyncShardedPipeline(_ShardedPipeline):
+    """异步分片流水线 - 各分片的流水线并发执行"""
+
+    async def execute(self):
+        pipes, commands, _ = self._take()
+        nodes = list(pipes)
+        replies = await asyncio.gather(*(pipes[node].execute() for node in nodes))
+        return self._assemble(commands, dict(zip(nodes, replies)))
+
+
+class AsyncShardedRedisClient:
+    """redis.asyncio 分片客户端 - 与同步客户端共享哈希环，分片连接按需建立"""
+
+    def __init__(self, ring, connect):
+        self.ring = ring
+        self.connect = connect  # 节点 -> 异步Redis客户端
+        self.clients = {}
+
+    def shard(self, node):
+        client = self.clients.get(node)
+        if client is None:
+            client = self.clients[node] = self.connect(node)
+        return client
+
+    async def get(self, key):
+        return await self.shard(self.ring.node_for(key)).get(key)
+
+    async def setex(self, key, ttl, value):
+        return await self.shard(self.ring.node_for(key)).setex(key, ttl, value)
+
+    async def mget(self, keys, *args):
+        return (await self.pipeline(transaction=False).mget(keys, *args).execute())[0]
+
+    async def delete(self, *keys):
+        return (await self.pipeline(transaction=False).delete(*keys).execute())[0]
+
+    async def exists(self, *keys):
+        return (await self.pipeline(transaction=False).exists(*keys).execute())[0]
+
+    def pipeline(self, transaction=True):
+        return _AsyncShardedPipeline(self, transaction)
+
+    async def aclose(self):
+        for client in self.clients.values():
+            await client.aclose()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# aat_hot_snapshot.py
+"""
+AAT热集快照
+周期性地把热层对象及其访问评分持久化到本地文件；重启后按评分从高到低
+并行回填热层，同时恢复访问频率，部署后几秒内即可回到稳态命中率
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from aat_strategy_engine import TensorInfo
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-HotSnapshot")
+
+SNAPSHOT_VERSION = 1
+
+# 回填时写入准入草图的访问次数上限（草图计数器为8位，且会周期性减半）
+MAX_SEEDED_ACCESSES = 15
+
+
+class HotSetSnapshot:
+    """热集快照 - 后台定期保存，启动时按优先级并行回填"""
+
+    def __init__(self, storage_manager):
+        self.manager = storage_manager
+        self.engine = storage_manager.strategy_engine
+        self.config = self.engine.config['hot_snapshot']
+        self.path = self.config['path']
+
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.rehydrate_thread = None
+        self.rehydrated = threading.Event()
+
+        self.stats = {
+            'snapshots_saved': 0,
+            'last_snapshot_objects': 0,
+            'last_snapshot_time': None,
+            'rehydrate_candidates': 0,
+            'rehydrated': 0,
+            'already_hot': 0,
+            'rehydrate_failed': 0,
+            'rehydrate_skipped': 0,
+            'rehydrate_seconds': None
+        }
+
+    def start(self):
+        """启动回填与定期保存；配置了等待时阻塞到回填完成或超时"""
+        if self.thread is not None:
+            return
+        if self.config['rehydrate']:
+            self.rehydrate_thread = threading.Thread(
+                target=self.rehydrate, name="aat-rehydrate", daemon=True)
+            self.rehydrate_thread.start()
+        else:
+            self.rehydrated.set()
+
+        self.thread = threading.Thread(target=self._run, name="aat-snapshot", daemon=True)
+        self.thread.start()
+        logger.info(f"热集快照已启动 - 文件: {self.path}, 周期: {self.config['interval']}s")
+
+        if self.config['rehydrate'] and self.config['wait_for_rehydrate']:
+            if not self.rehydrated.wait(self.config['rehydrate_timeout']):
+                logger.warning(f"⚠ 热层回填未在 {self.config['rehydrate_timeout']}s 内完成，继续在后台进行")
+
+    def stop(self):
+        """停止定期保存，并保存最后一份快照"""
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+        self.thread = None
+        # 回填尚未完成时不覆盖原快照，否则会丢掉未回填的对象
+        if self.rehydrated.is_set():
+            self.save()
+
+    def _run(self):
+        while not self.stop_event.wait(self.config['interval']):
+            if not self.rehydrated.is_set():
+                continue
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"热集快照保存失败: {e}")
+
+    def _hot_objects(self):
+        """当前热层对象：有准入控制时取其驻留记录，否则逐个探测策略引擎已知的对象"""
+        admission = self.manager.admission
+        if admission is not None:
+            with admission.lock:
+                return {filename: size for filename, (size, _) in admission.resident.items()}
+
+        objects = {}
+        for filename, info in list(self.engine.tensor_info.items()):
+            if self.manager.hot_layer_contains(filename):
+                objects[filename] = info.size
+        return objects
+
+    def collect(self):
+        """按评分从高到低列出热层对象"""
+        hot = self._hot_objects()
+        rates = self.manager.migrator.access_rates
+        candidates = []
+        for filename, size in hot.items():
+            info = self.engine.tensor_info.get(filename)
+            if info is None:
+                continue
+            candidates.append((filename, info, size or info.size, rates.get(filename, 0)))
+
+        max_rate = max((rate for *_, rate in candidates), default=0)
+        max_size = max((size for _, _, size, _ in candidates), default=0)
+        objects = [{
+            'filename': filename,
+            'size': size,
+            'score': self.engine.compute_placement_score(
+                info, rate / max_rate if max_rate > 0 else 0, size, max_size),
+            'access_frequency': info.access_frequency,
+            'last_access': info.last_access
+        } for filename, info, size, rate in candidates]
+        objects.sort(key=lambda item: (item['score'], item['access_frequency']), reverse=True)
+        return objects[:self.config['max_objects']]
+
+    def save(self):
+        """保存快照（先写临时文件再原子替换）"""
+        objects = self.collect()
+        snapshot = {'version': SNAPSHOT_VERSION, 'created': time.time(), 'objects': objects}
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+        self.stats['snapshots_saved'] += 1
+        self.stats['last_snapshot_objects'] = len(objects)
+        self.stats['last_snapshot_time'] = snapshot['created']
+        logger.debug(f"热集快照已保存: {len(objects)} 个对象")
+        return len(objects)
+
+    def load(self):
+        """读取快照，不存在、损坏或过旧时返回None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            logger.info("没有热集快照，跳过回填")
+            return None
+        except Exception as e:
+            logger.warning(f"⚠ 热集快照损坏，跳过回填: {e}")
+            return None
+
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            logger.warning(f"⚠ 热集快照版本不符，跳过回填: {snapshot.get('version')}")
+            return None
+        age = time.time() - snapshot['created']
+        if age > self.config['max_age']:
+            logger.info(f"热集快照已过期（{age / 3600:.1f}小时），跳过回填")
+            return None
+        return snapshot
+
+    def _seed(self, item):
+        """恢复访问统计，使策略引擎与准入控制把回填对象视为热对象"""
+        filename = item['filename']
+        if filename not in self.engine.tensor_info:
+            self.engine.tensor_info[filename] = TensorInfo(
+                name=filename,
+                size=item['size'],
+                layer_type=self.engine.catalog.layer_type_of(filename),
+                access_frequency=item['access_frequency'],
+                last_access=item['last_access'])
+
+        admission = self.manager.admission
+        if admission is not None:
+            for _ in range(min(item['access_frequency'], MAX_SEEDED_ACCESSES)):
+                admission.record_access(filename)
+
+    def _budget(self):
+        """回填字节预算：热层配置预算（重启后Redis中残留的热数据不应再压低预算）"""
+        admission = self.manager.admission
+        if admission is not None:
+            return admission.budget()
+        return self.engine.config['admission']['capacity_bytes']
+
+    def _rehydrate_one(self, item):
+        filename = item['filename']
+        if self.stop_event.is_set():
+            return 'skipped'
+        # Redis未随进程重启时对象仍在热层，只需恢复准入记账
+        if self.manager.hot_layer_contains(filename):
+            if self.manager.admission is not None:
+                self.manager.admission.on_insert(filename, item['size'])
+            return 'already_hot'
+        return 'rehydrated' if self.manager.prefetch_to_hot_layer(filename) is not None else 'failed'
+
+    def rehydrate(self):
+        """按评分从高到低在预算内并行回填热层"""
+        start = time.time()
+        try:
+            snapshot = self.load()
+            if snapshot is None:
+                return 0
+
+            selected, budget = [], self._budget()
+            for item in snapshot['objects']:
+                if item['size'] > budget:
+                    self.stats['rehydrate_skipped'] += 1
+                    continue
+                budget -= item['size']
+                selected.append(item)
+                self._seed(item)
+            self.stats['rehydrate_candidates'] = len(selected)
+            logger.info(f"开始回填热层: {len(selected)} 个对象, "
+                        f"{sum(item['size'] for item in selected) / 1024 / 1024:.2f}MB")
+
+            # 线程池按提交顺序取任务，高分对象先开始
+            with ThreadPoolExecutor(max_workers=self.config['rehydrate_workers'],
+                                    thread_name_prefix="aat-rehydrate") as executor:
+                futures = {executor.submit(self._rehydrate_one, item): item for item in selected}
+                wait(futures)
+
+            for future, item in futures.items():
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.warning(f"回填失败 {item['filename']}: {e}")
+                    outcome = 'failed'
+                key = {'failed': 'rehydrate_failed', 'skipped': 'rehydrate_skipped'}.get(outcome, outcome)
+                self.stats[key] += 1
+
+            self.stats['rehydrate_seconds'] = time.time() - start
+            logger.info(f"✓ 热层回填完成: 回填 {self.stats['rehydrated']}, 已在热层 {self.stats['already_hot']}, "
+                        f"失败 {self.stats['rehydrate_failed']}, 耗时 {self.stats['rehydrate_seconds']:.2f}s")
+            return self.stats['rehydrated']
+        finally:
+            self.rehydrated.set()
+
+    def get_stats(self):
+        """获取快照与回填统计"""
+        return {
+            **self.stats,
+            'running': self.thread is not None,
+            'rehydrate_done': self.rehydrated.is_set()
+        }
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# aat_memory_cache.py
+"""
+AAT L0进程内缓存 - 已解压数据块
+位于Redis热层之前，命中时不经过网络、反序列化和解压
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-MemoryCache")
+
+
+class DecodedBlockCache:
+    """L0缓存 - 按 (文件名, 块编号) 缓存解压后的数据块，字节预算 + LRU淘汰"""
+
+    def __init__(self, capacity_bytes=256 * 1024 * 1024, block_size=256 * 1024):
+        self.capacity_bytes = capacity_bytes
+        self.block_size = block_size
+
+        # (文件名, 块编号) -> 数据块，末尾为最近访问
+        self.blocks = OrderedDict()
+        self.file_sizes = {}
+        self.used_bytes = 0
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'evicted_bytes': 0
+        }
+
+        logger.info(f"L0缓存初始化完成，预算: {capacity_bytes / 1024 / 1024:.0f}MB")
+
+    def get_range(self, filename, size, offset):
+        """按范围读取，只有覆盖范围的块全部在缓存中才算命中"""
+        with self.lock:
+            file_size = self.file_sizes.get(filename)
+            if file_size is None:
+                self.stats['misses'] += 1
+                return None
+
+            if size <= 0 or offset >= file_size:
+                self.stats['hits'] += 1
+                return b''
+
+            end = min(offset + size, file_size)
+            first = offset // self.block_size
+            last = (end - 1) // self.block_size
+
+            chunks = []
+            for index in range(first, last + 1):
+                block = self.blocks.get((filename, index))
+                if block is None:
+                    self.stats['misses'] += 1
+                    return None
+                chunks.append(block)
+
+            for index in range(first, last + 1):
+                self.blocks.move_to_end((filename, index))
+            self.stats['hits'] += 1
+
+        # 块可能是热层值上的memoryview；单块直接返回视图，多块裁剪后一次性拼接
+        start = offset - first * self.block_size
+        stop = end - first * self.block_size
+        views = [memoryview(chunk) for chunk in chunks]
+        views[-1] = views[-1][:stop - (len(chunks) - 1) * self.block_size]
+        views[0] = views[0][start:]
+        return views[0] if len(views) == 1 else b''.join(views)
+
+    def put_blocks(self, filename, file_size, first_index, blocks):
+        """写入连续的若干数据块"""
+        with self.lock:
+            self.file_sizes[filename] = file_size
+            for index, block in enumerate(blocks, first_index):
+                self._insert((filename, index), block)
+
+    def put_file(self, filename, data):
+        """按块切分整个文件写入"""
+        block_size = self.block_size
+        # 每块独立复制一份，避免视图拖住整个源缓冲区、使字节预算失真
+        view = memoryview(data)
+        blocks = [bytes(view[i:i + block_size]) for i in range(0, len(data), block_size)]
+        self.put_blocks(filename, len(data), 0, blocks)
+
+    def invalidate(self, filename):
+        """移除某个文件的全部缓存块"""
+        with self.lock:
+            if self.file_sizes.pop(filename, None) is None:
+                return
+            for key in [k for k in self.blocks if k[0] == filename]:
+                self.used_bytes -= len(self.blocks.pop(key))
+
+    def _insert(self, key, block):
+        """插入单个块，超出预算时按LRU淘汰"""
+        if len(block) > self.capacity_bytes:
+            return
+
+        old = self.blocks.pop(key, None)
+        if old is not None:
+            self.used_bytes -= len(old)
+
+        while self.used_bytes + len(block) > self.capacity_bytes and self.blocks:
+            _, evicted = self.blocks.popitem(last=False)
+            self.used_bytes -= len(evicted)
+            self.stats['evictions'] += 1
+            self.stats['evicted_bytes'] += len(evicted)
+
+        self.blocks[key] = block
+        self.used_bytes += len(block)
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.blocks.clear()
+            self.file_sizes.clear()
+            self.used_bytes = 0
+
+    def get_stats(self):
+        """获取L0缓存统计"""
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / total if total > 0 else 0,
+            'blocks': len(self.blocks),
+            'files': len(self.file_sizes),
+            'used_bytes': self.used_bytes,
+            'capacity_bytes': self.capacity_bytes
+        }
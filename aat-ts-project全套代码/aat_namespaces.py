@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# aat_namespaces.py
+"""
+AAT命名空间
+对象名 "模型/版本/文件" 中的 "模型/版本" 即命名空间，Redis键、MinIO对象名前缀、
+对象目录与FUSE目录树都直接沿用这一前缀，不同模型的同名文件互不冲突；
+不带命名空间的对象名属于默认命名空间，保持原有行为
+"""
+
+import logging
+import re
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-Namespaces")
+
+DEFAULT_NAMESPACE = ''
+
+# 冷层内容寻址分片占用的对象名前缀，不能用作模型名
+RESERVED_MODELS = {'cas'}
+
+_NAME_PART = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+
+def split_name(name):
+    """'模型/版本/文件' -> ('模型/版本', '文件')；不带命名空间 -> ('', name)"""
+    parts = name.split('/', 2)
+    if len(parts) == 3:
+        return f"{parts[0]}/{parts[1]}", parts[2]
+    return DEFAULT_NAMESPACE, name
+
+
+def namespace_of(name):
+    """对象名所属的命名空间"""
+    return split_name(name)[0]
+
+
+def qualify(namespace, filename):
+    """命名空间 + 文件名 -> 对象名"""
+    return f"{namespace}/{filename}" if namespace else filename
+
+
+def make_namespace(model, version):
+    """模型id + 版本 -> 命名空间，名字不合法时抛出ValueError"""
+    for part in (model, version):
+        if not _NAME_PART.match(part or ''):
+            raise ValueError(f"非法的命名空间组成: {part!r}")
+    if model in RESERVED_MODELS:
+        raise ValueError(f"保留的模型名: {model}")
+    return f"{model}/{version}"
+
+
+def validate_namespace(namespace):
+    """检查 '模型/版本' 形式的命名空间，返回原值"""
+    parts = namespace.split('/')
+    if len(parts) != 2:
+        raise ValueError(f"命名空间应为 模型/版本: {namespace!r}")
+    return make_namespace(*parts)
+
+
+def display_name(namespace):
+    """日志与统计中的命名空间名"""
+    return namespace or 'default'
+
+
+def load_quotas(config):
+    """namespaces 配置 -> {命名空间: 热层字节配额}（0表示只受公平份额约束）"""
+    quotas = {}
+    for item in config['models']:
+        quotas[validate_namespace(item['namespace'])] = item.get('hot_quota_bytes', 0)
+    return quotas
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# aat_object_catalog.py
+"""
+AAT对象目录
+启动时根据模型加载器发现的张量文件一次性构建 文件 <-> 模型层 <-> 张量 <-> 大小 <-> 层类型 <-> 依赖 的映射，
+存储管理器、预取器与策略引擎共享同一份目录，请求路径上只做O(1)字典查找；
+带命名空间的对象（模型/版本/文件）沿用同名文件的分类，依赖边限定在同一命名空间内
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from aat_namespaces import DEFAULT_NAMESPACE, qualify, split_name
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-ObjectCatalog")
+
+# 已知文件布局：文件名 -> 模型层（顺序即每层的首选文件）
+FILE_LAYOUT = {
+    'embedding.bin': 'embedding',
+    'layer0.bin': 'encoder_layer_0',
+    'layer1.bin': 'encoder_layer_1',
+    'layer2.bin': 'encoder_layer_2',
+    'layer3.bin': 'encoder_layer_3',
+    'output.bin': 'lm_head',
+    'pooler.bin': 'pooler',
+    'classifier.bin': 'classifier',
+    'config.json': 'config',
+    # 检查点文件映射到真实模型层
+    'checkpoint.ckpt': 'encoder_layer_0',
+    'checkpoint_v1.ckpt': 'encoder_layer_1',
+    'checkpoint_v2.ckpt': 'encoder_layer_2',
+    'checkpoint_v3.ckpt': 'encoder_layer_3',
+    'checkpoint_latest.ckpt': 'lm_head',
+    'model.safetensors': 'embedding'
+}
+
+# 完整的BERT模型层间依赖关系
+LAYER_DEPENDENCIES = {
+    'embedding': ['encoder_layer_0'],
+    'encoder_layer_0': ['encoder_layer_1'],
+    'encoder_layer_1': ['encoder_layer_2'],
+    'encoder_layer_2': ['encoder_layer_3'],
+    'encoder_layer_3': ['pooler', 'classifier', 'lm_head'],  # 多个可能的下一层
+    'pooler': ['classifier'],
+    'classifier': [],
+    'lm_head': [],
+    'config': ['embedding']  # 配置通常先于嵌入层访问
+}
+
+# 模型层 -> 策略引擎的层类型（tier_selection 的键）
+LAYER_TYPES = {
+    'embedding': 'embedding',
+    'lm_head': 'output',
+    'pooler': 'output',
+    'classifier': 'output',
+    'config': 'config'
+}
+
+_LAYER_NUMBER = re.compile(r'layer_?(\d+)')
+
+# 未登记对象（张量对象名、任意FUSE路径等）推断出的目录项只缓存这么多，不写入目录本身
+MAX_INFERRED_ENTRIES = 10000
+
+
+@dataclass
+class CatalogEntry:
+    filename: str
+    layer: str  # 模型层名，未知为 'other'
+    layer_type: str  # 策略层类型
+    size: int = None
+    tensors: tuple = ()
+    real_data: bool = False  # 是否由真实模型加载器提供数据
+    written: bool = False  # 是否已写入存储（之后以存储中的对象为准）
+    next_files: list = field(default_factory=list)  # 依赖边：接下来通常访问的文件
+    namespace: str = DEFAULT_NAMESPACE  # 所属命名空间（模型/版本）
+
+
+class ObjectCatalog:
+    """对象目录 - 构建一次，全局共享"""
+
+    def __init__(self, model_loader=None, max_inferred=MAX_INFERRED_ENTRIES):
+        self.layer_dependencies = {layer: list(nexts) for layer, nexts in LAYER_DEPENDENCIES.items()}
+        self.entries = {}
+        # 推断出的目录项：有界LRU，长时间运行的服务不会因请求过的名字无限增长
+        self.inferred = OrderedDict()
+        self.max_inferred = max_inferred
+        self.inferred_lock = threading.Lock()
+        # 见过的命名空间：不随推断项淘汰或依赖重解析而清空，FUSE目录树据此列出只读过的模型/版本
+        self.seen_namespaces = set()
+        self.layer_files = {}  # 模型层 -> 首选文件
+        self.real_model_mapping = {}  # 有真实数据的文件 -> 模型层
+        self.model_loader = None
+        self.build(model_loader)
+
+    def build(self, model_loader=None):
+        """(重新)构建目录；传入模型加载器时附带真实层的大小与张量列表
+
+        新目录先在局部构建再整体替换，构建期间（如后台构建时）目录照常可用；
+        此前已写入存储的文件保持写入状态，其余已登记的对象原样保留
+        """
+        available = set(model_loader.list_available_layers()) if model_loader is not None else set()
+
+        layout = dict(FILE_LAYOUT)
+        for layer in sorted(available):
+            layout.setdefault(f"{layer}.bin", layer)
+
+        entries = {}
+        layer_files = {}
+        real_model_mapping = {}
+        for filename, layer in layout.items():
+            entry = CatalogEntry(filename, layer, self._layer_type(filename, layer))
+            if layer in available:
+                entry.real_data = True
+                entry.size = model_loader.get_layer_info(layer)['size']
+                index = model_loader.get_tensor_index(layer)
+                entry.tensors = tuple(index) if index else ()
+            if entry.layer_type != 'checkpoint':
+                layer_files.setdefault(layer, filename)
+            entries[filename] = entry
+
+        for filename, previous in list(self.entries.items()):
+            entry = entries.setdefault(filename, previous)
+            if previous.written and entry is not previous:
+                entry.written, entry.size, entry.real_data = True, previous.size, False
+        for filename, entry in entries.items():
+            if entry.real_data:
+                real_model_mapping[filename] = entry.layer
+
+        self.entries = entries
+        self.layer_files = layer_files
+        self.real_model_mapping = real_model_mapping
+        self.model_loader = model_loader
+        self._link_dependencies()
+        logger.info(f"对象目录构建完成: {len(self.entries)} 个文件, "
+                    f"{len(self.real_model_mapping)} 个由真实模型提供")
+
+    def _files_after(self, layer, namespace=DEFAULT_NAMESPACE):
+        """层级依赖 -> 下一步访问的文件（同一命名空间内）"""
+        return [qualify(namespace, self.layer_files[next_layer])
+                for next_layer in self.layer_dependencies.get(layer, [])
+                if next_layer in self.layer_files]
+
+    def update_dependencies(self, dependencies):
+        """更新层级依赖（如加载已学习的模式）并重新解析文件级依赖边"""
+        self.layer_dependencies.update(dependencies)
+        self._link_dependencies()
+
+    def _link_dependencies(self):
+        """把层级依赖解析为文件级依赖边；推断项按新依赖重新推断"""
+        for entry in self.entries.values():
+            entry.next_files = self._files_after(entry.layer, entry.namespace)
+        with self.inferred_lock:
+            self.inferred.clear()
+
+    @staticmethod
+    def _layer_type(filename, layer):
+        """层类型：检查点文件单独成类，其余按模型层"""
+        name = filename.lower()
+        if 'checkpoint' in name or name.endswith('.ckpt'):
+            return 'checkpoint'
+        if layer in LAYER_TYPES:
+            return LAYER_TYPES[layer]
+        match = _LAYER_NUMBER.search(layer)
+        if match:
+            return f"layer{match.group(1)}"
+        return 'other'
+
+    @staticmethod
+    def _classify(filename):
+        """未登记文件的模型层推断（只在首次出现时执行一次）"""
+        name = filename.lower()
+        if 'checkpoint' in name or name.endswith('.ckpt'):
+            if 'v1' in name:
+                return 'encoder_layer_1'
+            elif 'v2' in name:
+                return 'encoder_layer_2'
+            elif 'v3' in name:
+                return 'encoder_layer_3'
+            elif 'latest' in name:
+                return 'lm_head'
+            return 'encoder_layer_0'
+        elif 'config' in name or name.endswith(('.json', '.yaml')):
+            return 'config'
+        elif 'emb' in name:
+            return 'embedding'
+        elif 'pooler' in name:
+            return 'pooler'
+        elif 'classifier' in name:
+            return 'classifier'
+        elif 'output' in name or 'head' in name:
+            return 'lm_head'
+
+        match = _LAYER_NUMBER.search(name)
+        if match:
+            return f"encoder_layer_{match.group(1)}"
+        return 'other'
+
+    def lookup(self, filename):
+        """查找目录项；未登记的文件推断后放入有界缓存（不登记），张量对象名（文件::张量）继承所在文件的分类，
+        带命名空间的对象名继承同名文件的分类"""
+        entry = self.entries.get(filename)
+        if entry is not None:
+            return entry
+        with self.inferred_lock:
+            entry = self.inferred.get(filename)
+            if entry is not None:
+                self.inferred.move_to_end(filename)
+                return entry
+
+        namespace, basename = split_name(filename)
+        parent, sep, _ = filename.partition('::')
+        if sep:
+            source = self.lookup(parent)
+            layer, layer_type = source.layer, source.layer_type
+        elif namespace:
+            source = self.lookup(basename)
+            layer, layer_type = source.layer, source.layer_type
+        else:
+            layer = self._classify(filename)
+            layer_type = self._layer_type(filename, layer)
+
+        entry = CatalogEntry(filename, layer, layer_type, namespace=namespace)
+        entry.next_files = self._files_after(layer, namespace)
+        with self.inferred_lock:
+            if namespace:
+                self.seen_namespaces.add(namespace)
+            self.inferred[filename] = entry
+            while len(self.inferred) > self.max_inferred:
+                self.inferred.popitem(last=False)
+        return entry
+
+    def _registered(self, filename):
+        """登记到目录中的目录项，未登记时把推断项转为登记项"""
+        entry = self.entries.get(filename)
+        if entry is None:
+            entry = self.lookup(filename)
+            with self.inferred_lock:
+                self.inferred.pop(filename, None)
+            entry = self.entries.setdefault(filename, entry)
+        return entry
+
+    def layer_of(self, filename):
+        """文件对应的模型层"""
+        return self.lookup(filename).layer
+
+    def layer_type_of(self, filename):
+        """文件对应的策略层类型"""
+        return self.lookup(filename).layer_type
+
+    def next_files(self, filename):
+        """依赖边：接下来通常访问的文件"""
+        return self.lookup(filename).next_files
+
+    def file_for_layer(self, layer):
+        """模型层的首选文件"""
+        return self.layer_files.get(layer)
+
+    def model_layer(self, name):
+        """文件名或模型层名 -> 有真实数据的模型层，没有返回None"""
+        if name in self.real_model_mapping:
+            return self.real_model_mapping[name]
+        entry = self.entries.get(name)
+        if self.model_loader is None or (entry is not None and entry.written):
+            return None
+        # 只认加载器确实存在的层，否则加载器会返回随机降级数据，遮蔽MinIO中的真实对象
+        for layer_name in (name, os.path.splitext(name)[0]):
+            if self.model_loader.get_layer_info(layer_name) is not None:
+                return layer_name
+        return None
+
+    def size_of(self, filename):
+        """已知的对象大小，未知返回None"""
+        entry = self.entries.get(filename)
+        return entry.size if entry is not None else None
+
+    def register(self, filename, layer=None, size=None):
+        """登记新对象（如写入的检查点或学习到的映射）"""
+        entry = self._registered(filename)
+        if layer is not None and layer != entry.layer:
+            entry.layer = layer
+            entry.layer_type = self._layer_type(filename, layer)
+            entry.next_files = self._files_after(layer, entry.namespace)
+        if size is not None:
+            entry.size = size
+        return entry
+
+    def mark_written(self, filename, size=None):
+        """对象已写入存储：之后以存储中的对象为准，不再由真实模型提供"""
+        entry = self._registered(filename)
+        entry.size = size
+        entry.written = True
+        if entry.real_data:
+            entry.real_data = False
+            del self.real_model_mapping[filename]
+            logger.info(f"文件已写入存储，取消真实模型映射: {filename}")
+
+    def namespaces(self):
+        """已登记及访问过的对象涉及的命名空间"""
+        with self.inferred_lock:
+            seen = set(self.seen_namespaces)
+        entries = list(self.entries.values())
+        return sorted(seen | {entry.namespace for entry in entries if entry.namespace})
+
+    def file_to_layer(self):
+        """已登记文件 -> 模型层（不含张量对象）"""
+        return {name: entry.layer for name, entry in self.entries.items() if '::' not in name}
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# aat_read_ahead.py
+"""
+AAT文件内顺序预读
+按打开的文件句柄识别顺序读取流：连续的 read(size, offset) 首尾相接时，
+在后台提前拉取后续若干块，窗口随命中倍增，随机访问时重置；
+大文件顺序加载从每128KB一次往返变为按后端带宽流水线拉取
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-ReadAhead")
+
+
+class ReadAhead:
+    """预读调度器 - 共享拉取线程池与统计，为每个打开的文件创建一个流"""
+
+    def __init__(self, block_size=1024 * 1024, initial_window=2, max_window=32,
+                 trigger_reads=2, max_workers=8):
+        self.block_size = block_size
+        self.initial_window = initial_window
+        self.max_window = max_window
+        self.trigger_reads = trigger_reads
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aat-readahead")
+
+        self.lock = threading.Lock()
+        self.stats = {
+            'streams': 0,
+            'hits': 0,  # 完全由预读块满足的读取
+            'misses': 0,  # 直接读取后端的读取
+            'blocks_fetched': 0,
+            'bytes_fetched': 0,
+            'blocks_discarded': 0,  # 随机访问重置时丢弃的预读块
+            'resets': 0
+        }
+
+        logger.info(f"顺序预读已启用 - 块大小: {block_size / 1024:.0f}KB, "
+                    f"窗口: {initial_window}-{max_window}块, 触发: 连续{trigger_reads}次")
+
+    def open(self, fetch, file_size, name=None):
+        """为一个打开的文件创建预读流；fetch(size, offset) 从存储读取一段数据"""
+        self.count('streams')
+        return ReadAheadStream(self, fetch, file_size, name)
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def get_stats(self):
+        """获取预读统计"""
+        with self.lock:
+            stats = dict(self.stats)
+        reads = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / reads if reads else 0.0
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ReadAheadStream:
+    """单个打开文件的顺序流检测与预读缓冲"""
+
+    def __init__(self, read_ahead, fetch, file_size, name=None):
+        self.read_ahead = read_ahead
+        self.fetch = fetch
+        self.file_size = file_size
+        self.name = name
+
+        self.lock = threading.Lock()
+        self.next_offset = 0  # 下一次顺序读取应有的偏移
+        self.sequential_reads = 0
+        self.window = read_ahead.initial_window
+        self.last_block = -1  # 上一次读取所在的块
+        self.blocks = OrderedDict()  # 块号 -> Future(数据)
+
+    def read(self, size, offset):
+        """读取一段数据：顺序流且预读块已覆盖时从缓冲返回，否则直接读取后端"""
+        size = max(0, min(size, self.file_size - offset))
+        if size == 0:
+            return b''
+
+        with self.lock:
+            self._observe(offset, size)
+            futures = self._covering(offset, size)
+
+        if futures is not None:
+            data = self._assemble(futures, offset, size)
+            if data is not None:
+                self.read_ahead.count('hits')
+                return data
+
+        self.read_ahead.count('misses')
+        data = self.fetch(size, offset)
+        return data if isinstance(data, bytes) else bytes(data)
+
+    def _observe(self, offset, size):
+        """更新顺序流状态，必要时调度预读（持锁调用）"""
+        if offset == self.next_offset:
+            self.sequential_reads += 1
+        else:
+            if self.blocks:
+                self.read_ahead.count('resets')
+                logger.debug(f"随机访问，重置预读: {self.name} @ {offset}")
+            self._discard(lambda index: True)
+            self.sequential_reads = 1
+            self.window = self.read_ahead.initial_window
+        self.next_offset = offset + size
+
+        if self.sequential_reads < self.read_ahead.trigger_reads:
+            return
+
+        block_size = self.read_ahead.block_size
+        current = offset // block_size
+        if current != self.last_block:
+            # 进入一个已预读的新块：读者跟上了窗口，窗口倍增
+            if current in self.blocks and self.last_block >= 0:
+                self.window = min(self.window * 2, self.read_ahead.max_window)
+            self._discard(lambda index: index < current)
+            self.last_block = current
+
+        last = min(current + self.window, (self.file_size + block_size - 1) // block_size)
+        for index in range(current, last):
+            if index not in self.blocks:
+                self.blocks[index] = self.read_ahead.executor.submit(self._fetch_block, index)
+
+    def _fetch_block(self, index):
+        block_size = self.read_ahead.block_size
+        start = index * block_size
+        length = min(block_size, self.file_size - start)
+        data = self.fetch(length, start)
+        self.read_ahead.count('blocks_fetched')
+        self.read_ahead.count('bytes_fetched', len(data))
+        return data
+
+    def _discard(self, predicate):
+        """丢弃满足条件的块，未开始的拉取直接取消"""
+        for index in [index for index in self.blocks if predicate(index)]:
+            future = self.blocks.pop(index)
+            if not future.done():
+                future.cancel()
+            if index > self.last_block:
+                self.read_ahead.count('blocks_discarded')
+
+    def _covering(self, offset, size):
+        """覆盖请求范围的预读块，有任何一块不在缓冲中返回None（持锁调用）"""
+        block_size = self.read_ahead.block_size
+        first, last = offset // block_size, (offset + size - 1) // block_size
+        futures = [self.blocks.get(index) for index in range(first, last + 1)]
+        return None if any(future is None for future in futures) else futures
+
+    def _assemble(self, futures, offset, size):
+        """等待预读块并拼出请求范围，任一块失败或长度不足返回None"""
+        try:
+            chunks = [future.result() for future in futures]
+        except Exception as e:
+            logger.warning(f"预读块失败，改为直接读取 {self.name}: {e}")
+            return None
+
+        start = offset - (offset // self.read_ahead.block_size) * self.read_ahead.block_size
+        if len(chunks) == 1:
+            data = memoryview(chunks[0])[start:start + size]
+        else:
+            data = memoryview(b''.join(chunks))[start:start + size]
+        return bytes(data) if len(data) == size else None
+
+    def close(self):
+        """文件关闭：取消未开始的预读"""
+        with self.lock:
+            self._discard(lambda index: True)
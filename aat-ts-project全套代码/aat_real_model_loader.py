@@ -10,12 +10,126 @@ import json
 import logging
 import numpy as np
 import struct
+from bisect import bisect_right
 from collections import OrderedDict
-import torch
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AAT-ModelLoader")
 
+# .bin 张量文件中的元素类型固定为float32
+BIN_TENSOR_DTYPE = 'float32'
+
+
+def parse_tensor_index(read_at, total_size):
+    """只读取张量头解析 .bin 文件的张量索引，跳过数据部分
+
+    read_at(offset, length) 返回从offset开始的字节；张量头格式：
+    名称长度(I) | 名称 | 维数(I) | 各维(I...) | float32数据
+    返回 OrderedDict: 张量名 -> {'offset', 'shape', 'dtype', 'nbytes'}
+    """
+    index = OrderedDict()
+    itemsize = np.dtype(BIN_TENSOR_DTYPE).itemsize
+    offset = 0
+    while offset < total_size:
+        name_len = struct.unpack('I', read_at(offset, 4))[0]
+        offset += 4
+        name = read_at(offset, name_len).decode('utf-8')
+        offset += name_len
+
+        dim_count = struct.unpack('I', read_at(offset, 4))[0]
+        offset += 4
+        shape = struct.unpack(f'{dim_count}I', read_at(offset, 4 * dim_count)) if dim_count else ()
+        offset += 4 * dim_count
+
+        nbytes = int(np.prod(shape)) * itemsize
+        index[name] = {'offset': offset, 'shape': tuple(shape), 'dtype': BIN_TENSOR_DTYPE, 'nbytes': nbytes}
+        offset += nbytes
+    return index
+
+
+class TensorLayoutScanner:
+    """流式解析 .bin 张量头，记录每个张量数据区的位置与元素宽度
+
+    按写入顺序 feed 数据块，跨块的张量头会暂存到下一块；遇到不合理的张量头
+    （名称过长、非UTF-8、维数过多）即认为不是张量文件，此后不再给出数据区
+    """
+
+    MAX_NAME_LEN = 4096
+    MAX_DIMS = 8
+
+    def __init__(self, dtype=BIN_TENSOR_DTYPE):
+        self.itemsize = np.dtype(dtype).itemsize
+        self.valid = True
+        self.offset = 0  # 已喂入的字节数
+        self.next_header = 0  # 下一个张量头的位置
+        self.pending = bytearray()  # 从 next_header 起尚未解析的字节
+        self.starts = []
+        self.regions = []  # (数据起点, 字节数, 元素宽度)
+
+    def feed(self, data):
+        end = self.offset + len(data)
+        if self.valid and self.next_header < end:
+            self.pending += memoryview(data)[max(0, self.next_header - self.offset):]
+            base = self.next_header
+            while self.valid and self._parse_header(self.next_header - base):
+                pass
+            del self.pending[:self.next_header - base]
+        self.offset = end
+
+    def _parse_header(self, pos):
+        """从 pending[pos:] 解析一个张量头，数据不够时返回False"""
+        pending = self.pending
+        available = len(pending) - pos
+        if available < 4:
+            return False
+        name_len = struct.unpack_from('I', pending, pos)[0]
+        if not 0 < name_len <= self.MAX_NAME_LEN:
+            return self._invalidate()
+        if available < 8 + name_len:
+            return False
+        try:
+            bytes(pending[pos + 4:pos + 4 + name_len]).decode('utf-8')
+        except UnicodeDecodeError:
+            return self._invalidate()
+        dim_count = struct.unpack_from('I', pending, pos + 4 + name_len)[0]
+        if dim_count > self.MAX_DIMS:
+            return self._invalidate()
+        header_len = 8 + name_len + 4 * dim_count
+        if available < header_len:
+            return False
+
+        shape = struct.unpack_from(f'{dim_count}I', pending, pos + 8 + name_len)
+        nbytes = int(np.prod(shape)) * self.itemsize
+        data_start = self.next_header + header_len
+        self.starts.append(data_start)
+        self.regions.append((data_start, nbytes, self.itemsize))
+        self.next_header = data_start + nbytes
+        return True
+
+    def _invalidate(self):
+        self.valid = False
+        self.pending = bytearray()
+        self.starts, self.regions = [], []
+        return False
+
+    def regions_in(self, start, length):
+        """[start, start+length) 内按元素对齐的数据区，返回相对 start 的 (起点, 长度, 元素宽度)"""
+        if not self.valid:
+            return []
+        end = start + length
+        regions = []
+        for i in range(max(0, bisect_right(self.starts, start) - 1), len(self.regions)):
+            region_start, nbytes, itemsize = self.regions[i]
+            if region_start >= end:
+                break
+            first = max(region_start, start)
+            first += -(first - region_start) % itemsize
+            last = min(region_start + nbytes, end)
+            last -= (last - region_start) % itemsize
+            if last > first:
+                regions.append((first - start, last - first, itemsize))
+        return regions
+
 
 class RealModelDataLoader:
     """真实模型数据加载器 - 完整真实数据版本"""
@@ -29,6 +143,9 @@ class RealModelDataLoader:
         self.memory_cache = {}
         self.cache_stats = {'hits': 0, 'misses': 0}
 
+        # 层名 -> 张量索引
+        self.tensor_indexes = {}
+
         # 如果真实文件不足，创建完整的BERT-tiny结构
         if len(self.tensor_files) < 6:
             logger.info("真实模型文件不完整，创建完整的BERT-tiny结构")
@@ -378,6 +495,54 @@ class RealModelDataLoader:
 
         return fake_data.tobytes()[:size]
 
+    def get_tensor_index(self, layer_name):
+        """获取层内各张量的偏移、形状与类型（只解析张量头），层不存在返回None"""
+        if layer_name in self.tensor_indexes:
+            return self.tensor_indexes[layer_name]
+
+        file_info = self.tensor_files.get(layer_name)
+        if file_info is None:
+            return None
+
+        try:
+            if file_info['format'] == 'bin':
+                with open(file_info['path'], 'rb') as f:
+                    def read_at(offset, length):
+                        f.seek(offset)
+                        return f.read(length)
+                    index = parse_tensor_index(read_at, os.path.getsize(file_info['path']))
+            elif file_info['format'] == 'npz':
+                with np.load(file_info['path']) as data:
+                    index = OrderedDict(
+                        (name, {'offset': None, 'shape': data[name].shape, 'dtype': str(data[name].dtype),
+                                'nbytes': data[name].nbytes})
+                        for name in data.files)
+            else:
+                logger.warning(f"不支持的格式: {file_info['format']}")
+                return None
+        except Exception as e:
+            logger.error(f"解析张量索引失败 {layer_name}: {e}")
+            return None
+
+        self.tensor_indexes[layer_name] = index
+        return index
+
+    def read_tensor(self, layer_name, tensor_name):
+        """按索引只读取单个张量的字节，不存在返回None"""
+        index = self.get_tensor_index(layer_name)
+        if index is None or tensor_name not in index:
+            return None
+
+        info = index[tensor_name]
+        file_info = self.tensor_files[layer_name]
+        if file_info['format'] == 'npz':
+            with np.load(file_info['path']) as data:
+                return data[tensor_name].tobytes()
+
+        with open(file_info['path'], 'rb') as f:
+            f.seek(info['offset'])
+            return f.read(info['nbytes'])
+
     def get_layer_info(self, layer_name):
         """获取层信息"""
         if layer_name in self.tensor_files:
@@ -11,13 +11,17 @@ from collections import defaultdict, deque
 import json
 import time
 import threading
+import asyncio
+
+from aat_namespaces import namespace_of, qualify
+from aat_object_catalog import ObjectCatalog
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AAT-Prefetcher")
 
 
 class SemanticPrefetcher:
-    def __init__(self, storage_manager, history_size=100):
+    def __init__(self, storage_manager, history_size=100, catalog=None):
         self.storage_manager = storage_manager
         self.history_size = history_size
 
@@ -34,37 +38,9 @@ class SemanticPrefetcher:
             'successful_prefetches': 0
         }
 
-        # 完整的BERT模型层间依赖关系
-        self.layer_dependencies = {
-            'embedding': ['encoder_layer_0'],
-            'encoder_layer_0': ['encoder_layer_1'],
-            'encoder_layer_1': ['encoder_layer_2'],
-            'encoder_layer_2': ['encoder_layer_3'],
-            'encoder_layer_3': ['pooler', 'classifier', 'lm_head'],  # 多个可能的下一层
-            'pooler': ['classifier'],
-            'classifier': [],
-            'lm_head': [],
-            'config': ['embedding']  # 配置通常先于嵌入层访问
-        }
-
-        # 完整的文件到层映射
-        self.file_to_layer = {
-            'embedding.bin': 'embedding',
-            'layer0.bin': 'encoder_layer_0',
-            'layer1.bin': 'encoder_layer_1',
-            'layer2.bin': 'encoder_layer_2',
-            'layer3.bin': 'encoder_layer_3',
-            'output.bin': 'lm_head',
-            'pooler.bin': 'pooler',
-            'classifier.bin': 'classifier',
-            'config.json': 'config',
-            # 检查点文件映射
-            'checkpoint.ckpt': 'encoder_layer_0',
-            'checkpoint_v1.ckpt': 'encoder_layer_1',
-            'checkpoint_v2.ckpt': 'encoder_layer_2',
-            'checkpoint_v3.ckpt': 'encoder_layer_3',
-            'checkpoint_latest.ckpt': 'lm_head'
-        }
+        # 文件/模型层/依赖关系统一由对象目录提供
+        self.catalog = catalog if catalog is not None else ObjectCatalog()
+        self.layer_dependencies = self.catalog.layer_dependencies
 
         # 预取线程池
         self.prefetch_threads = []
@@ -109,67 +85,23 @@ class SemanticPrefetcher:
         return False
 
     def _classify_layer(self, filename):
-        """根据文件名分类layer类型 - 完整版本"""
-        # 优先使用文件映射
-        if filename in self.file_to_layer:
-            return self.file_to_layer[filename]
-
-        filename_lower = filename.lower()
-
-        if 'embedding' in filename_lower:
-            return 'embedding'
-        elif 'output' in filename_lower or 'head' in filename_lower:
-            return 'lm_head'
-        elif 'pooler' in filename_lower:
-            return 'pooler'
-        elif 'classifier' in filename_lower:
-            return 'classifier'
-        elif 'config' in filename_lower or 'json' in filename_lower:
-            return 'config'
-        elif 'layer0' in filename_lower:
-            return 'encoder_layer_0'
-        elif 'layer1' in filename_lower:
-            return 'encoder_layer_1'
-        elif 'layer2' in filename_lower:
-            return 'encoder_layer_2'
-        elif 'layer3' in filename_lower:
-            return 'encoder_layer_3'
-        elif 'checkpoint' in filename_lower:
-            # 检查点文件映射到对应的编码器层
-            if 'v1' in filename_lower:
-                return 'encoder_layer_1'
-            elif 'v2' in filename_lower:
-                return 'encoder_layer_2'
-            elif 'v3' in filename_lower:
-                return 'encoder_layer_3'
-            elif 'latest' in filename_lower:
-                return 'lm_head'
-            else:
-                return 'encoder_layer_0'
-        else:
-            return 'other'
+        """根据文件名分类layer类型 - 查对象目录"""
+        return self.catalog.layer_of(filename)
 
     def predict_next_layers(self, current_file):
         """预测下一个可能访问的layer - 基于完整BERT结构"""
         current_layer = self._classify_layer(current_file)
 
-        # 方法1: 基于预定义的依赖关系
-        dependency_based = self.layer_dependencies.get(current_layer, [])
-
-        # 将层名映射回文件名
-        dependency_files = []
-        for layer in dependency_based:
-            # 查找对应的文件名
-            for file, file_layer in self.file_to_layer.items():
-                if file_layer == layer:
-                    dependency_files.append(file)
-                    break
+        # 方法1: 基于预定义的依赖关系（目录中预先解析好的文件级依赖边）
+        dependency_files = list(self.catalog.next_files(current_file))
 
         # 方法2: 基于历史访问模式
         pattern_based = self._get_pattern_based_prediction(current_file)
 
-        # 方法3: 基于当前场景的智能预测
-        context_based = self._get_context_based_prediction(current_file, current_layer)
+        # 方法3: 基于当前场景的智能预测（限定在当前文件的命名空间内）
+        namespace = namespace_of(current_file)
+        context_based = [qualify(namespace, filename)
+                         for filename in self._get_context_based_prediction(current_file, current_layer)]
 
         # 合并结果，去重
         predicted_files = list(set(dependency_files + pattern_based + context_based))
@@ -240,33 +172,22 @@ class SemanticPrefetcher:
             self.prefetch_stats['total_prefetches'] += 1
 
             # 检查是否已经在热层
-            cached_data = self.storage_manager.get_from_hot_layer(filename)
-            if cached_data:
+            if self.storage_manager.hot_layer_contains(filename):
                 logger.debug(f"文件已在热层，跳过预取: {filename}")
                 self.prefetch_stats['successful_prefetches'] += 1
                 return
 
-            # 从真实模型获取数据
-            real_data = self.storage_manager.get_real_model_data(filename)
-            if real_data:
-                # 缓存到热层
-                self.storage_manager.cache_to_hot_layer(filename, real_data)
-                logger.info(f"✅ 语义预取完成: {filename} ({len(real_data)} bytes)")
+            # 加载并写入热层；与前台同文件未命中合并为一次加载
+            data = self.storage_manager.prefetch_to_hot_layer(filename)
+            if data:
+                logger.info(f"✅ 语义预取完成: {filename} ({len(data)} bytes)")
                 self.prefetch_stats['successful_prefetches'] += 1
             else:
-                # 从冷层加载
-                cold_data = self.storage_manager.get_from_cold_layer(filename)
-                if cold_data:
-                    # 缓存到热层
-                    self.storage_manager.cache_to_hot_layer(filename, cold_data)
-                    logger.info(f"✅ 语义预取完成(冷层): {filename} ({len(cold_data)} bytes)")
-                    self.prefetch_stats['successful_prefetches'] += 1
-                else:
-                    logger.warning(f"预取失败，无数据: {filename}")
-                    self.prefetch_stats['misses'] += 1
-                    # 从预取集合中移除失败的文件
-                    if filename in self.prefetch_stats['prefetched_files']:
-                        self.prefetch_stats['prefetched_files'].remove(filename)
+                logger.warning(f"预取失败，无数据: {filename}")
+                self.prefetch_stats['misses'] += 1
+                # 从预取集合中移除失败的文件
+                if filename in self.prefetch_stats['prefetched_files']:
+                    self.prefetch_stats['prefetched_files'].remove(filename)
 
         except Exception as e:
             logger.error(f"预取过程出错 {filename}: {e}")
@@ -308,7 +229,7 @@ class SemanticPrefetcher:
                 json.dump({
                     'pattern_counts': dict(self.pattern_counts),
                     'access_history': list(self.access_history),
-                    'file_to_layer': self.file_to_layer,
+                    'file_to_layer': self.catalog.file_to_layer(),
                     'prefetch_stats': self.prefetch_stats,
                     'layer_dependencies': self.layer_dependencies
                 }, f, indent=2)
@@ -323,7 +244,6 @@ class SemanticPrefetcher:
                 data = json.load(f)
                 self.pattern_counts.update(data.get('pattern_counts', {}))
                 self.access_history.extend(data.get('access_history', []))
-                self.file_to_layer.update(data.get('file_to_layer', {}))
                 self.prefetch_stats.update(data.get('prefetch_stats', {
                     'prefetched_files': set(),
                     'hits': 0,
@@ -331,7 +251,9 @@ class SemanticPrefetcher:
                     'total_prefetches': 0,
                     'successful_prefetches': 0
                 }))
-                self.layer_dependencies.update(data.get('layer_dependencies', {}))
+                self.catalog.update_dependencies(data.get('layer_dependencies', {}))
+                for filename, layer in data.get('file_to_layer', {}).items():
+                    self.catalog.register(filename, layer)
             logger.info(f"模式已加载: {filepath}")
         except Exception as e:
             logger.warning(f"加载模式失败: {e}")
@@ -357,18 +279,83 @@ class SemanticPrefetcher:
         logger.info("语义预取器已停止")
 
 
+
+class AsyncSemanticPrefetcher:
+    """异步语义预取器 - 以asyncio任务调度预取，复用同步预取器的预测与统计"""
+
+    def __init__(self, storage_manager, predictor, max_concurrent=3):
+        self.storage_manager = storage_manager
+        self.predictor = predictor
+        # 与同步预取器共享统计，保证 _begin_request 的预取命中判断一致
+        self.prefetch_stats = predictor.prefetch_stats
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.tasks = set()
+        self.running = True
+
+        logger.info(f"异步语义预取器初始化完成，最大并发: {max_concurrent}")
+
+    def prefetch_async(self, current_file):
+        """为预测到的文件创建预取任务（需在事件循环中调用）"""
+        if not self.running:
+            return
+
+        loop = asyncio.get_running_loop()
+        for filename in self.predictor.predict_next_layers(current_file):
+            if filename in self.prefetch_stats['prefetched_files']:
+                continue
+
+            # 调度时即标记，避免同一轮事件循环内重复创建任务
+            self.prefetch_stats['prefetched_files'].add(filename)
+            self.prefetch_stats['total_prefetches'] += 1
+
+            task = loop.create_task(self._prefetch_file(filename))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _prefetch_file(self, filename):
+        """预取单个文件"""
+        async with self.semaphore:
+            try:
+                if await self.storage_manager.ahot_layer_contains(filename):
+                    logger.debug(f"文件已在热层，跳过预取: {filename}")
+                    self.prefetch_stats['successful_prefetches'] += 1
+                    return
+
+                # 与前台同文件未命中合并为一次加载
+                manager = self.storage_manager.manager
+                data = await self.storage_manager.run_blocking(manager.prefetch_to_hot_layer, filename)
+
+                if data:
+                    logger.info(f"✅ 异步语义预取完成: {filename} ({len(data)} bytes)")
+                    self.prefetch_stats['successful_prefetches'] += 1
+                else:
+                    logger.warning(f"预取失败，无数据: {filename}")
+                    self.prefetch_stats['misses'] += 1
+                    self.prefetch_stats['prefetched_files'].discard(filename)
+
+            except Exception as e:
+                logger.error(f"异步预取过程出错 {filename}: {e}")
+                self.prefetch_stats['misses'] += 1
+                self.prefetch_stats['prefetched_files'].discard(filename)
+
+    async def stop(self):
+        """停止预取器，取消未完成的任务"""
+        self.running = False
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        logger.info("异步语义预取器已停止")
+
+
 if __name__ == "__main__":
     # 测试预取器
     class MockStorageManager:
-        def get_from_hot_layer(self, filename):
-            return None
+        def hot_layer_contains(self, filename):
+            return False
 
-        def get_real_model_data(self, filename):
+        def prefetch_to_hot_layer(self, filename):
             return f"real_data_{filename}".encode()
 
-        def cache_to_hot_layer(self, filename, data):
-            return True
-
 
     storage_manager = MockStorageManager()
     prefetcher = SemanticPrefetcher(storage_manager)
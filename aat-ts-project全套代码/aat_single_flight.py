@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# aat_single_flight.py
+"""
+AAT请求合并（single-flight）
+同一键的并发未命中只执行一次加载/解压/缓存，其余请求等待并共享结果
+"""
+
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-SingleFlight")
+
+
+class _Call:
+    """一次在途调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """按键合并并发调用"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+        self.stats = {
+            'executions': 0,  # 实际执行次数
+            'coalesced': 0,  # 合并到在途调用的请求数
+            'skipped': 0,  # 不等待、直接跳过的请求数
+            'errors': 0
+        }
+
+    def do(self, key, func, *args, wait=True):
+        """执行 func(*args)；同键调用在途时等待其结果
+
+        返回 (结果, 是否共享他人结果)；wait=False 且已有在途调用时返回 (None, True)
+        """
+        with self.lock:
+            call = self.in_flight.get(key)
+            if call is None:
+                call = _Call()
+                self.in_flight[key] = call
+                self.stats['executions'] += 1
+                leader = True
+            else:
+                leader = False
+                self.stats['coalesced' if wait else 'skipped'] += 1
+
+        if not leader:
+            if not wait:
+                return None, True
+
+            logger.debug(f"合并在途请求: {key}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args)
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            self.stats['errors'] += 1
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            call.event.set()
+
+    def get_stats(self):
+        """获取合并统计"""
+        requests = self.stats['executions'] + self.stats['coalesced'] + self.stats['skipped']
+        return {
+            **self.stats,
+            'in_flight': len(self.in_flight),
+            'coalesce_rate': (self.stats['coalesced'] + self.stats['skipped']) / requests if requests > 0 else 0
+        }
@@ -5,112 +5,563 @@ AAT智能存储管理器V2 - 完整真实数据版本
 确保所有数据都来自真实模型，消除模拟数据
 """
 
-import redis
-from minio import Minio
-from minio.error import S3Error
+import time
+
+_IMPORT_START = time.perf_counter()
+
+# redis/minio/urllib3 在首次连接时才导入（见 _redis_endpoint_client/_connect_minio），
+# 使用进程内后端或只做短命令行调用时不必付出数百毫秒的导入开销
+import contextlib
 import logging
 import os
 import sys
-import time
-import pickle
+import threading
 import json  # 添加缺失的json导入
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np  # 添加缺失的numpy导入
 
 # 添加新模块导入
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from aat_semantic_prefetcher import SemanticPrefetcher
 from aat_strategy_engine import AdaptiveStrategyEngine, StorageTier
-from aat_compression import CompressionManager, CompressionAlgorithm
-from aat_real_model_loader import RealModelDataLoader
+from aat_compression import CodecSelector, CompressionManager, CompressionAlgorithm, TensorFilter
+from aat_real_model_loader import RealModelDataLoader, parse_tensor_index
+from aat_block_store import HotBlockStore
+from aat_warm_cache import WarmTierCache
+from aat_memory_cache import DecodedBlockCache
+from aat_single_flight import SingleFlight
+from aat_backend_health import CircuitBreaker
+from aat_checkpoint_writer import CheckpointWriter, CODEC_METADATA_KEY
+from aat_tier_migrator import TierMigrator
+from aat_hot_snapshot import HotSetSnapshot
+from aat_admission import HotTierAdmission
+from aat_object_catalog import ObjectCatalog
+from aat_namespaces import load_quotas
+from aat_content_store import ColdChunkStore
+from aat_hot_shards import ConsistentHashRing, ShardError, ShardedRedisClient, parse_endpoint
+from aat_tier_backends import BackendKeyError, KeyValueClient, ObjectStoreClient, create_backend
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AAT-StorageManagerV2")
 
+# 本模块及其依赖的导入耗时（毫秒），计入启动耗时分解
+_IMPORT_MS = (time.perf_counter() - _IMPORT_START) * 1000
+
 
 class AATStorageManagerV2:
     def __init__(self, config_path="aat_strategy_config.yaml"):
-        # 初始化基础存储客户端
-        self._init_storage_clients()
+        # 启动耗时分解（毫秒）：后台阶段完成时补入
+        init_start = time.perf_counter()
+        self.startup_timings = {'imports': _IMPORT_MS}
+
+        # 后端连接与真实模型目录可在后台完成；首次用到时才等待（最多 startup.ready_timeout 秒）
+        self._backends_ready = threading.Event()
+        self._catalog_ready = threading.Event()
+        self._model_loader = None
+        self._real_model_stats = None
+
+        with self._startup_phase('config'):
+            # 对象目录：文件/模型层/张量/大小/层类型/依赖的统一映射，各模块共享
+            self.catalog = ObjectCatalog()
+
+            # 策略引擎先于存储客户端初始化：连接参数来自配置
+            self.strategy_engine = AdaptiveStrategyEngine(config_path, catalog=self.catalog)
+        startup_config = self.strategy_engine.config['startup']
+
+        with self._startup_phase('modules'):
+            # 初始化基础存储客户端（连接池 + 熔断器），连接稍后建立
+            self._init_storage_clients()
+
+            # 初始化智能模块
+            self.prefetcher = SemanticPrefetcher(self, catalog=self.catalog)
+            compression_config = self.strategy_engine.config['compression']
+            self.compression_manager = CompressionManager(CompressionAlgorithm(compression_config['algorithm']))
+
+            # 按对象、按层选择编码：每个对象采样一次，热层偏向解码速度，冷层偏向压缩率
+            self.codec_selector = CodecSelector(
+                self.compression_manager, compression_config['candidates'],
+                compression_config['read_bandwidth_bytes_per_sec'],
+                sample_size=compression_config['sample_size'],
+                min_savings=compression_config['min_savings'],
+                auto_select=compression_config['auto_select'])
+
+            # L0进程内缓存 - 已解压数据块，与热层块大小一致
+            self.memory_cache = self._init_memory_cache()
+
+            # 热层分块存储 - 按范围读取时只取覆盖到的块；Redis客户端在连接建立后注入
+            self.hot_store = HotBlockStore(
+                self._redis_client, self.compression_manager,
+                block_size=self.strategy_engine.config['hot_tier']['block_size'],
+                memory_cache=self.memory_cache,
+                dedup=self.strategy_engine.config['dedup']['hot_enabled'])
+
+            # 冷层内容寻址分片：相同内容的分片只存一份；版本化写入时保留已解码分片作为差分基准
+            delta_config = self.strategy_engine.config['delta']
+            self.chunk_store = ColdChunkStore(
+                self, self.strategy_engine.config['dedup']['cold_chunk_size'],
+                cache_bytes=delta_config['chunk_cache_bytes'] if delta_config['enabled'] else 0,
+                tensor_filter=TensorFilter(self.strategy_engine.config['compression']['tensor_filter']))
+
+            # 温层：本地SSD目录缓存，位于Redis与MinIO之间
+            self.warm_cache = self._init_warm_cache()
+
+            # 热层准入控制：放不下时只接纳比受害者更热的对象
+            self.admission = self._init_admission()
+
+            # 并发未命中合并：同一文件只加载一次
+            self.single_flight = SingleFlight()
+
+            # 批量读取时并发加载未命中文件的线程池
+            self.io_executor = ThreadPoolExecutor(
+                max_workers=self.strategy_engine.config['batch']['max_workers'],
+                thread_name_prefix="aat-io")
+
+            # 冷层大对象分段并行拉取的线程池（与io_executor分开，避免嵌套提交互相等待）
+            self.cold_fetch_executor = ThreadPoolExecutor(
+                max_workers=self.strategy_engine.config['cold_tier']['max_parallel_parts'],
+                thread_name_prefix="aat-cold")
 
-        # 初始化智能模块
-        self.strategy_engine = AdaptiveStrategyEngine(config_path)
-        self.prefetcher = SemanticPrefetcher(self)
-        self.compression_manager = CompressionManager()
+            # 差分链重定基与冷层分片回收在后台单线程执行，不阻塞写入
+            self.rebase_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aat-rebase")
 
-        # 真实模型数据加载器 - 确保所有数据真实
-        self.model_loader = RealModelDataLoader()
-        self.real_model_mapping = self._create_complete_real_model_mapping()
-        self.real_model_stats = self.model_loader.get_model_statistics()
+            # 冷层对象的张量索引：文件名 -> {张量名: 偏移/形状/类型}
+            self.tensor_indexes = {}
 
-        self.bucket_name = "models"
-        self.ensure_bucket_exists()
+            self.bucket_name = "models"
 
-        logger.info(
-            f"AAT智能存储管理器V2初始化完成 - 真实模型: {self.real_model_stats['total_layers']}层, "
-            f"总大小: {self.real_model_stats['total_size_mb']:.2f}MB, "
-            f"全部真实数据: {self.real_model_stats['all_real_data']}")
+        # 连接Redis/MinIO：后台进行时构造函数不等待网络往返
+        self._start_phase(self._connect_backends, "aat-connect", startup_config['background_connect'])
+
+        # 真实模型数据加载器 + 对象目录 - 确保所有数据真实；后台构建时首次需要真实数据的请求才等待
+        self._start_phase(self._build_catalog, "aat-catalog", startup_config['background_catalog'])
+
+        with self._startup_phase('background'):
+            # 后台分层迁移：按评分与字节预算主动提升/降级
+            self.migrator = TierMigrator(self)
+            if self.strategy_engine.config['migration']['enabled']:
+                self.migrator.start()
+
+            # 热集快照：定期保存热层对象与评分，重启后按优先级并行回填
+            self.hot_snapshot = HotSetSnapshot(self)
+            if self.strategy_engine.config['hot_snapshot']['enabled']:
+                self.hot_snapshot.start()
+
+            # 后台重连/探测：启动时不可用或被熔断的后端恢复后自动重新接入
+            self._health_stop = threading.Event()
+            self._health_thread = threading.Thread(
+                target=self._health_loop, name="aat-health", daemon=True)
+            self._health_thread.start()
+
+        self.startup_timings['init'] = (time.perf_counter() - init_start) * 1000
+        logger.info(f"AAT智能存储管理器V2初始化完成 - 启动耗时: {self._format_startup_timings()}")
+
+    @contextlib.contextmanager
+    def _startup_phase(self, name):
+        """记录一个启动阶段的耗时（毫秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[name] = (time.perf_counter() - start) * 1000
+
+    def _format_startup_timings(self):
+        return ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.startup_timings.items())
+
+    def _start_phase(self, target, name, background):
+        """执行一个可延后的启动阶段：后台线程中执行，或在构造函数中同步执行"""
+        if background:
+            threading.Thread(target=target, name=name, daemon=True).start()
+        else:
+            target()
+
+    def _wait_ready(self, event, what):
+        """等待后台启动阶段完成，超时后按未就绪继续"""
+        if event.is_set():
+            return True
+        if not event.wait(self.strategy_engine.config['startup']['ready_timeout']):
+            logger.warning(f"⚠ 等待{what}超时，按未就绪处理")
+            return False
+        return True
+
+    def _connect_backends(self):
+        """连接热层与冷层并确保桶存在；完成后放行等待后端的调用
+
+        连接期间已被显式设置的客户端优先，不被覆盖
+        """
+        try:
+            with self._startup_phase('backends'):
+                redis_client = self._connect_redis()
+                if self._redis_client is None:
+                    self._redis_client = self.hot_store.redis_client = redis_client
+                minio_client = self._connect_minio()
+                if minio_client is not None:
+                    self._ensure_bucket(minio_client)
+                if self._minio_client is None:
+                    self._minio_client = minio_client
+        except Exception as e:
+            logger.error(f"后端连接失败: {e}")
+        finally:
+            self._backends_ready.set()
+        logger.info(f"后端连接阶段完成 - 耗时: {self.startup_timings['backends']:.0f}ms")
+
+    def _build_catalog(self):
+        """加载真实模型并构建对象目录；完成后放行等待真实数据的调用"""
+        try:
+            with self._startup_phase('catalog'):
+                model_loader = RealModelDataLoader()
+                self.catalog.build(model_loader)
+                self._model_loader = model_loader
+            stats = self._real_model_stats = model_loader.get_model_statistics()
+            logger.info(
+                f"✓ 真实模型目录就绪 - 真实模型: {stats['total_layers']}层, "
+                f"总大小: {stats['total_size_mb']:.2f}MB, 全部真实数据: {stats['all_real_data']}, "
+                f"耗时: {self.startup_timings['catalog']:.0f}ms")
+        except Exception as e:
+            logger.error(f"真实模型目录构建失败: {e}")
+        finally:
+            self._catalog_ready.set()
+
+    @property
+    def redis_client(self):
+        """热层客户端；后台连接尚未完成时先等待"""
+        self._wait_ready(self._backends_ready, "后端连接")
+        return self._redis_client
+
+    @redis_client.setter
+    def redis_client(self, client):
+        self._redis_client = client
+
+    @property
+    def minio_client(self):
+        """冷层客户端；后台连接尚未完成时先等待"""
+        self._wait_ready(self._backends_ready, "后端连接")
+        return self._minio_client
+
+    @minio_client.setter
+    def minio_client(self, client):
+        self._minio_client = client
+
+    @property
+    def model_loader(self):
+        """真实模型数据加载器；后台构建尚未完成时先等待"""
+        self._wait_ready(self._catalog_ready, "真实模型目录")
+        return self._model_loader
+
+    @property
+    def real_model_stats(self):
+        """真实模型统计（首次访问时计算）"""
+        if self._real_model_stats is None and self.model_loader is not None:
+            self._real_model_stats = self.model_loader.get_model_statistics()
+        return self._real_model_stats
 
     def _init_storage_clients(self):
         """初始化存储客户端"""
-        # Redis客户端（热层）
+        conn_config = self.strategy_engine.config['connections']
+        breaker_config = conn_config['circuit_breaker']
+        self.redis_breaker = CircuitBreaker(
+            "redis", breaker_config['failure_threshold'], breaker_config['reset_timeout'])
+        self.minio_breaker = CircuitBreaker(
+            "minio", breaker_config['failure_threshold'], breaker_config['reset_timeout'])
+
+        # 可选的进程内后端（内存/本地文件系统，可整形），未配置时连接真实的Redis/MinIO
+        backend_config = self.strategy_engine.config['backends']
+        self.hot_backend = create_backend(backend_config['hot'])
+        self.cold_backend = create_backend(backend_config['cold'])
+
+        # 表示后端已正常应答（如对象不存在）的异常，不计为故障；连接MinIO后加入S3Error
+        self.answered_errors = (BackendKeyError,)
+
+        # Redis客户端（热层）；配置多个分片时键按一致性哈希分布，哈希环与异步客户端共享
+        redis_config = conn_config['redis']
+        self.hot_ring = None
+        self.hot_shard_endpoints = list(redis_config['shards'])  # 期望的分片成员，扩缩容时更新
+        if self.hot_backend is None and self.hot_shard_endpoints:
+            self.hot_ring = ConsistentHashRing(virtual_nodes=redis_config['virtual_nodes'])
+
+        # 客户端由 _connect_backends 建立（可在后台）
+        self._redis_client = None
+        self._minio_client = None
+
+    def _connect_redis(self, log_failure=True):
+        """建立Redis连接池客户端，失败返回None；配置了多个分片时返回按一致性哈希路由的分片客户端"""
+        if self.hot_backend is not None:
+            logger.info(f"热层使用进程内后端: {self.hot_backend.name}")
+            return KeyValueClient(self.hot_backend)
+
+        if self.hot_ring is not None:
+            return self._connect_redis_shards(log_failure)
+
+        redis_config = self.strategy_engine.config['connections']['redis']
         try:
-            self.redis_client = redis.Redis(
-                host='localhost', port=6379, db=0,
-                decode_responses=False
-            )
-            self.redis_client.ping()
+            client = self._redis_endpoint_client(redis_config['host'], redis_config['port'])
+            client.ping()
             logger.info("Redis连接成功")
+            return client
         except Exception as e:
-            logger.error(f"Redis连接失败: {e}")
-            self.redis_client = None
+            if log_failure:
+                logger.error(f"Redis连接失败: {e}")
+            return None
+
+    def _redis_endpoint_client(self, host, port):
+        """单个Redis实例的连接池客户端"""
+        import redis
 
-        # MinIO客户端（冷层）
+        redis_config = self.strategy_engine.config['connections']['redis']
+        pool = redis.ConnectionPool(
+            host=host, port=port, db=redis_config['db'],
+            max_connections=redis_config['max_connections'],
+            socket_timeout=redis_config['socket_timeout'],
+            socket_connect_timeout=redis_config['connect_timeout'],
+            socket_keepalive=True,
+            retry_on_timeout=True,
+            health_check_interval=redis_config['health_check_interval'],
+            decode_responses=False
+        )
+        return redis.Redis(connection_pool=pool)
+
+    def _connect_redis_shards(self, log_failure=True):
+        """连接所有可达的分片，都不可达返回None；不可达的分片由健康检查在恢复后加入"""
+        clients = {}
+        for endpoint in self.hot_shard_endpoints:
+            try:
+                client = self._redis_endpoint_client(*parse_endpoint(endpoint))
+                client.ping()
+                clients[endpoint] = client
+            except Exception as e:
+                if log_failure:
+                    logger.error(f"Redis分片连接失败 {endpoint}: {e}")
+        if not clients:
+            return None
+
+        for endpoint in list(self.hot_ring.members):
+            if endpoint not in clients:
+                self.hot_ring.remove(endpoint)
+        for endpoint in clients:
+            self.hot_ring.add(endpoint)
+        logger.info(f"Redis分片连接成功: {len(clients)} 个分片, 每分片 {self.hot_ring.virtual_nodes} 个虚拟节点")
+        breaker_config = self.strategy_engine.config['connections']['circuit_breaker']
+        return ShardedRedisClient(
+            self.hot_ring, clients, breaker_config['failure_threshold'], breaker_config['reset_timeout'])
+
+    def _check_redis_shards(self):
+        """探测已熔断的分片，并把恢复可达的分片加入哈希环（触发重新平衡）"""
+        self.redis_client.probe()
+        for endpoint in list(self.hot_shard_endpoints):
+            if endpoint in self.redis_client.clients:
+                continue
+            try:
+                client = self._redis_endpoint_client(*parse_endpoint(endpoint))
+                client.ping()
+            except Exception:
+                continue
+            self.redis_client.add_shard(endpoint, client)
+            logger.info(f"✓ Redis分片重新接入: {endpoint}")
+
+    def add_hot_shard(self, endpoint):
+        """扩容：加入新的Redis分片，返回迁移到该分片的键数"""
+        if not isinstance(self.redis_client, ShardedRedisClient):
+            raise RuntimeError("热层未启用分片（connections.redis.shards 为空）")
+        client = self._redis_endpoint_client(*parse_endpoint(endpoint))
+        client.ping()
+        if endpoint not in self.hot_shard_endpoints:
+            self.hot_shard_endpoints.append(endpoint)
+        return self.redis_client.add_shard(endpoint, client)
+
+    def remove_hot_shard(self, endpoint):
+        """缩容：移除Redis分片，先把它持有的键迁到其余分片，返回迁移的键数"""
+        if not isinstance(self.redis_client, ShardedRedisClient):
+            raise RuntimeError("热层未启用分片（connections.redis.shards 为空）")
+        moved = self.redis_client.remove_shard(endpoint)
+        if endpoint not in self.redis_client.clients and endpoint in self.hot_shard_endpoints:
+            self.hot_shard_endpoints.remove(endpoint)
+        return moved
+
+    def _connect_minio(self, log_failure=True):
+        """建立MinIO客户端（共享urllib3连接池、连接/读取超时），失败返回None"""
+        if self.cold_backend is not None:
+            logger.info(f"冷层使用进程内后端: {self.cold_backend.name}")
+            return ObjectStoreClient(self.cold_backend)
+
+        minio_config = self.strategy_engine.config['connections']['minio']
         try:
-            self.minio_client = Minio(
-                "localhost:9000",
-                access_key="minioadmin",
-                secret_key="minioadmin",
-                secure=False
+            import urllib3
+            from minio import Minio
+            from minio.error import S3Error
+            self.answered_errors = (S3Error, BackendKeyError)
+
+            http_client = urllib3.PoolManager(
+                maxsize=minio_config['max_connections'],
+                timeout=urllib3.Timeout(
+                    connect=minio_config['connect_timeout'], read=minio_config['read_timeout']),
+                retries=urllib3.Retry(
+                    total=2, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
             )
-            self.minio_client.list_buckets()
+            client = Minio(
+                minio_config['endpoint'],
+                access_key=minio_config['access_key'],
+                secret_key=minio_config['secret_key'],
+                secure=minio_config['secure'],
+                http_client=http_client
+            )
+            client.list_buckets()
             logger.info("MinIO连接成功")
+            return client
+        except Exception as e:
+            if log_failure:
+                logger.error(f"MinIO连接失败: {e}")
+            return None
+
+    def _redis_available(self):
+        """Redis已连接且未熔断"""
+        return self.redis_client is not None and self.redis_breaker.allow()
+
+    def _minio_available(self):
+        """MinIO已连接且未熔断"""
+        return self.minio_client is not None and self.minio_breaker.allow()
+
+    def _guarded_call(self, breaker, func, *args, **kwargs):
+        """调用后端并把结果计入熔断器；异常继续抛出由调用方处理
+
+        answered_errors（S3Error/BackendKeyError）表示服务端已正常应答（如对象不存在），不计为后端故障；
+        ShardError 已计入该热层分片自己的熔断器，单个分片故障不熔断整个热层
+        """
+        try:
+            result = func(*args, **kwargs)
+        except self.answered_errors:
+            breaker.record_success()
+            raise
+        except ShardError:
+            raise
         except Exception as e:
-            logger.error(f"MinIO连接失败: {e}")
-            self.minio_client = None
+            breaker.record_failure(e)
+            raise
+        breaker.record_success()
+        return result
 
-    def _create_complete_real_model_mapping(self):
-        """创建完整的真实模型文件映射 - 确保所有文件都有真实数据"""
-        return {
-            'embedding.bin': 'embedding',
-            'layer0.bin': 'encoder_layer_0',
-            'layer1.bin': 'encoder_layer_1',
-            'layer2.bin': 'encoder_layer_2',
-            'layer3.bin': 'encoder_layer_3',
-            'output.bin': 'lm_head',
-            'config.json': 'config',
-            # 检查点文件映射到真实模型层
-            'checkpoint.ckpt': 'encoder_layer_0',
-            'checkpoint_v1.ckpt': 'encoder_layer_1',
-            'checkpoint_v2.ckpt': 'encoder_layer_2',
-            'checkpoint_v3.ckpt': 'encoder_layer_3',
-            'checkpoint_latest.ckpt': 'lm_head',
-            'model.safetensors': 'embedding'
-        }
+    def _health_loop(self):
+        """后台健康检查：重连断开的后端，探测已熔断的后端；按周期安排冷层分片回收"""
+        interval = self.strategy_engine.config['connections']['reconnect_interval']
+        gc_interval = self.strategy_engine.config['dedup']['cold_gc_interval']
+        last_gc = time.time()
+        while not self._health_stop.wait(interval):
+            try:
+                self._check_redis()
+                self._check_minio()
+                if gc_interval and time.time() - last_gc >= gc_interval:
+                    last_gc = time.time()
+                    self.rebase_executor.submit(self.collect_cold_garbage)
+            except Exception as e:
+                logger.warning(f"后端健康检查异常: {e}")
+
+    def _check_redis(self):
+        """Redis重连/探测"""
+        if self.redis_client is None:
+            client = self._connect_redis(log_failure=False)
+            if client is not None:
+                self.redis_client = client
+                self.hot_store.redis_client = client
+                self.redis_breaker.reset()
+                logger.info("✓ Redis重新接入")
+            return
+
+        if isinstance(self.redis_client, ShardedRedisClient):
+            self._check_redis_shards()
+
+        if self.redis_breaker.state != CircuitBreaker.CLOSED:
+            try:
+                self.redis_client.ping()
+                self.redis_breaker.record_success()
+            except Exception as e:
+                self.redis_breaker.record_failure(e)
+
+    def _check_minio(self):
+        """MinIO重连/探测"""
+        if self.minio_client is None:
+            client = self._connect_minio(log_failure=False)
+            if client is not None:
+                self.minio_client = client
+                self.minio_breaker.reset()
+                self.ensure_bucket_exists()
+                logger.info("✓ MinIO重新接入")
+            return
+
+        if self.minio_breaker.state != CircuitBreaker.CLOSED:
+            try:
+                self.minio_client.bucket_exists(self.bucket_name)
+                self.minio_breaker.record_success()
+            except Exception as e:
+                self.minio_breaker.record_failure(e)
+
+    def close(self):
+        """停止后台健康检查并释放线程池与连接"""
+        self._health_stop.set()
+        self.hot_snapshot.stop()
+        self.migrator.stop()
+        self.io_executor.shutdown(wait=False)
+        self.cold_fetch_executor.shutdown(wait=False)
+        self.rebase_executor.shutdown(wait=False)
+        if self.redis_client is not None:
+            self.redis_client.close()
+        if self.warm_cache is not None:
+            self.warm_cache.close()
+
+    def _init_memory_cache(self):
+        """初始化L0进程内缓存"""
+        l0_config = self.strategy_engine.config['l0_cache']
+        if not l0_config['enabled']:
+            logger.info("L0缓存未启用")
+            return None
+
+        return DecodedBlockCache(
+            capacity_bytes=l0_config['capacity_bytes'],
+            block_size=self.strategy_engine.config['hot_tier']['block_size'])
+
+    def _init_warm_cache(self):
+        """初始化温层缓存（本地SSD）"""
+        warm_config = self.strategy_engine.config['warm_tier']
+        if not warm_config['enabled']:
+            logger.info("温层缓存未启用")
+            return None
+
+        try:
+            return WarmTierCache(warm_config['directory'], warm_config['capacity_bytes'])
+        except Exception as e:
+            logger.error(f"温层缓存初始化失败: {e}")
+            return None
+
+    def _init_admission(self):
+        """初始化热层准入控制"""
+        admission_config = self.strategy_engine.config['admission']
+        namespace_config = self.strategy_engine.config['namespaces']
+        if not admission_config['enabled']:
+            logger.info("热层准入控制未启用")
+            return None
+
+        return HotTierAdmission(
+            admission_config['capacity_bytes'],
+            self.strategy_engine.get_cache_ttl(StorageTier.HOT),
+            memory_info=lambda: self.redis_client.info('memory'),
+            sketch_width=admission_config['sketch_width'],
+            sketch_depth=admission_config['sketch_depth'],
+            max_object_fraction=admission_config['max_object_fraction'],
+            info_refresh_interval=admission_config['info_refresh_interval'],
+            quotas=load_quotas(namespace_config),
+            default_quota=namespace_config['default_hot_quota_bytes'],
+            fair_share=namespace_config['fair_share'])
+
+    @property
+    def real_model_mapping(self):
+        """由真实模型提供数据的文件 -> 模型层"""
+        self._wait_ready(self._catalog_ready, "真实模型目录")
+        return self.catalog.real_model_mapping
 
     def get_real_model_data(self, filename):
         """获取真实模型数据 - 核心方法，确保所有数据真实"""
-        if filename in self.real_model_mapping:
-            layer_name = self.real_model_mapping[filename]
-            real_data = self.model_loader.get_tensor_data(layer_name)
-            if real_data:
-                logger.info(f"✓ 从真实模型加载: {filename} -> {layer_name} ({len(real_data)} bytes)")
-                return real_data
-
-        # 如果映射中不存在，尝试直接按文件名查找
-        layer_name = filename.replace('.bin', '').replace('.ckpt', '').replace('.json', '')
-        real_data = self.model_loader.get_tensor_data(layer_name)
+        self._wait_ready(self._catalog_ready, "真实模型目录")
+        layer_name = self.catalog.model_layer(filename)
+        real_data = self.model_loader.get_tensor_data(layer_name) if layer_name is not None else None
         if real_data:
-            logger.info(f"✓ 从真实模型加载(直接): {filename} -> {layer_name} ({len(real_data)} bytes)")
+            logger.info(f"✓ 从真实模型加载: {filename} -> {layer_name} ({len(real_data)} bytes)")
             return real_data
 
         logger.warning(f"⚠ 未找到真实模型数据: {filename}")
@@ -122,31 +573,163 @@ class AATStorageManagerV2:
 
     def ensure_bucket_exists(self):
         """确保MinIO桶存在"""
-        if self.minio_client is None:
+        if not self._minio_available():
             return
+        self._ensure_bucket(self.minio_client)
 
+    def _ensure_bucket(self, client):
         try:
-            if not self.minio_client.bucket_exists(self.bucket_name):
-                self.minio_client.make_bucket(self.bucket_name)
+            if not self._guarded_call(self.minio_breaker, client.bucket_exists, self.bucket_name):
+                client.make_bucket(self.bucket_name)
                 logger.info(f"创建桶: {self.bucket_name}")
         except Exception as e:
             logger.error(f"MinIO桶检查失败: {e}")
 
     def get_from_hot_layer(self, filename):
-        """从热层获取数据"""
-        if self.redis_client is None:
+        """从热层获取整个文件"""
+        if not self._redis_available():
             return None
 
         try:
-            cache_key = f"file:{filename}"
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
-                return self._decompress_cached_data(cached_data)
-            return None
+            return self._guarded_call(self.redis_breaker, self.hot_store.get, filename)
         except Exception as e:
             logger.error(f"Redis读取失败 {filename}: {e}")
             return None
 
+    def get_range_from_hot_layer(self, filename, size, offset):
+        """从热层按范围获取数据 - 只拉取覆盖到的块，未命中返回None"""
+        if not self._redis_available():
+            return None
+
+        try:
+            return self._guarded_call(self.redis_breaker, self.hot_store.get_range, filename, size, offset)
+        except Exception as e:
+            logger.error(f"Redis范围读取失败 {filename}: {e}")
+            return None
+
+    def get_ranges_from_hot_layer(self, requests):
+        """从热层批量按范围获取数据 - 单次流水线往返，未命中项为None"""
+        if not self._redis_available():
+            return [None] * len(requests)
+
+        try:
+            return self._guarded_call(self.redis_breaker, self.hot_store.get_ranges, requests)
+        except Exception as e:
+            logger.error(f"Redis批量读取失败: {e}")
+            return [None] * len(requests)
+
+    def hot_layer_contains(self, filename):
+        """检查文件是否已在热层"""
+        if not self._redis_available():
+            return False
+
+        try:
+            return self._guarded_call(self.redis_breaker, self.hot_store.exists, filename)
+        except Exception as e:
+            logger.error(f"Redis检查失败 {filename}: {e}")
+            return False
+
+    def evict_from_hot_layer(self, filename):
+        """从热层移除文件（同时丢弃L0中的副本）"""
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(filename)
+        if self.admission is not None:
+            self.admission.on_evict(filename)
+
+        if not self._redis_available():
+            return False
+
+        try:
+            return self._guarded_call(self.redis_breaker, self.hot_store.delete, filename)
+        except Exception as e:
+            logger.error(f"热层移除失败 {filename}: {e}")
+            return False
+
+    def get_range_from_warm_layer(self, filename, size, offset):
+        """从温层按范围获取数据（mmap切片），未命中返回None"""
+        if self.warm_cache is None:
+            return None
+
+        try:
+            return self.warm_cache.get_range(filename, size, offset)
+        except Exception as e:
+            logger.error(f"温层读取失败 {filename}: {e}")
+            return None
+
+    def cache_to_warm_layer(self, filename, data):
+        """缓存数据到温层"""
+        if self.warm_cache is None:
+            return False
+
+        try:
+            return self.warm_cache.put(filename, data)
+        except Exception as e:
+            logger.error(f"温层缓存失败 {filename}: {e}")
+            return False
+
+    def promote_to_hot_layer(self, filename):
+        """温层 -> 热层提升"""
+        if self.warm_cache is None or not self._redis_available():
+            return False
+
+        data = self.warm_cache.get(filename)
+        if data is None:
+            return False
+
+        logger.info(f"⬆ 温层提升到热层: {filename}")
+        return self.cache_to_hot_layer(filename, data)
+
+    def load_to_warm_layer(self, filename):
+        """冷层 -> 温层：加载整个对象放入温层（不写热层）"""
+        if self.warm_cache is None:
+            return False
+
+        data, _ = self.single_flight.do(filename, self._load_and_place, filename, False)
+        return bool(data) and self.warm_cache.contains(filename)
+
+    def demote_to_warm_layer(self, filename):
+        """热层 -> 温层降级，降级后从Redis移除"""
+        if self.warm_cache is None:
+            return False
+
+        if not self.warm_cache.contains(filename):
+            data = self.get_from_hot_layer(filename)
+            if data is None or not self.cache_to_warm_layer(filename, data):
+                return False
+
+        logger.info(f"⬇ 热层降级到温层: {filename}")
+        self.evict_from_hot_layer(filename)
+        return True
+
+    def get_object_size(self, filename):
+        """对象完整大小：依次查温层、热层清单、真实模型、冷层，未知返回None"""
+        if self.warm_cache is not None:
+            size = self.warm_cache.size_of(filename)
+            if size is not None:
+                return size
+
+        if self._redis_available():
+            try:
+                manifest = self._guarded_call(self.redis_breaker, self.hot_store.get_manifest, filename)
+                if manifest is not None:
+                    return manifest['size']
+            except Exception as e:
+                logger.warning(f"热层清单读取失败 {filename}: {e}")
+
+        if filename in self.real_model_mapping:
+            return self.catalog.size_of(filename)
+
+        if self._minio_available():
+            try:
+                stat = self._guarded_call(
+                    self.minio_breaker, self.minio_client.stat_object, self.bucket_name, filename)
+                if self.chunk_store.is_chunked(stat.metadata):
+                    return self.chunk_store.get_manifest(filename)['size']
+                return stat.size
+            except Exception:
+                pass
+        return None
+
     def get_from_cold_layer(self, filename):
         """从冷层获取数据 - 优先使用真实模型数据"""
         # 首先尝试真实模型数据
@@ -154,76 +737,306 @@ class AATStorageManagerV2:
         if real_data:
             return real_data
 
-        if self.minio_client is None:
-            return self._get_real_fallback_data(filename)
+        return self._read_cold_object(filename)
+
+    def get_range_from_cold_layer(self, filename, size, offset):
+        """从冷层按范围获取数据 - 未压缩的单对象把offset/length直接下推为MinIO范围请求，失败返回None"""
+        if not self._minio_available():
+            return None
+
+        if size <= 0:
+            return b''
 
         try:
-            response = self.minio_client.get_object(self.bucket_name, filename)
-            data = response.read()
-            response.close()
-            response.release_conn()
+            # 先按元数据确定布局与编码：分片清单与压缩对象都不能按原始数据偏移发范围请求
+            stat = self._guarded_call(
+                self.minio_breaker, self.minio_client.stat_object, self.bucket_name, filename)
+            if self.chunk_store.is_chunked(stat.metadata):
+                # 分片布局：只拉取覆盖范围的分片
+                return self.chunk_store.read(filename, size, offset)
+
+            codec = (stat.metadata or {}).get(CODEC_METADATA_KEY)
+            if codec is None or codec == CompressionAlgorithm.NONE.value:
+                if offset >= stat.size:
+                    return b''
+                response = self._guarded_call(
+                    self.minio_breaker, self.minio_client.get_object,
+                    self.bucket_name, filename, offset=offset, length=min(size, stat.size - offset))
+                try:
+                    return response.read()
+                finally:
+                    response.close()
+                    response.release_conn()
+        except Exception as e:
+            logger.warning(f"MinIO范围读取失败 {filename} [{offset}, +{size}]: {e}")
+            return None
+
+        # 压缩写入的对象无法按原始偏移取范围，整体读取解压后再切片
+        data = self._read_cold_object(filename)
+        return None if data is None else self._extract_data_chunk(data, size, offset)
+
+    def _decode_cold_object(self, data, codec):
+        """按对象元数据中的编码方式解压（流式写入的检查点）"""
+        if codec is None or codec == CompressionAlgorithm.NONE.value:
             return data
+        return self.compression_manager.decompress(data, CompressionAlgorithm(codec))
+
+    def open_writer(self, filename, keep_hot=None, compress=None, parent=None):
+        """打开流式写入器，用于检查点等大文件写入
+
+        keep_hot/compress 为None时取 checkpoint_write 配置；
+        parent 为差分的父版本文件名，None时按 delta.auto_parent 推断
+        """
+        return CheckpointWriter(self, filename, keep_hot=keep_hot, compress=compress, parent=parent)
+
+    def put_data(self, filename, data, keep_hot=None, parent=None):
+        """写入文件 - data 可以是bytes，也可以是逐块产生数据的可迭代对象"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            chunk_size = self.strategy_engine.config['checkpoint_write']['part_size']
+            view = memoryview(data)
+            data = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+
+        try:
+            with self.open_writer(filename, keep_hot=keep_hot, parent=parent) as writer:
+                for chunk in data:
+                    writer.write(chunk)
+            return True
+        except Exception as e:
+            logger.error(f"写入失败 {filename}: {e}")
+            return False
+
+    def invalidate_cached_copies(self, filename):
+        """文件被覆盖写入前，作废L0/热层/温层中的旧副本（新内容重新选择编码）"""
+        self.codec_selector.forget(filename)
+        self.evict_from_hot_layer(filename)
+        if self.warm_cache is not None:
+            self.warm_cache.delete(filename)
+
+    def schedule_rebase(self, filename):
+        """差分链超过上限时，在后台把该版本物化为完整分片"""
+        config = self.strategy_engine.config
+        algorithm = CompressionAlgorithm.NONE
+        level = config['checkpoint_write']['compress_level']
+        if config['compression']['enabled']:
+            # 沿用写入时为该对象选定的冷层编码
+            codec = self.codec_selector.cached(filename, StorageTier.COLD.value) or self.codec_selector.fixed
+            algorithm = codec.algorithm
+            level = level if codec.level is None else codec.level
+
+        def rebase():
+            try:
+                return self.chunk_store.rebase(filename, algorithm, level)
+            except Exception as e:
+                logger.error(f"差分链重定基失败 {filename}: {e}")
+                return False
+
+        logger.info(f"↷ 差分链过长，安排后台重定基: {filename}")
+        return self.rebase_executor.submit(rebase)
+
+    def collect_cold_garbage(self):
+        """回收冷层中不被任何清单引用的分片（重定基、覆盖写入后遗留的差分与完整分片）"""
+        if not self._minio_available():
+            return 0
+        try:
+            return self.chunk_store.collect_garbage(self.strategy_engine.config['dedup']['cold_gc_grace'])
+        except Exception as e:
+            logger.error(f"冷层分片回收失败: {e}")
+            return 0
+
+    def on_object_written(self, filename):
+        """写入完成：之后以存储中的对象为准，不再映射到真实模型层"""
+        self.catalog.mark_written(filename)
+
+    def _read_cold_object(self, filename):
+        """从MinIO读取整个对象 - 大对象按字节范围分段并行拉取，失败返回None"""
+        if not self._minio_available():
+            return None
+
+        try:
+            stat = self._guarded_call(
+                self.minio_breaker, self.minio_client.stat_object, self.bucket_name, filename)
+            if self.chunk_store.is_chunked(stat.metadata):
+                return self.chunk_store.read(filename)
+
+            codec = (stat.metadata or {}).get(CODEC_METADATA_KEY)
+            if stat.size >= self.strategy_engine.config['cold_tier']['parallel_threshold']:
+                return self._decode_cold_object(self._read_cold_object_parallel(filename, stat.size), codec)
+
+            response = self._guarded_call(
+                self.minio_breaker, self.minio_client.get_object, self.bucket_name, filename)
+            try:
+                buffer = bytearray(stat.size)
+                self._read_response_into(response, memoryview(buffer))
+                return self._decode_cold_object(buffer, codec)
+            finally:
+                response.close()
+                response.release_conn()
         except Exception as e:
             logger.warning(f"MinIO读取失败 {filename}: {e}")
-            return self._get_real_fallback_data(filename)
+            return None
+
+    def _read_cold_object_parallel(self, filename, object_size):
+        """并行分段GET，各段直接写入预分配缓冲区"""
+        part_size = self.strategy_engine.config['cold_tier']['part_size']
+        buffer = bytearray(object_size)
+        view = memoryview(buffer)
+
+        def fetch_part(start):
+            length = min(part_size, object_size - start)
+            response = self._guarded_call(
+                self.minio_breaker, self.minio_client.get_object,
+                self.bucket_name, filename, offset=start, length=length)
+            try:
+                self._read_response_into(response, view[start:start + length])
+            finally:
+                response.close()
+                response.release_conn()
+
+        list(self.cold_fetch_executor.map(fetch_part, range(0, object_size, part_size)))
+        logger.info(f"✓ 冷层并行拉取: {filename} ({object_size / 1024 / 1024:.2f}MB, "
+                    f"{(object_size + part_size - 1) // part_size} 段)")
+        return buffer
+
+    @staticmethod
+    def _read_response_into(response, view):
+        """把响应体直接读入预分配缓冲区，省去 read() 产生的中间bytes"""
+        filled = 0
+        while filled < len(view):
+            count = response.readinto(view[filled:])
+            if not count:
+                raise IOError(f"响应提前结束: {filled}/{len(view)} bytes")
+            filled += count
 
     def cache_to_hot_layer(self, filename, data):
         """缓存数据到热层"""
         return self._cache_to_hot_layer(filename, data)
 
-    def _decompress_cached_data(self, cached_data):
-        """解压缓存数据"""
-        try:
-            if cached_data.startswith(b'\x80'):  # pickle magic number
-                unpickled = pickle.loads(cached_data)
-                if isinstance(unpickled, dict):
-                    if unpickled.get('compressed'):
-                        algo = unpickled['algorithm']
-                        compressed_data = unpickled['data']
-                        return self.compression_manager.decompress(compressed_data, algo)
-                    else:
-                        return unpickled.get('data', b'')
-            return cached_data
-        except Exception as e:
-            logger.warning(f"解压缓存数据失败: {e}")
-            return cached_data
-
     def _cache_to_hot_layer(self, filename, data):
-        """缓存数据到热层"""
-        if self.redis_client is None:
+        """缓存数据到热层（分块写入）"""
+        if not self._redis_available() or not self._admit_to_hot(filename, len(data)):
             return False
 
         try:
-            cache_key = f"file:{filename}"
             ttl = self.strategy_engine.get_cache_ttl(StorageTier.HOT)
-
-            # 检查是否需要压缩
-            if self.strategy_engine.should_compress(filename, len(data)):
-                compressed_data, algo = self.compression_manager.compress(data)
-                # 存储压缩信息和数据
-                cache_data = pickle.dumps({
-                    'compressed': True,
-                    'algorithm': algo,
-                    'data': compressed_data
-                })
-            else:
-                cache_data = pickle.dumps({
-                    'compressed': False,
-                    'data': data
-                })
-
-            self.redis_client.setex(cache_key, ttl, cache_data)
+            compress = self.strategy_engine.should_compress(filename, len(data))
+            codec = self.select_codec(filename, data, StorageTier.HOT) if compress else None
+            self._guarded_call(
+                self.redis_breaker, self.hot_store.put, filename, data, ttl, compress=compress, codec=codec)
+            if self.admission is not None:
+                self.admission.on_insert(filename, len(data))
             logger.info(f"✓ 数据缓存到热层: {filename}")
             return True
         except Exception as e:
             logger.error(f"热层缓存失败: {e}")
             return False
 
+    def select_codec(self, filename, data, tier, sample_size=None):
+        """对象在某一层的编码（每个对象每层只采样一次）"""
+        return self.codec_selector.select(filename, data, tier.value, sample_size)
+
+    def _admit_to_hot(self, filename, size, pinned=False):
+        """热层准入判定；通过时先把受害者降级到温层（无温层则直接移除）
+
+        pinned 为显式 keep_hot 写入，不比较访问频率
+        """
+        if self.admission is None:
+            return True
+
+        admitted, victims = self.admission.admit(filename, size, pinned)
+        for victim in victims:
+            if self.warm_cache is not None:
+                self.demote_to_warm_layer(victim)
+            else:
+                self.evict_from_hot_layer(victim)
+        return admitted
+
     # 在 get_data 方法中修复预取统计
-    def get_data(self, filename, size=0, offset=0):
+    def get_data(self, filename, size=0, offset=0, as_numpy=False, dtype=np.uint8):
+        """智能数据获取
+
+        返回bytes-like缓冲区（bytes/bytearray/memoryview），读路径上尽量不复制；
+        需要bytes的边界（如FUSE）自行转换。as_numpy=True 时返回 numpy.frombuffer 只读视图
+        """
+        data = self._get_data(filename, size, offset)
+        return self.as_numpy(data, dtype) if as_numpy else data
+
+    @staticmethod
+    def as_numpy(data, dtype=np.uint8):
+        """把缓冲区包装为numpy视图（不复制），末尾不足一个元素的字节被忽略"""
+        if data is None:
+            return None
+        return np.frombuffer(data, dtype=dtype, count=len(data) // np.dtype(dtype).itemsize)
+
+    def _get_data(self, filename, size=0, offset=0):
         """智能数据获取 - 修复预取统计逻辑"""
-        start_time = time.time()
+        tier, is_prefetch_hit = self._begin_request(filename, size)
+
+        # 0. L0进程内缓存：无网络往返、无解压
+        data = self._get_from_memory_cache(filename, size, offset, is_prefetch_hit)
+        if data is not None:
+            self.prefetcher.prefetch_async(filename)
+            return data
+
+        # 1. 首先尝试热层（只取覆盖请求范围的块）
+        if tier in [StorageTier.HOT, StorageTier.WARM]:
+            data = self.get_range_from_hot_layer(filename, size, offset)
+            if data is not None:
+                self._record_hot_hit(filename, is_prefetch_hit)
+
+                # 异步预取相关文件
+                self.prefetcher.prefetch_async(filename)
+                return data
+
+        # 2-4. 温层、真实模型/冷层、降级数据
+        return self._get_from_lower_tiers(filename, size, offset, tier, is_prefetch_hit)
 
+    def get_many(self, requests, as_numpy=False, dtype=np.uint8):
+        """批量数据获取 - 热层一次流水线往返，未命中的文件并发加载，结果按请求顺序返回
+
+        requests: [(filename, size, offset), ...]；as_numpy 含义同 get_data
+        """
+        results = [None] * len(requests)
+        contexts = [self._begin_request(filename, size) for filename, size, _ in requests]
+
+        # 0. L0进程内缓存
+        pending = []
+        for i, (filename, size, offset) in enumerate(requests):
+            data = self._get_from_memory_cache(filename, size, offset, contexts[i][1])
+            if data is not None:
+                self.prefetcher.prefetch_async(filename)
+                results[i] = data
+            else:
+                pending.append(i)
+
+        # 1. 热层：所有清单与数据块合并为一次流水线
+        hot_indexes = [i for i in pending if contexts[i][0] in [StorageTier.HOT, StorageTier.WARM]]
+        if hot_indexes:
+            hot_results = self.get_ranges_from_hot_layer([requests[i] for i in hot_indexes])
+            for i, data in zip(hot_indexes, hot_results):
+                if data is not None:
+                    self._record_hot_hit(requests[i][0], contexts[i][1])
+                    self.prefetcher.prefetch_async(requests[i][0])
+                    results[i] = data
+
+        # 2-4. 剩余未命中并发加载
+        missing = [i for i in pending if results[i] is None]
+        if missing:
+            futures = {
+                i: self.io_executor.submit(
+                    self._get_from_lower_tiers, *requests[i], *contexts[i])
+                for i in missing
+            }
+            for i, future in futures.items():
+                results[i] = future.result()
+
+        logger.info(f"✓ 批量获取完成: {len(requests)} 个请求, 热层往返: {1 if hot_indexes else 0}, "
+                    f"并发加载: {len(missing)}")
+        if as_numpy:
+            return [self.as_numpy(data, dtype) for data in results]
+        return results
+
+    def _begin_request(self, filename, size):
+        """请求前置处理：预取命中统计、访问记录、层级选择"""
         # 首先检查是否是预取命中
         is_prefetch_hit = filename in self.prefetcher.prefetch_stats['prefetched_files']
         if is_prefetch_hit:
@@ -231,55 +1044,229 @@ class AATStorageManagerV2:
 
         # 记录访问模式
         self.prefetcher.record_access(filename, "read", size)
+        if self.admission is not None:
+            self.admission.record_access(filename)
 
         # 选择存储层级
         tier = self.strategy_engine.select_storage_tier(filename, size)
+        return tier, is_prefetch_hit
 
-        # 1. 首先尝试热层
-        if tier in [StorageTier.HOT, StorageTier.WARM]:
-            data = self.get_from_hot_layer(filename)
-            if data:
-                # 正确记录缓存命中（包括预取命中）
-                self.strategy_engine.record_cache_hit(StorageTier.HOT, prefetched=is_prefetch_hit)
-                logger.info(f"✓ 热层命中: {filename} (预取: {is_prefetch_hit})")
-
-                # 异步预取相关文件
-                self.prefetcher.prefetch_async(filename)
-                return self._extract_data_chunk(data, size, offset)
+    def _get_from_memory_cache(self, filename, size, offset, is_prefetch_hit):
+        """L0缓存查找，未命中返回None"""
+        if self.memory_cache is None:
+            return None
 
-        # 2. 从真实模型获取数据（主要数据源）
-        real_data = self.get_real_model_data(filename)
-        if real_data:
-            logger.info(f"✓ 真实模型数据: {filename}")
-            # 根据策略决定是否缓存到热层
-            if tier == StorageTier.HOT:
-                self.cache_to_hot_layer(filename, real_data)
+        data = self.memory_cache.get_range(filename, size, offset)
+        if data is not None:
+            self.strategy_engine.record_cache_hit(StorageTier.HOT, prefetched=is_prefetch_hit)
+            logger.debug(f"✓ L0命中: {filename}")
+        return data
 
-            # 异步预取
-            self.prefetcher.prefetch_async(filename)
+    def _record_hot_hit(self, filename, is_prefetch_hit):
+        """记录热层命中"""
+        # 正确记录缓存命中（包括预取命中）
+        self.strategy_engine.record_cache_hit(StorageTier.HOT, prefetched=is_prefetch_hit)
+        logger.info(f"✓ 热层命中: {filename} (预取: {is_prefetch_hit})")
 
-            self.strategy_engine.record_cache_hit(StorageTier.COLD)
-            return self._extract_data_chunk(real_data, size, offset)
+    def _get_from_lower_tiers(self, filename, size, offset, tier, is_prefetch_hit, prefetch=True):
+        """热层未命中后的查找链：温层 -> 真实模型/冷层 -> 降级数据
 
-        # 3. 从冷层获取（备用）
-        logger.info(f"↷ 从冷层加载: {filename}")
-        data = self.get_from_cold_layer(filename)
+        prefetch=False 时不触发线程预取，由调用方（如异步管理器）自行调度
+        """
+        # 2. 温层（本地SSD）
+        data = self.get_range_from_warm_layer(filename, size, offset)
+        if data is not None:
+            self.strategy_engine.record_cache_hit(StorageTier.WARM, prefetched=is_prefetch_hit)
+            logger.info(f"✓ 温层命中: {filename}")
 
-        if data:
-            # 根据策略决定是否缓存到热层
+            # 热度足够时提升到热层；已有同文件提升在途时直接跳过
             if tier == StorageTier.HOT:
-                self.cache_to_hot_layer(filename, data)
+                self.single_flight.do(f"promote:{filename}", self.promote_to_hot_layer, filename, wait=False)
+
+            if prefetch:
+                self.prefetcher.prefetch_async(filename)
+            return data
 
+        # 3. 真实模型/冷层：同一文件的并发未命中只加载、压缩、缓存一次
+        data, shared = self.single_flight.do(
+            filename, self._load_and_place, filename, tier == StorageTier.HOT)
+        if shared:
+            logger.info(f"↺ 合并并发加载: {filename}")
+
+        if data:
             # 异步预取
-            self.prefetcher.prefetch_async(filename)
+            if prefetch:
+                self.prefetcher.prefetch_async(filename)
 
             self.strategy_engine.record_cache_hit(StorageTier.COLD)
             return self._extract_data_chunk(data, size, offset)
 
+        if data is None and tier != StorageTier.HOT and self.warm_cache is None:
+            # 不写入任何缓存时只拉取请求的范围
+            logger.info(f"↷ 从冷层范围加载: {filename}")
+            chunk = self.get_range_from_cold_layer(filename, size, offset)
+            if chunk is not None:
+                if prefetch:
+                    self.prefetcher.prefetch_async(filename)
+                self.strategy_engine.record_cache_hit(StorageTier.COLD)
+                return chunk
+
         # 4. 返回真实降级数据
         logger.warning(f"⚠ 使用真实降级数据: {filename}")
         return self._get_real_fallback_data(filename, size, offset)
 
+    def _load_and_place(self, filename, cache_hot):
+        """加载整个对象并按策略放置到热层/温层/L0，由single-flight保证同一文件只有一个执行者
+
+        真实模型数据不存在且没有任何缓存需要整份对象时返回None，由调用方改走范围读取
+        """
+        data = self.get_real_model_data(filename)
+        if data:
+            logger.info(f"✓ 真实模型数据: {filename}")
+        elif cache_hot or self.warm_cache is not None:
+            logger.info(f"↷ 从冷层加载: {filename}")
+            data = self._read_cold_object(filename)
+        else:
+            return None
+
+        if data:
+            # 根据策略决定是否缓存到热层；温层保留一份本地副本
+            if cache_hot:
+                self.cache_to_hot_layer(filename, data)
+            self.cache_to_warm_layer(filename, data)
+            if self.memory_cache is not None:
+                self.memory_cache.put_file(filename, data)
+        return data
+
+    def prefetch_to_hot_layer(self, filename):
+        """预取文件到热层 - 与前台未命中共享同一次加载"""
+        data, shared = self.single_flight.do(filename, self._load_and_place, filename, True)
+        if data and shared and not self.hot_layer_contains(filename):
+            # 合并到的是不写热层的前台加载，补写热层
+            self.cache_to_hot_layer(filename, data)
+        return data
+
+    @staticmethod
+    def tensor_key(layer, tensor_name):
+        """张量在各缓存层中的对象名"""
+        return f"{layer}::{tensor_name}"
+
+    def get_tensor_index(self, layer):
+        """获取层内各张量的偏移、形状与类型
+
+        layer 可以是文件名（如 layer0.bin）、模型层名（如 encoder_layer_0）或冷层对象名
+        """
+        self._wait_ready(self._catalog_ready, "真实模型目录")
+        layer_name = self.catalog.model_layer(layer)
+        if layer_name is not None:
+            return self.model_loader.get_tensor_index(layer_name)
+
+        if layer not in self.tensor_indexes:
+            index = self._read_cold_tensor_index(layer)
+            if index is None:
+                return None
+            self.tensor_indexes[layer] = index
+        return self.tensor_indexes[layer]
+
+    def _read_cold_tensor_index(self, filename):
+        """用范围请求只读取冷层对象的张量头，构建张量索引"""
+        if not self._minio_available():
+            return None
+
+        try:
+            stat = self._guarded_call(
+                self.minio_breaker, self.minio_client.stat_object, self.bucket_name, filename)
+            # 分片布局的对象本身是清单，文件大小与分片都从清单取（只读取一次）
+            manifest = None
+            if self.chunk_store.is_chunked(stat.metadata):
+                manifest = self.chunk_store.get_manifest(filename)
+        except Exception as e:
+            logger.warning(f"MinIO对象信息获取失败 {filename}: {e}")
+            return None
+
+        chunked = manifest is not None
+        codec = (stat.metadata or {}).get(CODEC_METADATA_KEY)
+        if not chunked and codec is not None and codec != CompressionAlgorithm.NONE.value:
+            # 压缩对象无法按偏移读取张量头，整体读取后解析
+            data = self._read_cold_object(filename)
+            if data is None:
+                return None
+            view = memoryview(data)
+            read_at = lambda offset, length: bytes(view[offset:offset + length])
+            total_size = len(data)
+        else:
+            if chunked:
+                fetch = lambda offset, length: self.chunk_store.read(filename, length, offset, manifest)
+                total_size = manifest['size']
+            else:
+                fetch = lambda offset, length: self.get_range_from_cold_layer(filename, length, offset)
+                total_size = stat.size
+
+            def read_at(offset, length):
+                chunk = fetch(offset, length)
+                if chunk is None or len(chunk) < length:
+                    raise IOError(f"张量头读取不完整: {filename} @ {offset}")
+                return bytes(chunk)
+
+        try:
+            return parse_tensor_index(read_at, total_size)
+        except Exception as e:
+            logger.warning(f"冷层对象不是张量文件或解析失败 {filename}: {e}")
+            return None
+
+    def get_tensor(self, layer, tensor_name):
+        """按张量粒度获取单个权重，返回带形状的numpy数组，不存在返回None
+
+        缓存与拉取都以张量为单位：L0/热层按张量对象名缓存，
+        真实模型只读取该张量的字节，冷层只发起该张量范围的GET
+        """
+        index = self.get_tensor_index(layer)
+        if index is None or tensor_name not in index:
+            logger.warning(f"⚠ 未找到张量: {layer} / {tensor_name}")
+            return None
+
+        info = index[tensor_name]
+        key = self.tensor_key(layer, tensor_name)
+        tier = self.strategy_engine.select_storage_tier(key, info['nbytes'])
+        if self.admission is not None:
+            self.admission.record_access(key)
+
+        data = self._get_from_memory_cache(key, info['nbytes'], 0, False)
+        if data is None and tier in [StorageTier.HOT, StorageTier.WARM]:
+            data = self.get_range_from_hot_layer(key, info['nbytes'], 0)
+            if data is not None:
+                self._record_hot_hit(key, False)
+
+        if data is None:
+            data, _ = self.single_flight.do(key, self._load_tensor, layer, tensor_name, info, tier)
+            if data is None:
+                return None
+            self.strategy_engine.record_cache_hit(StorageTier.COLD)
+
+        return np.frombuffer(data, dtype=info['dtype']).reshape(info['shape'])
+
+    def _load_tensor(self, layer, tensor_name, info, tier):
+        """从真实模型或冷层读取单个张量，并按张量粒度放入热层/L0"""
+        key = self.tensor_key(layer, tensor_name)
+        self._wait_ready(self._catalog_ready, "真实模型目录")
+        layer_name = self.catalog.model_layer(layer)
+        if layer_name is not None:
+            data = self.model_loader.read_tensor(layer_name, tensor_name)
+        else:
+            logger.info(f"↷ 从冷层范围加载张量: {key}")
+            data = self.get_range_from_cold_layer(layer, info['nbytes'], info['offset'])
+
+        if data is None or len(data) != info['nbytes']:
+            logger.warning(f"⚠ 张量读取失败: {key}")
+            return None
+
+        if tier == StorageTier.HOT:
+            self.cache_to_hot_layer(key, data)
+        if self.memory_cache is not None:
+            self.memory_cache.put_file(key, data)
+        logger.info(f"✓ 张量加载: {key} {info['shape']} ({info['nbytes']} bytes)")
+        return data
+
     def _extract_data_chunk(self, data, size, offset):
         """提取数据块"""
         if not data:
@@ -292,13 +1279,16 @@ class AATStorageManagerV2:
         if end > len(data):
             end = len(data)
 
-        return data[offset:end]
+        # 视图切片，不复制
+        return memoryview(data)[offset:end]
 
     def _get_real_fallback_data(self, filename, size, offset):
         """生成真实降级数据 - 基于模型结构"""
-        # 尝试从真实模型获取任何可用的数据
-        for layer_name in self.model_loader.list_available_layers():
-            real_data = self.model_loader.get_tensor_data(layer_name)
+        # 尝试从真实模型获取任何可用的数据（目录构建失败或等待超时时跳过）
+        model_loader = self.model_loader
+        layers = model_loader.list_available_layers() if model_loader is not None else []
+        for layer_name in layers:
+            real_data = model_loader.get_tensor_data(layer_name)
             if real_data:
                 logger.info(f"✓ 使用真实模型降级数据: {filename} -> {layer_name}")
                 return self._extract_data_chunk(real_data, size, offset)
@@ -326,7 +1316,40 @@ class AATStorageManagerV2:
 
     def get_performance_stats(self):
         """获取性能统计"""
-        return self.strategy_engine.get_performance_stats()
+        stats = self.strategy_engine.get_performance_stats()
+        stats['single_flight'] = self.single_flight.get_stats()
+        stats['migration'] = self.migrator.get_stats()
+        stats['hot_snapshot'] = self.hot_snapshot.get_stats()
+        stats['startup'] = {
+            'timings_ms': dict(self.startup_timings),
+            'backends_ready': self._backends_ready.is_set(),
+            'catalog_ready': self._catalog_ready.is_set()
+        }
+        if self.admission is not None:
+            stats['admission'] = self.admission.get_stats()
+        stats['compression'] = self.codec_selector.get_stats()
+        stats['dedup'] = {
+            'hot': self.hot_store.get_stats(),
+            'cold': self.chunk_store.get_stats()
+        }
+        stats['backends'] = {
+            'redis': self.redis_breaker.get_state(),
+            'minio': self.minio_breaker.get_state(),
+            'hot_backend': self.hot_backend.name if self.hot_backend is not None else 'redis',
+            'cold_backend': self.cold_backend.name if self.cold_backend is not None else 'minio'
+        }
+        if isinstance(self.redis_client, ShardedRedisClient):
+            stats['backends']['hot_shards'] = self.redis_client.get_stats()
+        if self.memory_cache is not None:
+            stats['l0_cache'] = self.memory_cache.get_stats()
+        if self.warm_cache is not None:
+            stats['warm_tier'] = self.warm_cache.get_stats()
+        return stats
+
+    def list_namespaces(self):
+        """已配置与已出现过的命名空间（模型/版本）"""
+        declared = [item['namespace'] for item in self.strategy_engine.config['namespaces']['models']]
+        return sorted(set(declared) | set(self.catalog.namespaces()))
 
     def get_access_patterns(self):
         """获取访问模式"""
@@ -337,12 +1360,16 @@ class AATStorageManagerV2:
         self.prefetcher.save_patterns(filepath)
 
     def test_connections(self):
-        """测试连接"""
+        """测试连接；真实模型目录未就绪（构建失败或等待超时）时报告为不可用"""
+        model_loader = self.model_loader
         results = {
             'redis': self.redis_client is not None,
             'minio': self.minio_client is not None,
-            'real_model': self.model_loader is not None,
-            'real_data_available': len(self.model_loader.list_available_layers()) > 0
+            'warm_tier': self.warm_cache is not None,
+            'redis_breaker': self.redis_breaker.get_state(),
+            'minio_breaker': self.minio_breaker.get_state(),
+            'real_model': model_loader is not None,
+            'real_data_available': model_loader is not None and len(model_loader.list_available_layers()) > 0
         }
         return results
 
@@ -351,14 +1378,17 @@ class AATStorageManagerV2:
         self.prefetcher.prefetch_async(filename)
 
     def get_storage_info(self):
-        """获取存储信息"""
+        """获取存储信息；真实模型目录未就绪时模型相关字段为None/空，real_model_ready 为False"""
+        model_stats = self.real_model_stats
         return {
-            'real_model_layers': self.real_model_stats['total_layers'],
-            'real_model_size_mb': self.real_model_stats['total_size_mb'],
+            'real_model_ready': model_stats is not None,
+            'real_model_layers': model_stats['total_layers'] if model_stats else None,
+            'real_model_size_mb': model_stats['total_size_mb'] if model_stats else None,
             'real_model_files': list(self.real_model_mapping.keys()),
-            'all_real_data': self.real_model_stats['all_real_data'],
+            'all_real_data': model_stats['all_real_data'] if model_stats else False,
             'redis_connected': self.redis_client is not None,
-            'minio_connected': self.minio_client is not None
+            'minio_connected': self.minio_client is not None,
+            'warm_tier_enabled': self.warm_cache is not None
         }
 
 
@@ -6,13 +6,15 @@ from dataclasses import dataclass
 from enum import Enum
 import time
 
+from aat_object_catalog import ObjectCatalog
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AAT-Strategy")
 
 
 class StorageTier(Enum):
     HOT = "hot"  # Redis内存缓存
-    WARM = "warm"  # 本地SSD（预留）
+    WARM = "warm"  # 本地SSD缓存
     COLD = "cold"  # MinIO对象存储
 
 
@@ -32,8 +34,10 @@ class TensorInfo:
 
 
 class AdaptiveStrategyEngine:
-    def __init__(self, config_path="aat_strategy_config.yaml"):
+    def __init__(self, config_path="aat_strategy_config.yaml", catalog=None):
         self.config = self._load_config(config_path)
+        # 文件类型分类由对象目录提供（与预取器、存储管理器共享）
+        self.catalog = catalog if catalog is not None else ObjectCatalog()
         self.tensor_info = {}
         self.current_mode = OperationMode(self.config['default_mode'])
 
@@ -41,6 +45,7 @@ class AdaptiveStrategyEngine:
         self.access_stats = {
             'total_requests': 0,
             'hot_hits': 0,
+            'warm_hits': 0,
             'cold_hits': 0,
             'prefetch_hits': 0,
             'last_reset_time': time.time()
@@ -65,7 +70,159 @@ class AdaptiveStrategyEngine:
             'compression': {
                 'enabled': True,
                 'min_size': 1024,  # 1KB以上才压缩
-                'algorithm': 'gzip'
+                'algorithm': 'gzip',  # 固定编码：关闭自动选择时及单对象布局流式写入使用（gzip/zlib/zstd/lz4）
+                'auto_select': True,  # 按对象、按层采样选择编码
+                'sample_size': 8192,  # 每个对象只采样一次的字节数
+                'min_savings': 0.1,  # 样本上节省不足该比例的编码不予考虑
+                'candidates': {  # 各层候选编码 "算法:级别"，zstd/lz4 未安装时跳过；不压缩总是参与比较
+                    'hot': ['lz4:1', 'zstd:1', 'zlib:1'],
+                    'cold': ['zstd:3', 'zstd:6', 'lz4:1', 'gzip:6']
+                },
+                'read_bandwidth_bytes_per_sec': {  # 估算读取耗时的层带宽：带宽越高，解码速度越重要
+                    'hot': 500 * 1024 * 1024,
+                    'cold': 100 * 1024 * 1024
+                },
+                'tensor_filter': 'byteshuffle'  # 冷层分片压缩前对张量数据的转置（none/byteshuffle/bitshuffle）
+            },
+            'hot_tier': {
+                'block_size': 256 * 1024  # 热层分块大小
+            },
+            'l0_cache': {
+                'enabled': True,
+                'capacity_bytes': 256 * 1024 * 1024  # 进程内已解压数据预算
+            },
+            'warm_tier': {
+                'enabled': True,
+                'directory': './warm_cache',
+                'capacity_bytes': 2 * 1024 * 1024 * 1024  # 2GB本地SSD预算
+            },
+            'read_ahead': {
+                'enabled': True,  # FUSE按打开的文件识别顺序读取并提前拉取后续块
+                'block_size': 1024 * 1024,  # 预读块大小
+                'initial_window': 2,  # 初始窗口（块数），读者跟上时倍增
+                'max_window': 32,
+                'trigger_reads': 2,  # 连续多少次首尾相接的读取后开始预读
+                'max_workers': 8
+            },
+            'cold_tier': {
+                'parallel_threshold': 16 * 1024 * 1024,  # 超过该大小的对象分段并行拉取
+                'part_size': 8 * 1024 * 1024,
+                'max_parallel_parts': 8
+            },
+            'checkpoint_write': {
+                'part_size': 16 * 1024 * 1024,  # MinIO分段上传的分段大小（不小于5MB）
+                'queue_depth': 8,  # 待上传队列深度（每项约1MB），与分段大小共同限定写入内存
+                'compress': True,
+                'compress_level': 1,  # 流式写入优先吞吐
+                'keep_latest_hot': False  # 是否把最新写入的版本同步写入热层
+            },
+            'dedup': {
+                'hot_enabled': True,  # 热层数据块按内容寻址，相同内容的块只存一份
+                'cold_enabled': True,  # 流式写入冷层时按分片内容寻址
+                'cold_chunk_size': 4 * 1024 * 1024,  # 冷层分片大小（去重粒度）
+                'cold_gc_interval': 3600,  # 冷层分片垃圾回收周期（秒），0表示不回收
+                'cold_gc_grace': 3600  # 分片持续不可达超过该时长才删除，保护写入中尚未写清单的分片
+            },
+            'delta': {
+                'enabled': True,  # 检查点新版本的分片存为相对父版本的差分（需开启 cold_enabled）
+                'auto_parent': True,  # 未指定父版本时按 _vN 命名推断，否则取文件自身的上一版
+                'max_chain_length': 4,  # 差分链超过该长度时后台重定基
+                'max_delta_ratio': 0.5,  # 压缩后差分超过分片大小该比例时改存完整分片
+                'chunk_cache_bytes': 256 * 1024 * 1024  # 已解码分片缓存，连续保存时免去读回父版本
+            },
+            'namespaces': {
+                'models': [],  # 预先声明的命名空间 [{namespace: 模型/版本, hot_quota_bytes: 配额}]
+                'default_hot_quota_bytes': 0,  # 未声明配额的命名空间的热层配额，0表示只受公平份额约束
+                'fair_share': True  # 热层满时优先挤出超出公平份额的命名空间
+            },
+            'hot_snapshot': {
+                'enabled': True,
+                'path': './aat_hot_snapshot.json',
+                'interval': 60,  # 保存周期（秒）
+                'max_objects': 10000,
+                'max_age': 24 * 3600,  # 超过该时长的快照不再回填
+                'rehydrate': True,  # 启动时按评分从高到低回填热层
+                'rehydrate_workers': 8,
+                'wait_for_rehydrate': False,  # 初始化是否等待回填完成（否则边服务边回填）
+                'rehydrate_timeout': 30
+            },
+            'admission': {
+                'enabled': True,
+                'capacity_bytes': 1024 * 1024 * 1024,  # 热层字节预算（Redis设置了maxmemory时取二者较小值）
+                'sketch_width': 4096,  # 频率草图宽度
+                'sketch_depth': 4,
+                'max_object_fraction': 0.25,  # 单个对象最多占用热层预算的比例
+                'info_refresh_interval': 5.0  # Redis INFO memory 刷新间隔（秒）
+            },
+            'migration': {
+                'enabled': True,
+                'interval': 30.0,  # 迁移周期（秒）
+                'warm_capacity_bytes': 1024 * 1024 * 1024,  # 迁移器规划的温层字节预算（不超过温层容量）
+                'bandwidth_bytes_per_sec': 64 * 1024 * 1024,  # 迁移限速
+                'max_moves_per_cycle': 16,
+                'rate_decay': 0.5,  # 访问速率EWMA中新样本的权重
+                'min_access_rate': 0.01  # 低于该访问速率（次/秒）的对象放冷层
+            },
+            'batch': {
+                'max_workers': 8  # 批量读取的并发加载线程数
+            },
+            'async_io': {
+                'max_workers': 16,  # 异步管理器中阻塞调用（MinIO/本地加载）的线程池上限
+                'max_connections': 64  # 异步Redis连接池上限
+            },
+            'connections': {
+                'redis': {
+                    'host': 'localhost',
+                    'port': 6379,
+                    'db': 0,
+                    'max_connections': 64,  # 连接池上限
+                    'socket_timeout': 2.0,  # 单次命令超时（秒），避免后端卡死时阻塞整个读路径
+                    'connect_timeout': 1.0,
+                    'health_check_interval': 30,  # 空闲连接复用前先PING
+                    'shards': [],  # 热层分片 "host:port" 列表，非空时忽略 host/port，键按一致性哈希分布
+                    'virtual_nodes': 160  # 每个分片在哈希环上的虚拟节点数
+                },
+                'minio': {
+                    'endpoint': 'localhost:9000',
+                    'access_key': 'minioadmin',
+                    'secret_key': 'minioadmin',
+                    'secure': False,
+                    'max_connections': 32,  # urllib3连接池大小，应不小于冷层并行分段数
+                    'connect_timeout': 2.0,
+                    'read_timeout': 30.0
+                },
+                'circuit_breaker': {
+                    'failure_threshold': 5,  # 连续失败次数达到阈值后熔断
+                    'reset_timeout': 10.0  # 熔断后多久放行探测请求（秒）
+                },
+                'reconnect_interval': 5.0  # 后台重连/探测周期（秒）
+            },
+            'startup': {
+                'background_connect': True,  # 后台连接Redis/MinIO，构造函数不等待网络往返
+                'background_catalog': True,  # 后台加载真实模型并构建对象目录
+                'ready_timeout': 10.0  # 首次用到后端/真实模型目录时最多等待后台阶段的时间（秒）
+            },
+            'backends': {
+                # 类型: redis/minio 使用真实服务；memory/localfs 为进程内后端，无需外部服务即可运行与压测
+                'hot': {
+                    'type': 'redis',  # redis / memory / localfs
+                    'path': './aat_backends/hot',  # localfs 数据目录
+                    'max_bytes': 0,  # memory 容量上限，超出按LRU淘汰，0表示不限
+                    'latency_ms': 0,  # 整形：每次调用（批量操作算一次）附加的延迟
+                    'bandwidth_bytes_per_sec': 0  # 整形：传输带宽，0表示不限
+                },
+                'cold': {
+                    'type': 'minio',  # minio / memory / localfs
+                    'path': './aat_backends/cold',
+                    'max_bytes': 0,
+                    'latency_ms': 0,
+                    'bandwidth_bytes_per_sec': 0
+                }
+            },
+            'prefetch': {
+                'enabled': True,
+                'lookahead': 2,
+                'max_concurrent': 3
             },
             'cache_ttl': {
                 'hot': 300,  # 5分钟
@@ -127,27 +284,8 @@ class AdaptiveStrategyEngine:
         return tier
 
     def _classify_file_type(self, filename):
-        """分类文件类型"""
-        filename_lower = filename.lower()
-
-        if any(x in filename_lower for x in ['embedding', 'emb']):
-            return 'embedding'
-        elif any(x in filename_lower for x in ['output', 'head', 'classifier']):
-            return 'output'
-        elif any(x in filename_lower for x in ['config', 'json', 'yaml']):
-            return 'config'
-        elif any(x in filename_lower for x in ['checkpoint', 'ckpt']):
-            return 'checkpoint'
-        elif 'layer0' in filename_lower:
-            return 'layer0'
-        elif 'layer1' in filename_lower:
-            return 'layer1'
-        elif 'layer2' in filename_lower:
-            return 'layer2'
-        elif 'layer3' in filename_lower:
-            return 'layer3'
-        else:
-            return 'other'
+        """分类文件类型 - 查对象目录"""
+        return self.catalog.layer_type_of(filename)
 
     def _make_tier_decision(self, tensor_info):
         """基于策略做出层级决策"""
@@ -173,6 +311,25 @@ class AdaptiveStrategyEngine:
 
         return StorageTier(base_tier)
 
+    def compute_placement_score(self, tensor_info, access_rate, size, max_size):
+        """迁移评分 - 按 performance_weights 加权近期访问率、大小与层重要性，越高越应放在快层
+
+        access_rate、大小均已归一化到 [0, 1]；小对象每字节收益更高
+        """
+        weights = self.config['performance_weights']
+        base_tier = self.config['tier_selection'].get(tensor_info.layer_type, 'cold')
+        importance = {'hot': 1.0, 'warm': 0.5}.get(base_tier, 0.0)
+        size_score = 1 - size / max_size if max_size > 0 else 0
+
+        score = (weights['access_frequency'] * access_rate +
+                 weights['tensor_size'] * size_score +
+                 weights['layer_importance'] * importance)
+
+        # 成本模式下压低快层倾向
+        if self.current_mode == OperationMode.COST_SAVING:
+            score *= 0.5
+        return score
+
     def should_compress(self, filename, size):
         """判断是否应该压缩"""
         if not self.config['compression']['enabled']:
@@ -209,6 +366,10 @@ class AdaptiveStrategyEngine:
             if prefetched:
                 self.access_stats['prefetch_hits'] += 1
                 logger.debug(f"📊 记录预取命中: {prefetched}")
+        elif tier == StorageTier.WARM:
+            self.access_stats['warm_hits'] += 1
+            if prefetched:
+                self.access_stats['prefetch_hits'] += 1
         elif tier == StorageTier.COLD:
             self.access_stats['cold_hits'] += 1
 
@@ -223,26 +384,31 @@ class AdaptiveStrategyEngine:
             return {
                 'total_requests': 0,
                 'hot_hit_rate': 0,
+                'warm_hit_rate': 0,
                 'prefetch_hit_rate': 0,
                 'cold_hit_rate': 0,
                 'stats_since': self.access_stats['last_reset_time'],
                 'hot_hits': 0,
+                'warm_hits': 0,
                 'prefetch_hits': 0,
                 'cold_hits': 0
             }
 
         # 确保命中率计算正确
         hot_hit_rate = self.access_stats['hot_hits'] / total
+        warm_hit_rate = self.access_stats['warm_hits'] / total
         prefetch_hit_rate = self.access_stats['prefetch_hits'] / total
         cold_hit_rate = self.access_stats['cold_hits'] / total
 
         return {
             'total_requests': total,
             'hot_hit_rate': hot_hit_rate,
+            'warm_hit_rate': warm_hit_rate,
             'prefetch_hit_rate': prefetch_hit_rate,
             'cold_hit_rate': cold_hit_rate,
             'stats_since': self.access_stats['last_reset_time'],
             'hot_hits': self.access_stats['hot_hits'],
+            'warm_hits': self.access_stats['warm_hits'],
             'prefetch_hits': self.access_stats['prefetch_hits'],
             'cold_hits': self.access_stats['cold_hits']
         }
@@ -252,6 +418,7 @@ class AdaptiveStrategyEngine:
         self.access_stats = {
             'total_requests': 0,
             'hot_hits': 0,
+            'warm_hits': 0,
             'cold_hits': 0,
             'prefetch_hits': 0,
             'last_reset_time': time.time()
@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+# aat_tier_backends.py
+"""
+AAT可插拔分层后端
+统一的后端接口(get / get_range / put / delete / exists / batch)，
+附带进程内实现（内存、本地文件系统）与延迟/带宽整形包装，
+并提供与Redis、MinIO客户端调用方式兼容的外观，单机即可运行并压测完整的分层结构
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-TierBackends")
+
+
+class BackendKeyError(KeyError):
+    """对象不存在 - 后端已正常应答，不计为后端故障"""
+
+
+class TierBackend:
+    """分层后端接口
+
+    batch 接收操作列表并一次执行（对应一次网络往返），操作格式：
+      ('get', key) -> bytes或None
+      ('put', key, value, ttl) -> True
+      ('delete', key) -> 删除的个数
+      ('exists', key) -> bool
+      ('expire', key, ttl) -> 对象存在并已续期时为True
+      ('incrby', key, amount) -> 计数器的新值
+    """
+
+    name = "backend"
+
+    def get(self, key):
+        """读取整个对象，不存在返回None"""
+        raise NotImplementedError
+
+    def get_range(self, key, offset, length=0):
+        """读取 [offset, offset + length) 字节，length为0表示读到末尾；不存在返回None"""
+        data = self.get(key)
+        if data is None:
+            return None
+        return data[offset:offset + length] if length else data[offset:]
+
+    def put(self, key, value, ttl=None, metadata=None):
+        """写入对象，ttl为秒数（None表示不过期）"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """删除对象，返回删除的个数"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        """对象是否存在"""
+        return self.stat(key) is not None
+
+    def expire(self, key, ttl):
+        """重新设置过期时间，对象不存在返回False"""
+        raise NotImplementedError
+
+    def stat(self, key):
+        """对象大小与元数据 (size, metadata)，不存在返回None"""
+        raise NotImplementedError
+
+    def keys(self):
+        """已存储的键"""
+        raise NotImplementedError
+
+    def incrby(self, key, amount):
+        """整数计数器加减，不存在视为0，返回新值（基类实现非原子且不保留TTL）"""
+        value = self.get(key)
+        value = (int(value) if value is not None else 0) + amount
+        self.put(key, str(value).encode())
+        return value
+
+    def batch(self, ops):
+        """批量执行操作，结果按操作顺序返回"""
+        results = []
+        for op, key, *args in ops:
+            if op == 'get':
+                results.append(self.get(key))
+            elif op == 'put':
+                self.put(key, *args)
+                results.append(True)
+            elif op == 'delete':
+                results.append(self.delete(key))
+            elif op == 'exists':
+                results.append(self.exists(key))
+            elif op == 'expire':
+                results.append(self.expire(key, *args))
+            elif op == 'incrby':
+                results.append(self.incrby(key, *args))
+            else:
+                raise ValueError(f"未知的批量操作: {op}")
+        return results
+
+    def used_bytes(self):
+        """已用字节数"""
+        return 0
+
+    def capacity_bytes(self):
+        """容量上限，0表示不限"""
+        return 0
+
+
+class InMemoryBackend(TierBackend):
+    """进程内存后端 - 支持TTL；设置容量上限时按LRU淘汰（同Redis allkeys-lru）"""
+
+    name = "memory"
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        # 键 -> (值, 过期时间或None, 元数据)，末尾为最近访问
+        self.objects = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def _live(self, key):
+        """取未过期的对象记录（调用方持锁）"""
+        record = self.objects.get(key)
+        if record is None:
+            return None
+        if record[1] is not None and record[1] <= time.time():
+            self._remove(key)
+            return None
+        self.objects.move_to_end(key)
+        return record
+
+    def _remove(self, key):
+        record = self.objects.pop(key, None)
+        if record is None:
+            return 0
+        self.total_bytes -= len(record[0])
+        return 1
+
+    def get(self, key):
+        with self.lock:
+            record = self._live(key)
+            return record[0] if record is not None else None
+
+    def put(self, key, value, ttl=None, metadata=None):
+        value = bytes(value)
+        with self.lock:
+            self._remove(key)
+            self.objects[key] = (value, time.time() + ttl if ttl else None, metadata or {})
+            self.total_bytes += len(value)
+            while self.max_bytes and self.total_bytes > self.max_bytes and len(self.objects) > 1:
+                self._remove(next(iter(self.objects)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            return self._remove(key)
+
+    def expire(self, key, ttl):
+        with self.lock:
+            record = self._live(key)
+            if record is None:
+                return False
+            self.objects[key] = (record[0], time.time() + ttl, record[2])
+            return True
+
+    def stat(self, key):
+        with self.lock:
+            record = self._live(key)
+            return (len(record[0]), record[2]) if record is not None else None
+
+    def keys(self):
+        with self.lock:
+            now = time.time()
+            return [key for key, (_, expires, _) in self.objects.items() if expires is None or expires > now]
+
+    def incrby(self, key, amount):
+        """与Redis INCRBY一致：原子加减，保留原有TTL"""
+        with self.lock:
+            record = self._live(key)
+            value = (int(record[0]) if record is not None else 0) + amount
+            expires, metadata = (record[1], record[2]) if record is not None else (None, {})
+            self._remove(key)
+            encoded = str(value).encode()
+            self.objects[key] = (encoded, expires, metadata)
+            self.total_bytes += len(encoded)
+            return value
+
+    def used_bytes(self):
+        return self.total_bytes
+
+    def capacity_bytes(self):
+        return self.max_bytes
+
+
+class LocalFSBackend(TierBackend):
+    """本地文件系统后端 - 每个对象一个文件，TTL与元数据存放在旁路 .meta 文件"""
+
+    name = "localfs"
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()
+        for name in os.listdir(root):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(root, name))
+
+    def _path(self, key):
+        return os.path.join(self.root, quote(key, safe=''))
+
+    def _meta(self, key):
+        """读取旁路元数据，对象已过期时删除并返回None"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path + '.meta', 'r') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            meta = {}
+        expires = meta.get('expires')
+        if expires is not None and expires <= time.time():
+            self.delete(key)
+            return None
+        return meta
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        return self.get_range(key, 0, 0)
+
+    def get_range(self, key, offset, length=0):
+        if self._meta(key) is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                f.seek(offset)
+                return f.read(length) if length else f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, value, ttl=None, metadata=None):
+        path = self._path(key)
+        with self.lock:
+            meta = {'expires': time.time() + ttl if ttl else None, 'metadata': metadata or {}}
+            self._write_atomic(path + '.meta', json.dumps(meta).encode())
+            self._write_atomic(path, value)
+
+    def delete(self, key):
+        path = self._path(key)
+        with self.lock:
+            try:
+                os.remove(path + '.meta')
+            except FileNotFoundError:
+                pass
+            try:
+                os.remove(path)
+                return 1
+            except FileNotFoundError:
+                return 0
+
+    def expire(self, key, ttl):
+        meta = self._meta(key)
+        if meta is None:
+            return False
+        meta['expires'] = time.time() + ttl
+        with self.lock:
+            self._write_atomic(self._path(key) + '.meta', json.dumps(meta).encode())
+        return True
+
+    def stat(self, key):
+        meta = self._meta(key)
+        if meta is None:
+            return None
+        try:
+            return os.path.getsize(self._path(key)), meta.get('metadata', {})
+        except FileNotFoundError:
+            return None
+
+    def used_bytes(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.root)
+                   if entry.is_file() and not entry.name.endswith(('.meta', '.tmp')))
+
+    def keys(self):
+        """已存储的键"""
+        return [unquote(name) for name in os.listdir(self.root)
+                if not name.endswith(('.meta', '.tmp'))]
+
+
+class ShapedBackend(TierBackend):
+    """延迟/带宽整形包装 - 每次调用（批量操作整体算一次往返）附加固定延迟与按字节数计算的传输时间"""
+
+    def __init__(self, backend, latency=0.0, bandwidth_bytes_per_sec=0):
+        self.backend = backend
+        self.latency = latency
+        self.bandwidth = bandwidth_bytes_per_sec
+        self.name = f"{backend.name}+shaped"
+        self.stats = {'calls': 0, 'bytes': 0, 'delay_seconds': 0.0}
+        self.lock = threading.Lock()
+
+    def _delay(self, nbytes):
+        delay = self.latency + (nbytes / self.bandwidth if self.bandwidth else 0)
+        with self.lock:
+            self.stats['calls'] += 1
+            self.stats['bytes'] += nbytes
+            self.stats['delay_seconds'] += delay
+        if delay > 0:
+            time.sleep(delay)
+
+    def get(self, key):
+        data = self.backend.get(key)
+        self._delay(len(data) if data is not None else 0)
+        return data
+
+    def get_range(self, key, offset, length=0):
+        data = self.backend.get_range(key, offset, length)
+        self._delay(len(data) if data is not None else 0)
+        return data
+
+    def put(self, key, value, ttl=None, metadata=None):
+        self._delay(len(value))
+        self.backend.put(key, value, ttl, metadata)
+
+    def delete(self, key):
+        self._delay(0)
+        return self.backend.delete(key)
+
+    def exists(self, key):
+        self._delay(0)
+        return self.backend.exists(key)
+
+    def expire(self, key, ttl):
+        self._delay(0)
+        return self.backend.expire(key, ttl)
+
+    def stat(self, key):
+        self._delay(0)
+        return self.backend.stat(key)
+
+    def incrby(self, key, amount):
+        self._delay(0)
+        return self.backend.incrby(key, amount)
+
+    def keys(self):
+        self._delay(0)
+        return self.backend.keys()
+
+    def batch(self, ops):
+        results = self.backend.batch(ops)
+        nbytes = sum(len(op[2]) for op in ops if op[0] == 'put')
+        nbytes += sum(len(result) for op, result in zip(ops, results)
+                      if op[0] == 'get' and result is not None)
+        self._delay(nbytes)
+        return results
+
+    def used_bytes(self):
+        return self.backend.used_bytes()
+
+    def capacity_bytes(self):
+        return self.backend.capacity_bytes()
+
+
+def create_backend(backend_config):
+    """按配置创建进程内后端；类型为 redis / minio 时返回None，使用真实服务"""
+    backend_type = backend_config['type']
+    if backend_type == 'memory':
+        backend = InMemoryBackend(backend_config.get('max_bytes', 0))
+    elif backend_type == 'localfs':
+        backend = LocalFSBackend(backend_config['path'])
+    elif backend_type in ('redis', 'minio'):
+        return None
+    else:
+        raise ValueError(f"未知的后端类型: {backend_type}")
+
+    latency = backend_config.get('latency_ms', 0) / 1000
+    bandwidth = backend_config.get('bandwidth_bytes_per_sec', 0)
+    if latency or bandwidth:
+        backend = ShapedBackend(backend, latency, bandwidth)
+    bandwidth_text = f"{bandwidth / 1024 / 1024:.0f}MB/s" if bandwidth else "不限"
+    logger.info(f"进程内后端: {backend.name} (延迟: {latency * 1000:.1f}ms, 带宽: {bandwidth_text})")
+    return backend
+
+
+def _value_bytes(value):
+    """与Redis客户端一致：字符串按UTF-8编码后存储"""
+    return value.encode() if isinstance(value, str) else bytes(value)
+
+
+def _key_list(keys, args):
+    """兼容 mget(keys) 与 mget(k1, k2, ...) 两种调用方式"""
+    if isinstance(keys, (str, bytes)):
+        return [keys, *args]
+    return [*keys, *args]
+
+
+class _Pipeline:
+    """Redis流水线外观 - 命令排队，execute时作为一个批量操作执行"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.ops = []
+        self.commands = []  # (命令, 对应的操作数)
+
+    def _queue(self, command, ops):
+        self.commands.append((command, len(ops)))
+        self.ops.extend(ops)
+        return self
+
+    def get(self, key):
+        return self._queue('get', [('get', key)])
+
+    def mget(self, keys, *args):
+        return self._queue('mget', [('get', key) for key in _key_list(keys, args)])
+
+    def set(self, key, value, ex=None):
+        return self._queue('put', [('put', key, _value_bytes(value), ex)])
+
+    def setex(self, key, ttl, value):
+        return self._queue('put', [('put', key, _value_bytes(value), ttl)])
+
+    def delete(self, *keys):
+        return self._queue('delete', [('delete', key) for key in keys])
+
+    def exists(self, *keys):
+        return self._queue('exists', [('exists', key) for key in keys])
+
+    def expire(self, key, ttl):
+        return self._queue('expire', [('expire', key, ttl)])
+
+    def incrby(self, key, amount=1):
+        return self._queue('incrby', [('incrby', key, amount)])
+
+    def execute(self):
+        ops, commands = self.ops, self.commands
+        self.ops, self.commands = [], []
+        results = self.backend.batch(ops) if ops else []
+
+        replies, position = [], 0
+        for command, count in commands:
+            part = results[position:position + count]
+            position += count
+            if command == 'mget':
+                replies.append(part)
+            elif command in ('delete', 'exists'):
+                replies.append(sum(int(result) for result in part))
+            else:
+                replies.append(part[0])
+        return replies
+
+
+class KeyValueClient:
+    """Redis客户端外观 - 热层代码按原样使用进程内后端"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def mget(self, keys, *args):
+        return self.backend.batch([('get', key) for key in _key_list(keys, args)])
+
+    def set(self, key, value, ex=None):
+        self.backend.put(key, _value_bytes(value), ex)
+        return True
+
+    def setex(self, key, ttl, value):
+        self.backend.put(key, _value_bytes(value), ttl)
+        return True
+
+    def delete(self, *keys):
+        return sum(self.backend.batch([('delete', key) for key in keys]))
+
+    def exists(self, *keys):
+        return sum(int(result) for result in self.backend.batch([('exists', key) for key in keys]))
+
+    def expire(self, key, ttl):
+        return self.backend.expire(key, ttl)
+
+    def incrby(self, key, amount=1):
+        return self.backend.incrby(key, amount)
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self.backend)
+
+    def ping(self):
+        return True
+
+    def info(self, section=None):
+        return {'used_memory': self.backend.used_bytes(), 'maxmemory': self.backend.capacity_bytes()}
+
+    def close(self):
+        pass
+
+
+class _AsyncPipeline(_Pipeline):
+    """异步流水线外观 - 排队同步进行，执行放到线程中"""
+
+    async def execute(self):
+        return await asyncio.to_thread(super().execute)
+
+
+class AsyncKeyValueClient:
+    """redis.asyncio 客户端外观 - 后端调用放到线程中，整形延迟不阻塞事件循环"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.client = KeyValueClient(backend)
+
+    async def get(self, key):
+        return await asyncio.to_thread(self.client.get, key)
+
+    async def mget(self, keys, *args):
+        return await asyncio.to_thread(self.client.mget, keys, *args)
+
+    async def setex(self, key, ttl, value):
+        return await asyncio.to_thread(self.client.setex, key, ttl, value)
+
+    async def delete(self, *keys):
+        return await asyncio.to_thread(self.client.delete, *keys)
+
+    async def exists(self, *keys):
+        return await asyncio.to_thread(self.client.exists, *keys)
+
+    def pipeline(self, transaction=True):
+        return _AsyncPipeline(self.backend)
+
+    async def aclose(self):
+        pass
+
+
+class ObjectStat:
+    """stat_object 结果"""
+
+    def __init__(self, bucket_name, object_name, size, metadata):
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.size = size
+        self.metadata = metadata
+
+
+class _ObjectResponse:
+    """get_object 响应外观 - read / readinto / headers"""
+
+    def __init__(self, data, metadata):
+        self.stream = io.BytesIO(data)
+        self.headers = metadata
+
+    def read(self, amt=None):
+        return self.stream.read(amt)
+
+    def readinto(self, buffer):
+        return self.stream.readinto(buffer)
+
+    def close(self):
+        self.stream.close()
+
+    def release_conn(self):
+        pass
+
+
+class ObjectStoreClient:
+    """MinIO客户端外观 - 对象键为 桶名/对象名"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(bucket_name, object_name):
+        return f"{bucket_name}/{object_name}"
+
+    def list_buckets(self):
+        return []
+
+    def bucket_exists(self, bucket_name):
+        return self.backend.exists(self._key(bucket_name, ''))
+
+    def make_bucket(self, bucket_name):
+        self.backend.put(self._key(bucket_name, ''), b'')
+
+    def stat_object(self, bucket_name, object_name):
+        result = self.backend.stat(self._key(bucket_name, object_name))
+        if result is None:
+            raise BackendKeyError(f"对象不存在: {bucket_name}/{object_name}")
+        return ObjectStat(bucket_name, object_name, *result)
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        key = self._key(bucket_name, object_name)
+        result = self.backend.stat(key)
+        data = self.backend.get_range(key, offset, length) if result is not None else None
+        if data is None:
+            raise BackendKeyError(f"对象不存在: {bucket_name}/{object_name}")
+        return _ObjectResponse(data, result[1])
+
+    def put_object(self, bucket_name, object_name, data, length, part_size=0, metadata=None, **kwargs):
+        """读取整个流后一次写入；length为-1时读到流结束"""
+        if length >= 0:
+            value = data.read(length)
+        else:
+            chunks = []
+            while True:
+                chunk = data.read(part_size or 1024 * 1024)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            value = b''.join(chunks)
+        self.backend.put(self._key(bucket_name, object_name), value, None, metadata)
+        return ObjectStat(bucket_name, object_name, len(value), metadata or {})
+
+    def remove_object(self, bucket_name, object_name):
+        self.backend.delete(self._key(bucket_name, object_name))
+
+    def list_objects(self, bucket_name, prefix=None, recursive=False):
+        """列出桶内对象（键本身是扁平的，recursive仅为与MinIO接口一致）"""
+        bucket_prefix = self._key(bucket_name, prefix or '')
+        for key in sorted(self.backend.keys()):
+            if not key.startswith(bucket_prefix) or key == self._key(bucket_name, ''):
+                continue
+            result = self.backend.stat(key)
+            if result is not None:
+                yield ObjectStat(bucket_name, key[len(bucket_name) + 1:], *result)
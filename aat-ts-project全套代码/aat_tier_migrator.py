@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# aat_tier_migrator.py
+"""
+AAT后台分层迁移
+周期性地为策略引擎已知的所有对象打分，在各层字节预算内规划放置，
+按限速把数据在 HOT / WARM / COLD 之间搬移，让放置提前跟上负载变化；
+热层预算与热层准入共用同一个（admission.capacity_bytes 与 Redis maxmemory 取小）
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from aat_strategy_engine import StorageTier
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-TierMigrator")
+
+
+class TokenBucket:
+    """字节令牌桶 - 允许透支，透支部分按速率睡眠偿还"""
+
+    def __init__(self, rate, stop_event=None):
+        self.rate = rate
+        self.capacity = rate  # 最多积累1秒的突发
+        self.tokens = rate
+        self.last_refill = time.time()
+        self.stop_event = stop_event or threading.Event()
+
+    def consume(self, amount):
+        """消耗令牌，返回因限速等待的秒数"""
+        now = time.time()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0
+
+        wait = -self.tokens / self.rate
+        self.stop_event.wait(wait)
+        return wait
+
+
+class TierMigrator:
+    """后台迁移器 - 评分、按预算规划放置、限速搬移"""
+
+    def __init__(self, storage_manager):
+        self.manager = storage_manager
+        self.engine = storage_manager.strategy_engine
+        self.config = self.engine.config['migration']
+
+        self.stop_event = threading.Event()
+        self.bucket = TokenBucket(self.config['bandwidth_bytes_per_sec'], self.stop_event)
+        self.thread = None
+
+        # 文件名 -> 上一轮的累计访问次数 / 访问速率EWMA / 对象大小
+        self.last_counts = {}
+        self.access_rates = {}
+        self.object_sizes = {}
+        self.last_cycle_time = time.time()
+
+        self.recent_moves = deque(maxlen=100)
+        self.stats = {
+            'cycles': 0,
+            'promotions': 0,
+            'demotions': 0,
+            'bytes_moved': 0,
+            'failed_moves': 0,
+            'throttled_seconds': 0.0,
+            'last_cycle_ms': 0.0
+        }
+
+    def start(self):
+        """启动后台迁移线程"""
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="aat-migrator", daemon=True)
+        self.thread.start()
+        logger.info(f"后台迁移已启动 - 周期: {self.config['interval']}s, "
+                    f"热层预算: {self.hot_budget() / 1024 / 1024:.0f}MB, "
+                    f"温层预算: {self.config['warm_capacity_bytes'] / 1024 / 1024:.0f}MB, "
+                    f"限速: {self.config['bandwidth_bytes_per_sec'] / 1024 / 1024:.0f}MB/s")
+
+    def stop(self):
+        """停止后台迁移线程"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.wait(self.config['interval']):
+            try:
+                self.run_cycle()
+            except Exception as e:
+                logger.error(f"迁移周期失败: {e}")
+
+    def run_cycle(self):
+        """执行一轮评分、规划与搬移，返回本轮的迁移列表"""
+        start = time.time()
+        plan = self.plan()
+        moves = self._diff(plan)[:self.config['max_moves_per_cycle']]
+
+        for filename, source, target in moves:
+            if self.stop_event.is_set():
+                break
+            self._move(filename, source, target)
+
+        self.stats['cycles'] += 1
+        self.stats['last_cycle_ms'] = (time.time() - start) * 1000
+        return moves
+
+    def _update_rates(self):
+        """由累计访问次数的增量计算访问速率，并做指数平滑"""
+        now = time.time()
+        elapsed = max(now - self.last_cycle_time, 1e-6)
+        self.last_cycle_time = now
+        decay = self.config['rate_decay']
+
+        for filename, info in list(self.engine.tensor_info.items()):
+            delta = info.access_frequency - self.last_counts.get(filename, 0)
+            self.last_counts[filename] = info.access_frequency
+            rate = delta / elapsed
+            self.access_rates[filename] = decay * rate + (1 - decay) * self.access_rates.get(filename, rate)
+
+    def _size_of(self, filename):
+        """对象大小（缓存）"""
+        size = self.object_sizes.get(filename)
+        if size is None:
+            size = self.manager.get_object_size(filename)
+            if size is not None:
+                self.object_sizes[filename] = size
+        return size
+
+    def hot_budget(self):
+        """热层字节预算：取准入控制的预算，规划的热集不会超过准入实际允许驻留的字节数"""
+        admission = self.manager.admission
+        if admission is not None:
+            return admission.budget()
+        return self.engine.config['admission']['capacity_bytes']
+
+    def plan(self):
+        """按评分从高到低依次填满热层、温层预算，其余放冷层
+
+        返回 {文件名: 目标层级}
+        """
+        self._update_rates()
+
+        candidates = []
+        for filename, info in list(self.engine.tensor_info.items()):
+            size = self._size_of(filename)
+            if size is None:
+                continue
+            candidates.append((filename, info, size, self.access_rates.get(filename, 0)))
+
+        max_rate = max((rate for *_, rate in candidates), default=0)
+        max_size = max((size for _, _, size, _ in candidates), default=0)
+
+        scored = sorted(
+            ((self.engine.compute_placement_score(info, rate / max_rate if max_rate > 0 else 0, size, max_size),
+              filename, size, rate)
+             for filename, info, size, rate in candidates),
+            reverse=True)
+
+        plan = {}
+        hot_left = self.hot_budget()
+        warm_left = self.config['warm_capacity_bytes']
+        for score, filename, size, rate in scored:
+            # 近期没有访问的对象不占用快层
+            if rate < self.config['min_access_rate']:
+                plan[filename] = StorageTier.COLD
+            elif size <= hot_left:
+                plan[filename] = StorageTier.HOT
+                hot_left -= size
+            elif size <= warm_left and self.manager.warm_cache is not None:
+                plan[filename] = StorageTier.WARM
+                warm_left -= size
+            else:
+                plan[filename] = StorageTier.COLD
+        return plan
+
+    def _current_tier(self, filename):
+        """对象当前所在的最快层级"""
+        if self.manager.hot_layer_contains(filename):
+            return StorageTier.HOT
+        warm_cache = self.manager.warm_cache
+        if warm_cache is not None and warm_cache.contains(filename):
+            return StorageTier.WARM
+        return StorageTier.COLD
+
+    def _diff(self, plan):
+        """规划与现状的差异：先降级腾出空间，再提升"""
+        order = {StorageTier.HOT: 0, StorageTier.WARM: 1, StorageTier.COLD: 2}
+        demotions, promotions = [], []
+        for filename, target in plan.items():
+            source = self._current_tier(filename)
+            if source == target:
+                continue
+            if order[target] > order[source]:
+                demotions.append((filename, source, target))
+            else:
+                promotions.append((filename, source, target))
+        return demotions + promotions
+
+    def _move(self, filename, source, target):
+        """搬移单个对象；移入热层/温层需要复制数据，计入限速"""
+        manager = self.manager
+        size = self.object_sizes.get(filename, 0)
+        promote = target == StorageTier.HOT or source == StorageTier.COLD
+        copies = target != StorageTier.COLD
+
+        if copies:
+            self.stats['throttled_seconds'] += self.bucket.consume(size)
+
+        try:
+            if target == StorageTier.HOT:
+                if source == StorageTier.WARM:
+                    manager.promote_to_hot_layer(filename)
+                else:
+                    manager.prefetch_to_hot_layer(filename)
+                # 准入未通过或Redis写入失败时数据照样读到了，以对象是否已在热层为准
+                moved = manager.hot_layer_contains(filename)
+            elif target == StorageTier.WARM:
+                if source == StorageTier.HOT:
+                    moved = manager.demote_to_warm_layer(filename)
+                else:
+                    moved = manager.load_to_warm_layer(filename)
+            else:
+                manager.evict_from_hot_layer(filename)
+                if manager.warm_cache is not None:
+                    manager.warm_cache.delete(filename)
+                moved = True
+        except Exception as e:
+            logger.error(f"迁移失败 {filename} {source.value} -> {target.value}: {e}")
+            moved = False
+
+        if not moved:
+            self.stats['failed_moves'] += 1
+            return False
+
+        self.stats['promotions' if promote else 'demotions'] += 1
+        if copies:
+            self.stats['bytes_moved'] += size
+        self.recent_moves.append({
+            'filename': filename,
+            'from': source.value,
+            'to': target.value,
+            'size': size,
+            'time': time.time()
+        })
+        logger.info(f"⇅ 迁移: {filename} {source.value} -> {target.value} ({size / 1024 / 1024:.2f}MB, "
+                    f"访问速率: {self.access_rates.get(filename, 0):.2f}/s)")
+        return True
+
+    def get_stats(self):
+        """获取迁移统计"""
+        return {
+            **self.stats,
+            'running': self.thread is not None,
+            'tracked_objects': len(self.access_rates),
+            'recent_moves': list(self.recent_moves)[-10:]
+        }
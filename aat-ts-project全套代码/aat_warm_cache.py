@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# aat_warm_cache.py
+"""
+AAT温层缓存 - 本地SSD目录缓存
+位于Redis热层与MinIO冷层之间，按字节预算做LRU淘汰，读取通过mmap切片完成
+"""
+
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("AAT-WarmCache")
+
+
+class WarmTierCache:
+    """温层缓存 - 本地目录 + 字节预算 + LRU淘汰"""
+
+    def __init__(self, cache_dir="./warm_cache", capacity_bytes=2 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.capacity_bytes = capacity_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # 文件名 -> 字节数，按最近访问排序（末尾为最新）
+        self.index = OrderedDict()
+        self.used_bytes = 0
+        self._mmaps = {}
+        self.lock = threading.RLock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0,
+            'evicted_bytes': 0
+        }
+
+        self._load_index()
+        logger.info(f"温层缓存初始化完成: {cache_dir}, 预算: {capacity_bytes / 1024 / 1024:.0f}MB, "
+                    f"已有 {len(self.index)} 个文件 ({self.used_bytes / 1024 / 1024:.2f}MB)")
+
+    def _path(self, filename):
+        """缓存文件路径"""
+        return os.path.join(self.cache_dir, quote(filename, safe=''))
+
+    def _load_index(self):
+        """重启后从目录重建索引，按修改时间恢复LRU顺序"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+                continue
+            if os.path.isfile(path):
+                entries.append((os.path.getmtime(path), unquote(name), os.path.getsize(path)))
+
+        for _, filename, size in sorted(entries):
+            self.index[filename] = size
+            self.used_bytes += size
+
+        while self.used_bytes > self.capacity_bytes and self.index:
+            self._evict_one()
+
+    def put(self, filename, data):
+        """写入文件，超出预算时淘汰最久未访问的文件"""
+        size = len(data)
+        if size > self.capacity_bytes:
+            logger.debug(f"文件超过温层预算，跳过: {filename} ({size} bytes)")
+            return False
+
+        with self.lock:
+            if filename in self.index:
+                self._remove(filename)
+
+            while self.used_bytes + size > self.capacity_bytes and self.index:
+                self._evict_one()
+
+            path = self._path(filename)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            self.index[filename] = size
+            self.used_bytes += size
+            self.stats['writes'] += 1
+
+        logger.debug(f"写入温层: {filename} ({size} bytes)")
+        return True
+
+    def get_range(self, filename, size, offset):
+        """按范围读取（mmap切片），未命中返回None"""
+        with self.lock:
+            if filename not in self.index:
+                self.stats['misses'] += 1
+                return None
+
+            self.index.move_to_end(filename)
+            self.stats['hits'] += 1
+
+            if size <= 0 or offset >= self.index[filename]:
+                return b''
+            return self._mmap(filename)[offset:offset + size]
+
+    def get(self, filename):
+        """读取整个文件，未命中返回None"""
+        with self.lock:
+            if filename not in self.index:
+                self.stats['misses'] += 1
+                return None
+
+            self.index.move_to_end(filename)
+            self.stats['hits'] += 1
+
+            if self.index[filename] == 0:
+                return b''
+            return self._mmap(filename)[:]
+
+    def contains(self, filename):
+        """文件是否在温层"""
+        return filename in self.index
+
+    def size_of(self, filename):
+        """温层中文件的大小，不在温层返回None"""
+        return self.index.get(filename)
+
+    def delete(self, filename):
+        """删除文件"""
+        with self.lock:
+            if filename not in self.index:
+                return False
+            self._remove(filename)
+            return True
+
+    def _mmap(self, filename):
+        """获取（必要时打开）文件的只读映射"""
+        mapped = self._mmaps.get(filename)
+        if mapped is None:
+            with open(self._path(filename), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmaps[filename] = mapped
+        return mapped
+
+    def _remove(self, filename):
+        """移除索引、映射和磁盘文件"""
+        size = self.index.pop(filename)
+        self.used_bytes -= size
+
+        mapped = self._mmaps.pop(filename, None)
+        if mapped is not None:
+            mapped.close()
+
+        try:
+            os.remove(self._path(filename))
+        except FileNotFoundError:
+            pass
+        return size
+
+    def _evict_one(self):
+        """淘汰最久未访问的文件"""
+        filename = next(iter(self.index))
+        size = self._remove(filename)
+        self.stats['evictions'] += 1
+        self.stats['evicted_bytes'] += size
+        logger.debug(f"温层淘汰: {filename} ({size} bytes)")
+
+    def get_stats(self):
+        """获取温层统计"""
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / total if total > 0 else 0,
+            'files': len(self.index),
+            'used_bytes': self.used_bytes,
+            'capacity_bytes': self.capacity_bytes,
+            'usage_ratio': self.used_bytes / self.capacity_bytes if self.capacity_bytes > 0 else 0
+        }
+
+    def close(self):
+        """关闭所有映射"""
+        with self.lock:
+            for mapped in self._mmaps.values():
+                mapped.close()
+            self._mmaps.clear()
@@ -65,6 +65,9 @@ check_and_install_pip "minio" "minio"
 check_and_install_pip "redis" "redis"
 check_and_install_pip "sklearn" "scikit-learn"  # pip包名是scikit-learn，但import是sklearn
 check_and_install_pip "fuse" "fuse-python"  # pip包名是fuse-python，但import是fuse
+# 可选：zstd/lz4压缩编码，未安装时编码选择自动跳过
+check_and_install_pip "zstandard" "zstandard"
+check_and_install_pip "lz4" "lz4"
 
 # 安装numpy，因为torch需要它
 check_and_install_pip "numpy" "numpy"
@@ -0,0 +1,26 @@
+"""测试公共设置：被测模块位于上一级目录"""
+
+import io
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_bin(tensors):
+    """按 .bin 张量格式序列化：名称长度(I) | 名称 | 维数(I) | 各维(I...) | float32数据"""
+    buf = io.BytesIO()
+    for name, array in tensors.items():
+        encoded = name.encode('utf-8')
+        buf.write(struct.pack('I', len(encoded)) + encoded)
+        buf.write(struct.pack('I', array.ndim) + struct.pack(f'{array.ndim}I', *array.shape))
+        buf.write(np.ascontiguousarray(array, dtype=np.float32).tobytes())
+    return buf.getvalue()
+
+
+def random_tensors(count=4, shape=(128, 512), seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"w{i}": rng.normal(0, 0.02, shape).astype(np.float32) for i in range(count)}
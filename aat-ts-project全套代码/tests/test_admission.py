@@ -0,0 +1,150 @@
+"""热层准入：频率草图比较、过大对象、受害者挑选、命名空间配额与公平份额、按已跟踪字节核算"""
+
+from aat_admission import CountMinSketch, HotTierAdmission
+
+MB = 1024 * 1024
+
+
+def insert(admission, filename, size, accesses=1):
+    for _ in range(accesses):
+        admission.record_access(filename)
+    admitted, victims = admission.admit(filename, size)
+    assert admitted
+    for victim in victims:
+        admission.on_evict(victim)
+    admission.on_insert(filename, size)
+    return victims
+
+
+def test_sketch_counts_are_upper_bounds():
+    sketch = CountMinSketch(1024, 4)
+    for i in range(200):
+        for _ in range(i % 5):
+            sketch.increment(f"k{i}")
+    assert all(sketch.estimate(f"k{i}") >= i % 5 for i in range(200))
+
+
+def test_sketch_ages_after_sample_window():
+    sketch = CountMinSketch(width=8, depth=2)
+    for _ in range(sketch.sample_size - 1):
+        sketch.increment('hot')
+    assert sketch.estimate('hot') == sketch.sample_size - 1
+    sketch.increment('hot')
+    assert sketch.estimate('hot') == sketch.sample_size // 2
+
+
+def test_admit_within_capacity():
+    admission = HotTierAdmission(10 * MB, ttl=60)
+    assert insert(admission, 'a.bin', 2 * MB) == []
+    assert admission.resident_bytes == 2 * MB
+
+
+def test_reject_too_large():
+    admission = HotTierAdmission(10 * MB, ttl=60, max_object_fraction=0.25)
+    assert admission.admit('big.bin', 3 * MB) == (False, [])
+    assert admission.get_stats()['rejected_too_large'] == 1
+
+
+def test_hotter_candidate_evicts_colder_victim():
+    admission = HotTierAdmission(4 * MB, ttl=60, max_object_fraction=1.0)
+    insert(admission, 'cold.bin', 3 * MB)
+    assert insert(admission, 'hot.bin', 2 * MB, accesses=5) == ['cold.bin']
+    assert list(admission.resident) == ['hot.bin']
+    assert admission.get_stats()['victims'] == 1
+
+
+
+def test_pinned_write_evicts_victim_regardless_of_frequency():
+    admission = HotTierAdmission(4 * MB, ttl=60, max_object_fraction=1.0)
+    insert(admission, 'hot.bin', 3 * MB, accesses=5)
+    assert admission.admit('latest.ckpt', 2 * MB) == (False, [])
+    assert admission.admit('latest.ckpt', 2 * MB, pinned=True) == (True, ['hot.bin'])
+
+
+def test_growing_resident_object_counts_one_admission():
+    admission = HotTierAdmission(10 * MB, ttl=60)
+    for size in (MB // 2, MB, 2 * MB):
+        assert admission.admit('latest.ckpt', size, pinned=True) == (True, [])
+        admission.on_insert('latest.ckpt', size)
+    assert admission.get_stats()['admitted'] == 1
+    assert admission.resident_bytes == 2 * MB
+
+def test_colder_candidate_rejected():
+    admission = HotTierAdmission(4 * MB, ttl=60, max_object_fraction=1.0)
+    insert(admission, 'hot.bin', 3 * MB, accesses=5)
+    admission.record_access('cold.bin')
+    assert admission.admit('cold.bin', 2 * MB) == (False, [])
+    assert list(admission.resident) == ['hot.bin']
+
+
+def test_rewrite_of_resident_object_not_double_counted():
+    admission = HotTierAdmission(4 * MB, ttl=60, max_object_fraction=1.0)
+    insert(admission, 'a.bin', 3 * MB)
+    assert admission.admit('a.bin', 3 * MB) == (True, [])
+    admission.on_insert('a.bin', 3 * MB)
+    assert admission.resident_bytes == 3 * MB
+
+
+def test_ttl_expiry_frees_tracked_bytes():
+    admission = HotTierAdmission(4 * MB, ttl=0, max_object_fraction=1.0)
+    insert(admission, 'a.bin', 3 * MB, accesses=5)
+    assert admission.admit('b.bin', 3 * MB) == (True, [])
+    assert admission.resident_bytes == 0
+
+
+def test_maxmemory_caps_capacity():
+    info = {'used_memory': 0, 'maxmemory': 2 * MB}
+    admission = HotTierAdmission(8 * MB, ttl=60, memory_info=lambda: info, info_refresh_interval=0)
+    assert admission.admit('a.bin', 1 * MB) == (False, [])
+    assert admission.capacity() == 2 * MB
+
+
+def test_quota_evicts_only_within_namespace():
+    admission = HotTierAdmission(100 * MB, ttl=60, max_object_fraction=1.0, quotas={'m/v1': 3 * MB})
+    insert(admission, 'other.bin', 1 * MB)
+    insert(admission, 'm/v1/a.bin', 2 * MB)
+    assert insert(admission, 'm/v1/b.bin', 2 * MB, accesses=5) == ['m/v1/a.bin']
+    assert admission.namespace_bytes == {'': 1 * MB, 'm/v1': 2 * MB}
+
+
+def test_object_larger_than_quota_rejected():
+    admission = HotTierAdmission(100 * MB, ttl=60, max_object_fraction=1.0, quotas={'m/v1': 3 * MB})
+    assert admission.admit('m/v1/huge.bin', 4 * MB) == (False, [])
+    assert admission.get_stats()['rejected_quota'] == 1
+
+
+def test_namespace_over_fair_share_evicted_first():
+    admission = HotTierAdmission(4 * MB, ttl=60, max_object_fraction=1.0)
+    insert(admission, 'd.bin', 1 * MB)
+    insert(admission, 'a/1/x.bin', 3 * MB)
+    assert insert(admission, 'b/1/y.bin', 1 * MB, accesses=5) == ['a/1/x.bin']
+
+
+def test_namespace_over_fair_share_evicts_only_itself():
+    admission = HotTierAdmission(4 * MB, ttl=60, max_object_fraction=1.0)
+    insert(admission, 'd.bin', 2 * MB)
+    insert(admission, 'a/1/x.bin', 2 * MB)
+    assert insert(admission, 'a/1/y.bin', 2 * MB, accesses=5) == ['a/1/x.bin']
+    assert admission.get_namespace_stats() == {
+        'a/1': {'resident_bytes': 2 * MB, 'quota_bytes': 0},
+        'default': {'resident_bytes': 2 * MB, 'quota_bytes': 0}
+    }
+
+
+def test_untracked_memory_without_maxmemory_does_not_block():
+    """没有maxmemory时，Redis中的其他数据只由Redis自己淘汰，不计入热层预算"""
+    info = {'used_memory': 50 * MB, 'maxmemory': 0}
+    admission = HotTierAdmission(4 * MB, ttl=60, memory_info=lambda: info, info_refresh_interval=0)
+    assert insert(admission, 'a.bin', 1 * MB) == []
+    assert admission.capacity() == 4 * MB
+
+
+def test_untracked_memory_lowers_capacity_but_admits_without_victims():
+    """重启后残留的数据压低有效容量；没有已跟踪的受害者时照常准入，交给maxmemory淘汰"""
+    info = {'used_memory': 7 * MB, 'maxmemory': 8 * MB}
+    admission = HotTierAdmission(8 * MB, ttl=60, memory_info=lambda: info, info_refresh_interval=0)
+    admission.record_access('a.bin')
+    assert admission.admit('a.bin', 2 * MB) == (True, [])
+    assert admission.capacity() == 1 * MB
+    assert admission.budget() == 8 * MB
+    assert admission.get_stats()['untracked_bytes'] == 7 * MB
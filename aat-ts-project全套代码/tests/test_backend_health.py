@@ -0,0 +1,49 @@
+"""熔断器状态转换"""
+
+import time
+
+from aat_backend_health import CircuitBreaker
+
+
+def test_trips_after_threshold():
+    breaker = CircuitBreaker('redis', failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure(IOError('refused'))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    state = breaker.get_state()
+    assert state['trips'] == 1 and state['rejected'] == 1 and state['last_error'] == 'refused'
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker('redis', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe():
+    breaker = CircuitBreaker('minio', failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # 探测失败立即重新熔断
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_reset():
+    breaker = CircuitBreaker('redis', failure_threshold=1)
+    breaker.record_failure()
+    breaker.reset()
+    assert breaker.allow() and breaker.get_state()['opened_at'] is None
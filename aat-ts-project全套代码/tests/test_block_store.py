@@ -0,0 +1,227 @@
+"""热层分块存储：定长块 + 清单；去重模式按内容摘要寻址"""
+
+import os
+import threading
+
+import pytest
+
+from aat_block_store import BLOCK_HEADER, BLOCK_MAGIC, BLOCK_VERSION, CODEC_IDS, HotBlockStore
+from aat_compression import CodecChoice, CompressionAlgorithm, CompressionManager
+
+BLOCK = 4096
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip('fakeredis')
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def store(redis_client):
+    return HotBlockStore(redis_client, CompressionManager(CompressionAlgorithm.ZLIB), block_size=BLOCK)
+
+
+@pytest.fixture
+def dedup_store(redis_client):
+    return HotBlockStore(redis_client, CompressionManager(CompressionAlgorithm.ZLIB), block_size=BLOCK, dedup=True)
+
+
+def stored_chunks(store, redis_client):
+    """Redis中的内容寻址块键（不含引用计数键）"""
+    return {key for key in redis_client.scan_iter(store.chunk_key('*')) if not key.endswith(b':refs')}
+
+
+def test_put_writes_blocks_and_manifest(store, redis_client):
+    data = os.urandom(2 * BLOCK + 100)
+    store.put('model.bin', data, ttl=60)
+    assert redis_client.exists(store.manifest_key('model.bin'))
+    assert [redis_client.exists(store.block_key('model.bin', i)) for i in range(4)] == [1, 1, 1, 0]
+    assert 0 < redis_client.ttl(store.block_key('model.bin', 0)) <= 60
+
+
+def test_get_whole_file(store):
+    data = b'weights' * 3000
+    store.put('model.bin', data, ttl=60)
+    assert bytes(store.get('model.bin')) == data
+
+
+@pytest.mark.parametrize('size, offset', [(10, 0), (BLOCK, BLOCK), (3000, BLOCK - 1000), (5000, 2 * BLOCK + 50)])
+def test_get_range_touches_only_covering_blocks(store, size, offset):
+    data = os.urandom(3 * BLOCK)
+    store.put('model.bin', data, ttl=60)
+    assert bytes(store.get_range('model.bin', size, offset)) == data[offset:offset + size]
+
+
+def test_missing_block_is_miss(store, redis_client):
+    store.put('model.bin', os.urandom(3 * BLOCK), ttl=60)
+    redis_client.delete(store.block_key('model.bin', 1))
+    assert store.get('model.bin') is None
+    assert store.get_range('model.bin', 100, BLOCK) is None
+
+
+def test_empty_file(store):
+    store.put('empty.bin', b'', ttl=60)
+    assert store.exists('empty.bin')
+    assert bytes(store.get('empty.bin')) == b''
+
+
+def test_delete_removes_blocks(store, redis_client):
+    store.put('model.bin', os.urandom(2 * BLOCK), ttl=60)
+    assert store.delete('model.bin')
+    assert not store.exists('model.bin')
+    assert not redis_client.exists(store.block_key('model.bin', 0))
+    assert store.get('model.bin') is None
+
+
+@pytest.mark.parametrize('chunk', [b'a' * 5000, os.urandom(3000), b''], ids=['compressible', 'random', 'empty'])
+def test_block_envelope_itrip(store, chunk):
+    block = store.encode_block(chunk)
+    assert isinstance(block, memoryview)
+    magic, version, _, length, _ = BLOCK_HEADER.unpack_from(bytes(block))
+    assert (magic, version, length) == (BLOCK_MAGIC, BLOCK_VERSION, len(chunk))
+    assert bytes(store.decode_block(bytes(block))) == chunk
+
+
+def test_incompressible_block_stored_raw_and_decoded_without_copy(store):
+    chunk = os.urandom(BLOCK)
+    block = bytes(store.encode_block(chunk))
+    assert len(block) == BLOCK_HEADER.size + len(chunk)
+    decoded = store.decode_block(block)
+    assert isinstance(decoded, memoryview) and decoded.obj is block
+
+
+@pytest.mark.parametrize('algorithm', [algorithm for algorithm in CompressionAlgorithm
+                                       if algorithm != CompressionAlgorithm.NONE
+                                       and CompressionManager.is_available(algorithm)],
+                         ids=lambda algorithm: algorithm.value)
+def test_block_codec_recorded_in_header(store, algorithm):
+    chunk = b'weights' * 1000
+    block = bytes(store.encode_block(chunk, codec=CodecChoice(algorithm)))
+    assert BLOCK_HEADER.unpack_from(block)[2] == CODEC_IDS[algorithm]
+    assert bytes(store.decode_block(block)) == chunk
+
+
+def test_compressed_block_smaller_than_raw(store):
+    assert len(store.encode_block(b'\x00' * BLOCK)) < BLOCK // 10
+
+
+def test_corrupt_block_is_miss(store, redis_client):
+    store.put('model.bin', b'x' * 3 * BLOCK, ttl=60)
+    key = store.block_key('model.bin', 1)
+    block = bytearray(redis_client.get(key))
+    block[-1] ^= 0xFF
+    redis_client.set(key, bytes(block))
+    assert store.decode_block(bytes(block)) is None
+    assert store.get('model.bin') is None
+
+
+def test_non_block_value_is_miss(store, redis_client):
+    store.put('model.bin', b'x' * 2 * BLOCK, ttl=60)
+    redis_client.set(store.block_key('model.bin', 0), b'\x80\x04not a block at all')
+    assert store.decode_block(b'\x80\x04not a block at all') is None
+    assert store.get('model.bin') is None
+
+
+def test_dedup_stores_shared_blocks_once(dedup_store, redis_client):
+    shared = os.urandom(2 * BLOCK)
+    a, b = shared + os.urandom(BLOCK), shared + os.urandom(100)
+    dedup_store.put('a.bin', a, ttl=60)
+    dedup_store.put('b.bin', b, ttl=60)
+    assert dedup_store.stats['blocks_deduplicated'] == 2
+    assert len(stored_chunks(dedup_store, redis_client)) == 4
+    assert bytes(dedup_store.get('a.bin')) == a
+    assert bytes(dedup_store.get_range('b.bin', BLOCK, BLOCK + 50)) == b[BLOCK + 50:2 * BLOCK + 50]
+
+
+def test_dedup_streamed_blocks_visible_after_manifest(dedup_store):
+    data = os.urandom(3 * BLOCK)
+    view = memoryview(data)
+    digests = dedup_store.put_blocks('c.bin', 0, [view[:BLOCK], view[BLOCK:2 * BLOCK]], 60)
+    digests += dedup_store.put_blocks('c.bin', 2, [view[2 * BLOCK:]], 60)
+    assert dedup_store.get('c.bin') is None
+    dedup_store.put_manifest('c.bin', len(data), 60, digests)
+    assert bytes(dedup_store.get('c.bin')) == data
+
+
+def test_dedup_cached_manifest_follows_rewrite(dedup_store, redis_client):
+    old, new = os.urandom(2 * BLOCK), os.urandom(2 * BLOCK)
+    dedup_store.put('a.bin', old, ttl=60)
+    assert bytes(dedup_store.get_range('a.bin', 100, 0)) == old[:100]
+    assert 'a.bin' in dedup_store.manifests
+
+    # 另一个进程重写了文件，本地缓存的清单已过时
+    other = HotBlockStore(redis_client, CompressionManager(CompressionAlgorithm.ZLIB), block_size=BLOCK, dedup=True)
+    other.put('a.bin', new, ttl=60)
+    assert bytes(dedup_store.get_range('a.bin', 100, 0)) == new[:100]
+
+
+def test_dedup_delete_keeps_blocks_shared_with_other_files(dedup_store):
+    shared = os.urandom(2 * BLOCK)
+    dedup_store.put('a.bin', shared, ttl=60)
+    dedup_store.put('b.bin', shared, ttl=60)
+    assert dedup_store.delete('a.bin')
+    assert dedup_store.get('a.bin') is None
+    assert bytes(dedup_store.get('b.bin')) == shared
+
+
+def test_dedup_delete_frees_blocks_no_manifest_references(dedup_store, redis_client):
+    shared = os.urandom(BLOCK)
+    dedup_store.put('a.bin', shared + os.urandom(BLOCK), ttl=60)
+    dedup_store.put('b.bin', shared * 2 + os.urandom(BLOCK), ttl=60)
+    assert len(stored_chunks(dedup_store, redis_client)) == 3
+
+    assert dedup_store.delete('a.bin')
+    assert len(stored_chunks(dedup_store, redis_client)) == 2
+    assert not dedup_store.delete('a.bin')
+    assert len(stored_chunks(dedup_store, redis_client)) == 2
+
+    assert dedup_store.delete('b.bin')
+    assert list(redis_client.scan_iter(dedup_store.chunk_key('*'))) == []
+    assert dedup_store.stats['blocks_freed'] == 3
+
+
+def test_dedup_overwrite_frees_blocks_of_the_old_version(dedup_store, redis_client):
+    kept = os.urandom(BLOCK)
+    dedup_store.put('a.bin', kept + os.urandom(BLOCK), ttl=60)
+    new = kept + os.urandom(BLOCK)
+    dedup_store.put('a.bin', new, ttl=60)
+    assert len(stored_chunks(dedup_store, redis_client)) == 2
+    assert bytes(dedup_store.get('a.bin')) == new
+
+
+def test_dedup_discard_releases_streamed_blocks(dedup_store, redis_client):
+    shared = os.urandom(BLOCK)
+    dedup_store.put('a.bin', shared, ttl=60)
+    digests = dedup_store.put_blocks('c.bin', 0, [shared, os.urandom(BLOCK)], 60)
+    assert dedup_store.discard_blocks('c.bin', 2, digests) == 1
+    assert stored_chunks(dedup_store, redis_client) == {dedup_store.chunk_key(digests[0]).encode()}
+    assert bytes(dedup_store.get('a.bin')) == shared
+
+
+def test_dedup_concurrent_readers_and_writers_keep_cache_and_stats_consistent(dedup_store):
+    dedup_store.max_cached_manifests = 2
+    shared = os.urandom(BLOCK)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                name = f"{n}_{i % 3}.bin"
+                data = shared + bytes([n, i]) * (BLOCK // 2)
+                dedup_store.put(name, data, ttl=60)
+                assert bytes(dedup_store.get_range(name, BLOCK, BLOCK)) == data[BLOCK:]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(dedup_store.manifests) <= 2
+    stats = dedup_store.get_stats()
+    # 每个块要么新写入，要么计为去重，并发累加不丢计数
+    assert stats['blocks_written'] + stats['blocks_deduplicated'] == 8 * 20 * 2
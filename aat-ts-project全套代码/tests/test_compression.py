@@ -0,0 +1,102 @@
+"""压缩编码、张量过滤与编码选择"""
+
+import numpy as np
+import pytest
+
+from aat_compression import (CodecChoice, CodecSelector, CompressionAlgorithm, CompressionManager, TensorFilter,
+                             clip_regions, parse_codec)
+from aat_real_model_loader import TensorLayoutScanner, parse_tensor_index
+from conftest import random_tensors, write_bin
+
+AVAILABLE = [algorithm for algorithm in CompressionAlgorithm if CompressionManager.is_available(algorithm)]
+
+
+@pytest.fixture
+def data():
+    return write_bin(random_tensors(count=3, shape=(64, 256)))
+
+
+@pytest.mark.parametrize('algorithm', AVAILABLE, ids=lambda algorithm: algorithm.value)
+def test_codec_round_trip(data, algorithm):
+    manager = CompressionManager()
+    compressed, used = manager.compress(data, algorithm)
+    assert used == algorithm
+    assert bytes(manager.decompress(compressed, used)) == data
+
+
+@pytest.mark.parametrize('algorithm', [a for a in AVAILABLE if a != CompressionAlgorithm.NONE],
+                         ids=lambda algorithm: algorithm.value)
+def test_streaming_compressor_round_trip(data, algorithm):
+    manager = CompressionManager()
+    stream = manager.compressobj(algorithm)
+    compressed = b''.join(stream.compress(data[i:i + 1000]) for i in range(0, len(data), 1000)) + stream.flush()
+    assert bytes(manager.decompress(compressed, algorithm)) == data
+
+
+def test_parse_codec():
+    assert parse_codec('zstd:3') == CodecChoice(CompressionAlgorithm.ZSTD, 3)
+    assert parse_codec('lz4') == CodecChoice(CompressionAlgorithm.LZ4)
+    assert parse_codec('zlib:1').name == 'zlib:1'
+
+
+def test_clip_regions():
+    regions = [(0, 100, 4), (100, 100, 4), (300, 40, 4)]
+    assert clip_regions(regions, 150) == [(0, 100, 4), (100, 48, 4)]
+    assert clip_regions(regions, 0) == []
+
+
+@pytest.mark.parametrize('mode', [TensorFilter.BYTE_SHUFFLE, TensorFilter.BIT_SHUFFLE], ids=lambda mode: mode.value)
+def test_filter_round_trip(data, mode):
+    index = parse_tensor_index(lambda offset, length: data[offset:offset + length], len(data))
+    regions = [(info['offset'], info['nbytes'], 4) for info in index.values()]
+    filtered = CompressionManager.filter(data, regions, mode)
+    assert bytes(CompressionManager.unfilter(filtered)) == data
+
+
+def test_byte_shuffle_helps_float_weights(data):
+    manager = CompressionManager(CompressionAlgorithm.ZLIB)
+    index = parse_tensor_index(lambda offset, length: data[offset:offset + length], len(data))
+    regions = [(info['offset'], info['nbytes'], 4) for info in index.values()]
+    plain, _ = manager.compress(data)
+    shuffled, _ = manager.compress(CompressionManager.filter(data, regions, TensorFilter.BYTE_SHUFFLE))
+    assert len(shuffled) < len(plain)
+
+
+def test_scanner_matches_index_across_split_feeds(data):
+    index = parse_tensor_index(lambda offset, length: data[offset:offset + length], len(data))
+    expected = [(info['offset'], info['nbytes'], 4) for info in index.values()]
+    for step in (3, 1000, len(data)):
+        scanner = TensorLayoutScanner()
+        for i in range(0, len(data), step):
+            scanner.feed(data[i:i + step])
+        assert scanner.valid and scanner.regions == expected
+
+
+def test_scanner_rejects_non_tensor_data():
+    scanner = TensorLayoutScanner()
+    scanner.feed(b'{"not": "tensors"}' * 100)
+    assert not scanner.valid and scanner.regions == []
+
+
+def test_selector_prefers_raw_for_random_data_and_caches():
+    manager = CompressionManager(CompressionAlgorithm.ZLIB)
+    selector = CodecSelector(manager, {'hot': ['zlib:1']}, {'hot': 1e9})
+    random_bytes = np.random.default_rng(0).bytes(8192)
+    assert selector.select('a.bin', random_bytes, 'hot').algorithm == CompressionAlgorithm.NONE
+    assert selector.cached('a.bin', 'hot') is not None
+    selector.select('a.bin', random_bytes, 'hot')
+    assert selector.get_stats()['probes'] == 1 and selector.get_stats()['cached'] == 1
+    selector.forget('a.bin')
+    assert selector.cached('a.bin', 'hot') is None
+
+
+def test_selector_compresses_on_slow_tier():
+    manager = CompressionManager(CompressionAlgorithm.ZLIB)
+    selector = CodecSelector(manager, {'cold': ['zlib:6']}, {'cold': 1e6})
+    assert selector.select('a.txt', b'abcd' * 4096, 'cold') == CodecChoice(CompressionAlgorithm.ZLIB, 6)
+
+
+def test_selector_fixed_when_disabled():
+    manager = CompressionManager(CompressionAlgorithm.ZLIB)
+    selector = CodecSelector(manager, {'cold': ['zlib:6']}, {'cold': 1e6}, auto_select=False)
+    assert selector.select('a.txt', b'abcd' * 4096, 'cold') == CodecChoice(CompressionAlgorithm.ZLIB)
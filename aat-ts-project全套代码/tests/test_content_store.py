@@ -0,0 +1,234 @@
+"""冷层内容寻址分片：去重写入、清单、按范围读取、差分版本与重定基、张量过滤"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from aat_checkpoint_writer import CODEC_METADATA_KEY
+from aat_compression import CompressionAlgorithm, CompressionManager, TensorFilter
+from aat_content_store import FILTER_METADATA_KEY, ColdChunkStore, chunk_digest, entry_id
+from aat_tier_backends import BackendKeyError, InMemoryBackend, ObjectStoreClient
+
+CHUNK = 64 * 1024
+
+
+class ColdTier:
+    """只提供分片存储用到的冷层接口的存储管理器"""
+
+    bucket_name = 'models'
+    minio_breaker = None
+    answered_errors = (BackendKeyError,)
+
+    def __init__(self):
+        self.backend = InMemoryBackend()
+        self.minio_client = ObjectStoreClient(self.backend)
+        self.compression_manager = CompressionManager()
+        self.cold_fetch_executor = ThreadPoolExecutor(max_workers=4)
+
+    @staticmethod
+    def _guarded_call(breaker, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    def _decode_cold_object(self, data, codec):
+        if codec is None or codec == CompressionAlgorithm.NONE.value:
+            return data
+        return self.compression_manager.decompress(data, CompressionAlgorithm(codec))
+
+
+@pytest.fixture
+def cold():
+    tier = ColdTier()
+    yield tier
+    tier.cold_fetch_executor.shutdown()
+
+
+@pytest.fixture
+def store(cold):
+    return ColdChunkStore(cold, chunk_size=CHUNK, cache_bytes=16 * CHUNK)
+
+
+def put_file(store, filename, data, algorithm=CompressionAlgorithm.ZLIB):
+    view = memoryview(data)
+    digests = [store.put_chunk(view[i:i + CHUNK], algorithm)[0] for i in range(0, len(data), CHUNK)]
+    store.put_manifest(filename, len(data), digests)
+    return digests
+
+
+def weights(seed=0):
+    return np.random.default_rng(seed).normal(0, 0.02, CHUNK // 4).astype(np.float32)
+
+
+def fine_tune(array, fraction=0.01, seed=1):
+    """只改动少量元素，模拟微调后的新版本"""
+    array = array.copy()
+    array[np.random.default_rng(seed).random(array.shape) < fraction] += 0.001
+    return array
+
+
+def forget_decoded(store):
+    """丢掉已解码分片缓存，使读取按差分链从冷层解码"""
+    store.decoded.clear()
+    store.decoded_bytes = 0
+
+
+def test_identical_chunk_is_uploaded_once(store):
+    data = os.urandom(CHUNK)
+    digest, uploaded = store.put_chunk(data)
+    assert digest == chunk_digest(data) and uploaded == CHUNK
+    assert store.put_chunk(data) == (digest, 0)
+
+    # 新进程不认识该分片，经stat确认已存在
+    store.known_chunks.clear()
+    assert store.put_chunk(data) == (digest, 0)
+    stats = store.get_stats()
+    assert stats['chunks_written'] == 1 and stats['bytes_deduplicated'] == 2 * CHUNK
+
+
+def test_chunk_compressed_only_when_smaller(store, cold):
+    compressible, random_bytes = b'\x00' * CHUNK, os.urandom(CHUNK)
+    assert store.put_chunk(compressible, CompressionAlgorithm.ZLIB)[1] < CHUNK // 10
+    assert store.put_chunk(random_bytes, CompressionAlgorithm.ZLIB)[1] == CHUNK
+    metadata = cold.minio_client.stat_object('models', store.chunk_name(chunk_digest(random_bytes))).metadata
+    assert metadata[CODEC_METADATA_KEY] == CompressionAlgorithm.NONE.value
+
+
+def test_files_share_chunks(store):
+    shared = os.urandom(2 * CHUNK)
+    put_file(store, 'a.ckpt', shared + os.urandom(CHUNK))
+    written = store.get_stats()['bytes_written']
+    put_file(store, 'b.ckpt', shared + os.urandom(100))
+    assert store.get_stats()['bytes_written'] == written + 100
+    assert bytes(store.read('b.ckpt')) == shared + bytes(store.read('b.ckpt', 100, 2 * CHUNK))
+
+
+@pytest.mark.parametrize('size, offset', [(100, 0), (1000, CHUNK - 500), (3 * CHUNK, 10), (None, CHUNK + 1)])
+def test_range_reads_follow_manifest(store, size, offset):
+    data = os.urandom(3 * CHUNK + 123)
+    put_file(store, 'a.ckpt', data)
+    end = len(data) if size is None else offset + size
+    assert bytes(store.read('a.ckpt', size, offset)) == data[offset:end]
+    assert bytes(store.read('a.ckpt', 10, len(data))) == b''
+
+
+def test_delta_chunk_round_trip(store):
+    base = weights().tobytes()
+    tuned = fine_tune(weights()).tobytes()
+    base_entry, _ = store.put_chunk(base)
+    entry, uploaded = store.put_delta_chunk(tuned, base_entry)
+    assert entry['base'] == base_entry and entry['depth'] == 1
+    assert entry_id(entry) == chunk_digest(tuned)
+    assert 0 < uploaded < CHUNK // 2
+    forget_decoded(store)
+    assert bytes(store.read_entry(entry)) == tuned
+
+
+def test_unchanged_chunk_references_base(store):
+    base = weights().tobytes()
+    base_entry, _ = store.put_chunk(base)
+    assert store.put_delta_chunk(base, base_entry) == (base_entry, 0)
+
+
+def test_unrelated_chunk_stored_in_full(store):
+    base_entry, _ = store.put_chunk(weights(0).tobytes())
+    other = weights(1).tobytes()
+    entry, _ = store.put_delta_chunk(other, base_entry, max_ratio=0.5)
+    assert entry == chunk_digest(other)
+
+
+def test_delta_chain_depth_and_rebase(store):
+    v1 = weights().tobytes() + weights(2).tobytes()
+    v2 = fine_tune(weights()).tobytes() + fine_tune(weights(2)).tobytes()
+    parents = put_file(store, 'ckpt_v1.bin', v1)
+    entries = [store.put_delta_chunk(v2[i:i + CHUNK], base)[0] for i, base in zip(range(0, len(v2), CHUNK), parents)]
+    assert store.put_manifest('ckpt_v2.bin', len(v2), entries, parent='ckpt_v1.bin') == 1
+
+    forget_decoded(store)
+    assert bytes(store.read('ckpt_v2.bin', 1000, CHUNK - 500)) == v2[CHUNK - 500:CHUNK + 500]
+
+    assert store.rebase('ckpt_v2.bin')
+    manifest = store.get_manifest('ckpt_v2.bin')
+    assert manifest['depth'] == 0 and manifest['parent'] == 'ckpt_v1.bin'
+    assert not store.rebase('ckpt_v2.bin')
+    forget_decoded(store)
+    assert bytes(store.read('ckpt_v2.bin')) == v2
+    assert bytes(store.read('ckpt_v1.bin')) == v1
+
+
+
+def stored_chunks(cold):
+    return {obj.object_name for obj in cold.minio_client.list_objects('models', prefix='cas/')}
+
+
+def age_unreachable(store, seconds):
+    """把已发现的不可达分片的计时提前，模拟宽限期已过"""
+    store.unreachable = {digest: since - seconds for digest, since in store.unreachable.items()}
+
+
+def test_gc_collects_delta_chunks_superseded_by_rebase(store, cold):
+    v1 = weights().tobytes() + weights(2).tobytes()
+    v2 = fine_tune(weights()).tobytes() + fine_tune(weights(2)).tobytes()
+    parents = put_file(store, 'ckpt_v1.bin', v1)
+    entries = [store.put_delta_chunk(v2[i:i + CHUNK], base)[0] for i, base in zip(range(0, len(v2), CHUNK), parents)]
+    store.put_manifest('ckpt_v2.bin', len(v2), entries, parent='ckpt_v1.bin')
+    assert store.collect_garbage(grace_seconds=0) == 0
+
+    assert store.rebase('ckpt_v2.bin')
+    assert store.collect_garbage(grace_seconds=0) == 2
+    assert store.chunk_name(entries[0]['delta']) not in stored_chunks(cold)
+    assert len(stored_chunks(cold)) == 4
+    forget_decoded(store)
+    assert bytes(store.read('ckpt_v2.bin')) == v2
+    assert bytes(store.read('ckpt_v1.bin')) == v1
+
+
+def test_gc_waits_out_the_grace_period_and_keeps_shared_chunks(store, cold):
+    shared, old = os.urandom(CHUNK), os.urandom(CHUNK)
+    put_file(store, 'a.ckpt', shared + old)
+    put_file(store, 'b.ckpt', shared)
+    put_file(store, 'a.ckpt', shared + os.urandom(CHUNK))
+
+    assert store.collect_garbage(grace_seconds=60) == 0
+    assert list(store.unreachable) == [chunk_digest(old)]
+    age_unreachable(store, 61)
+    assert store.collect_garbage(grace_seconds=60) == 1
+    assert stored_chunks(cold) == {store.chunk_name(chunk_digest(shared)), *(
+        store.chunk_name(digest) for digest in store.get_entries('a.ckpt'))}
+    assert store.get_stats()['bytes_collected'] > 0
+
+    # 被回收的分片再次写入时重新上传，不被已知分片集合误判为已存在
+    assert store.put_chunk(old)[1] > 0
+
+
+def test_gc_spares_chunks_referenced_by_a_write_in_progress(store, cold):
+    data = os.urandom(CHUNK)
+    digest, _ = store.put_chunk(data)
+    assert store.collect_garbage(grace_seconds=60) == 0
+    age_unreachable(store, 61)
+
+    # 清单写入前另一个写入方去重命中该分片
+    assert store.put_chunk(data) == (digest, 0)
+    assert store.collect_garbage(grace_seconds=60) == 0
+    store.put_manifest('c.ckpt', CHUNK, [digest])
+    age_unreachable(store, 61)
+    assert store.collect_garbage(grace_seconds=60) == 0
+    assert bytes(store.read('c.ckpt')) == data
+
+def test_tensor_chunk_is_byte_shuffled(cold):
+    store = ColdChunkStore(cold, chunk_size=CHUNK, tensor_filter=TensorFilter.BYTE_SHUFFLE)
+    data = weights().tobytes()
+    digest, uploaded = store.put_chunk(data, CompressionAlgorithm.ZLIB, regions=[(0, len(data), 4)])
+    metadata = cold.minio_client.stat_object('models', store.chunk_name(digest)).metadata
+    assert metadata[FILTER_METADATA_KEY] == TensorFilter.BYTE_SHUFFLE.value
+    assert uploaded < ColdChunkStore(ColdTier(), chunk_size=CHUNK).put_chunk(data, CompressionAlgorithm.ZLIB)[1]
+    assert bytes(store.read_chunk(digest)) == data
+
+
+def test_sparse_delta_is_not_filtered(cold):
+    store = ColdChunkStore(cold, chunk_size=CHUNK, cache_bytes=16 * CHUNK, tensor_filter=TensorFilter.BYTE_SHUFFLE)
+    regions = [(0, CHUNK, 4)]
+    base_entry, _ = store.put_chunk(weights().tobytes(), CompressionAlgorithm.ZLIB, regions=regions)
+    entry, _ = store.put_delta_chunk(fine_tune(weights()).tobytes(), base_entry, regions=regions)
+    metadata = cold.minio_client.stat_object('models', store.chunk_name(entry['delta'])).metadata
+    assert FILTER_METADATA_KEY not in metadata
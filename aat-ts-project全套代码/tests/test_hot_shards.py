@@ -0,0 +1,133 @@
+"""一致性哈希环与分片Redis客户端"""
+
+import os
+import threading
+
+import pytest
+
+from aat_block_store import HotBlockStore
+from aat_compression import CompressionAlgorithm, CompressionManager
+from aat_hot_shards import ConsistentHashRing, ShardError, ShardedRedisClient
+
+KEYS = [f"file:model_{i}.bin:blk:{j}" for i in range(50) for j in range(20)]
+
+
+def test_ring_is_deterministic():
+    a = ConsistentHashRing(['r1:6379', 'r2:6379', 'r3:6379'])
+    b = ConsistentHashRing(['r3:6379', 'r1:6379', 'r2:6379'])
+    assert all(a.node_for(key) == b.node_for(key) for key in KEYS)
+
+
+def test_ring_spreads_keys():
+    ring = ConsistentHashRing(['r1:6379', 'r2:6379', 'r3:6379'])
+    counts = {node: len(items) for node, items in ring.group(KEYS).items()}
+    assert set(counts) == set(ring.nodes)
+    assert min(counts.values()) > len(KEYS) / 3 * 0.5
+
+
+def test_adding_node_moves_only_its_share():
+    ring = ConsistentHashRing(['r1:6379', 'r2:6379', 'r3:6379'])
+    before = {key: ring.node_for(key) for key in KEYS}
+    assert ring.add('r4:6379')
+    assert not ring.add('r4:6379')
+    moved = [key for key in KEYS if ring.node_for(key) != before[key]]
+    assert all(ring.node_for(key) == 'r4:6379' for key in moved)
+    assert len(moved) < len(KEYS) / 4 * 1.5
+
+
+def test_empty_ring_raises():
+    with pytest.raises(LookupError):
+        ConsistentHashRing().node_for('file:a')
+
+
+
+def test_lookups_during_membership_changes_see_a_whole_ring():
+    ring = ConsistentHashRing(['r1', 'r2', 'r3'], virtual_nodes=64)
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            ring.add('r4')
+            ring.remove('r4')
+
+    thread = threading.Thread(target=churn)
+    thread.start()
+    try:
+        owners = {ring.node_for(key) for _ in range(20) for key in KEYS}
+    finally:
+        stop.set()
+        thread.join()
+    assert owners <= {'r1', 'r2', 'r3', 'r4'}
+    points, nodes = ring.table
+    assert isinstance(points, tuple) and len(points) == len(nodes) == 3 * 64
+
+def test_add_shard_rebalances_keys():
+    fakeredis = pytest.importorskip('fakeredis')
+    shards = {node: fakeredis.FakeRedis(server=fakeredis.FakeServer()) for node in ('r1', 'r2', 'r3')}
+    client = ShardedRedisClient(ConsistentHashRing(['r1', 'r2']), {'r1': shards['r1'], 'r2': shards['r2']})
+    for key in KEYS:
+        client.set(key, key.encode(), ex=600)
+
+    moved = client.add_shard('r3', shards['r3'])
+    assert moved == shards['r3'].dbsize() > 0
+    assert sum(shard.dbsize() for shard in shards.values()) == len(KEYS)
+    assert client.mget(KEYS) == [key.encode() for key in KEYS]
+    assert 0 < shards['r3'].ttl(next(iter(shards['r3'].scan_iter()))) <= 600
+
+    client.remove_shard('r1')
+    assert client.mget(KEYS) == [key.encode() for key in KEYS]
+    client.close()
+
+
+@pytest.mark.parametrize('dedup', [False, True])
+def test_block_store_over_shards(dedup):
+    fakeredis = pytest.importorskip('fakeredis')
+    nodes = ['r1', 'r2', 'r3']
+    shards = {node: fakeredis.FakeRedis(server=fakeredis.FakeServer()) for node in nodes}
+    client = ShardedRedisClient(ConsistentHashRing(nodes), shards)
+    store = HotBlockStore(client, CompressionManager(CompressionAlgorithm.ZLIB), block_size=4096, dedup=dedup)
+    data = os.urandom(40 * 4096 + 7)
+    store.put('model.bin', data, ttl=60)
+    assert all(shard.dbsize() > 0 for shard in shards.values())
+    assert bytes(store.get('model.bin')) == data
+    assert bytes(store.get_range('model.bin', 9000, 5000)) == data[5000:14000]
+    assert store.delete('model.bin')
+    assert all(shard.dbsize() == 0 for shard in shards.values())
+    client.close()
+
+
+
+def test_dead_shard_only_darkens_its_own_keys():
+    fakeredis = pytest.importorskip('fakeredis')
+    nodes = ['r1', 'r2', 'r3']
+    servers = {node: fakeredis.FakeServer() for node in nodes}
+    client = ShardedRedisClient(ConsistentHashRing(nodes), {
+        node: fakeredis.FakeRedis(server=server) for node, server in servers.items()}, failure_threshold=2)
+    store = HotBlockStore(client, CompressionManager(CompressionAlgorithm.ZLIB), block_size=4096)
+    files = {f"model_{i}.bin": os.urandom(3 * 4096) for i in range(30)}
+    for filename, data in files.items():
+        store.put(filename, data, ttl=60)
+
+    servers['r2'].connected = False
+    results = store.get_ranges([(filename, len(data), 0) for filename, data in files.items()])
+    served = [filename for filename, result in zip(files, results) if result is not None]
+    assert 0 < len(served) < len(files)
+    assert all(bytes(store.get(filename)) == files[filename] for filename in served)
+
+    # 熔断后直接跳过该分片，不再等待连接失败
+    store.get_ranges([(filename, 100, 0) for filename in files])
+    key = next(key for key in KEYS if client.ring.node_for(key) == 'r2')
+    assert client.get(key) is None
+    stats = client.get_stats()['breakers']
+    assert stats['r2']['state'] == 'open' and stats['r2']['rejected'] > 0
+    assert stats['r1']['state'] == stats['r3']['state'] == 'closed'
+    with pytest.raises(ShardError):
+        client.setex(key, 60, b'x')
+    assert client.ping()
+
+    servers['r2'].connected = True
+    client.breaker('r2').opened_at = 0
+    client.probe()
+    assert client.breaker('r2').state == 'closed'
+    assert all(result is not None for result in store.get_ranges([(f, len(d), 0) for f, d in files.items()]))
+    client.close()
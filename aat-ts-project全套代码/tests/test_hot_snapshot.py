@@ -0,0 +1,108 @@
+"""热集快照：保存评分排序的热层对象，重启后按预算回填"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from aat_admission import HotTierAdmission
+from aat_hot_snapshot import HotSetSnapshot
+
+KB = 1024
+
+
+class HotTier:
+    """只记录热层驻留对象的存储管理器替身，快照读写的文件位于临时目录"""
+
+    def __init__(self, tmp_path, capacity=4096 * KB):
+        from aat_strategy_engine import AdaptiveStrategyEngine
+
+        self.strategy_engine = AdaptiveStrategyEngine(str(tmp_path / 'absent.yaml'))
+        self.strategy_engine.config['hot_snapshot']['path'] = str(tmp_path / 'hot_set.json')
+        self.admission = HotTierAdmission(capacity, ttl=600, max_object_fraction=1.0)
+        self.migrator = SimpleNamespace(access_rates={})
+        self.hot = {}
+        self.sizes = {}
+        self.snapshot = HotSetSnapshot(self)
+
+    def write(self, filename, size, accesses):
+        """写入热层并模拟若干次读取"""
+        self.sizes[filename] = size
+        for _ in range(accesses):
+            self.strategy_engine.select_storage_tier(filename, size)
+            self.admission.record_access(filename)
+        self.admission.on_insert(filename, size)
+        self.hot[filename] = size
+
+    def hot_layer_contains(self, filename):
+        return filename in self.hot
+
+    def prefetch_to_hot_layer(self, filename):
+        size = self.sizes.setdefault(filename, 100 * KB)
+        admitted, _ = self.admission.admit(filename, size)
+        if not admitted:
+            return None
+        self.admission.on_insert(filename, size)
+        self.hot[filename] = size
+        return b'data'
+
+
+@pytest.fixture
+def first(tmp_path):
+    tier = HotTier(tmp_path)
+    tier.write('a.bin', 100 * KB, accesses=5)
+    tier.write('b.bin', 100 * KB, accesses=1)
+    tier.write('c.bin', 100 * KB, accesses=3)
+    return tier
+
+
+def test_snapshot_ordered_by_score(first):
+    assert first.snapshot.save() == 3
+    with open(first.snapshot.path, encoding='utf-8') as f:
+        objects = json.load(f)['objects']
+    assert [item['filename'] for item in objects] == ['a.bin', 'c.bin', 'b.bin']
+
+
+def test_rehydrate_restores_hot_set_and_frequency(first, tmp_path):
+    first.snapshot.save()
+    second = HotTier(tmp_path)
+    assert second.snapshot.rehydrate() == 3
+    assert set(second.hot) == {'a.bin', 'b.bin', 'c.bin'}
+    assert set(second.admission.resident) == {'a.bin', 'b.bin', 'c.bin'}
+    assert second.admission.sketch.estimate('a.bin') == 5
+    assert second.strategy_engine.tensor_info['c.bin'].access_frequency == 3
+    assert second.snapshot.rehydrated.is_set()
+
+
+def test_rehydrate_within_budget(first, tmp_path):
+    first.snapshot.save()
+    second = HotTier(tmp_path, capacity=250 * KB)
+    assert second.snapshot.rehydrate() == 2
+    assert set(second.hot) == {'a.bin', 'c.bin'}
+    assert second.snapshot.get_stats()['rehydrate_skipped'] == 1
+
+
+def test_objects_still_hot_only_restore_accounting(first, tmp_path):
+    first.snapshot.save()
+    second = HotTier(tmp_path)
+    second.hot['a.bin'] = 100 * KB
+    assert second.snapshot.rehydrate() == 2
+    assert second.snapshot.get_stats()['already_hot'] == 1
+    assert 'a.bin' in second.admission.resident
+
+
+@pytest.mark.parametrize('content', ['{not json', json.dumps({'version': 0, 'created': 0, 'objects': []})])
+def test_unusable_snapshot_is_skipped(tmp_path, content):
+    tier = HotTier(tmp_path)
+    assert tier.snapshot.rehydrate() == 0
+    with open(tier.snapshot.path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    assert tier.snapshot.load() is None
+    assert tier.snapshot.rehydrate() == 0
+
+
+def test_expired_snapshot_is_skipped(first, tmp_path):
+    first.snapshot.save()
+    second = HotTier(tmp_path)
+    second.strategy_engine.config['hot_snapshot']['max_age'] = 0
+    assert second.snapshot.load() is None
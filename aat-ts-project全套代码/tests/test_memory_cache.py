@@ -0,0 +1,48 @@
+"""L0缓存：解压后的块，字节预算 + LRU"""
+
+import os
+
+from aat_memory_cache import DecodedBlockCache
+
+BLOCK = 1024
+
+
+def test_range_hit_across_blocks():
+    cache = DecodedBlockCache(capacity_bytes=10 * BLOCK, block_size=BLOCK)
+    data = os.urandom(3 * BLOCK + 10)
+    cache.put_file('a.bin', data)
+    assert bytes(cache.get_range('a.bin', 2000, 500)) == data[500:2500]
+    assert bytes(cache.get_range('a.bin', 100, 3 * BLOCK)) == data[3 * BLOCK:]
+    assert cache.get_range('a.bin', 10, len(data)) == b''
+
+
+def test_partial_blocks_are_miss():
+    cache = DecodedBlockCache(capacity_bytes=10 * BLOCK, block_size=BLOCK)
+    data = os.urandom(4 * BLOCK)
+    cache.put_blocks('a.bin', len(data), 1, [data[BLOCK:2 * BLOCK]])
+    assert bytes(cache.get_range('a.bin', 100, BLOCK)) == data[BLOCK:BLOCK + 100]
+    assert cache.get_range('a.bin', 100, 0) is None
+    assert cache.get_range('a.bin', BLOCK, BLOCK + 512) is None
+    assert cache.get_range('b.bin', 1, 0) is None
+
+
+def test_lru_eviction_keeps_budget():
+    cache = DecodedBlockCache(capacity_bytes=3 * BLOCK, block_size=BLOCK)
+    cache.put_file('a.bin', b'a' * 2 * BLOCK)
+    cache.get_range('a.bin', 1, 0)
+    cache.put_file('b.bin', b'b' * 2 * BLOCK)
+    assert cache.used_bytes <= 3 * BLOCK
+    assert cache.get_range('a.bin', 1, 0) == b'a'
+    assert cache.get_range('a.bin', 1, BLOCK) is None
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_invalidate_and_clear():
+    cache = DecodedBlockCache(capacity_bytes=10 * BLOCK, block_size=BLOCK)
+    cache.put_file('a.bin', b'a' * 2 * BLOCK)
+    cache.put_file('b.bin', b'b' * BLOCK)
+    cache.invalidate('a.bin')
+    assert cache.get_range('a.bin', 1, 0) is None
+    assert cache.used_bytes == BLOCK
+    cache.clear()
+    assert cache.used_bytes == 0 and cache.get_range('b.bin', 1, 0) is None
@@ -0,0 +1,28 @@
+"""命名空间：对象名拆分、合法性检查、配额配置"""
+
+import pytest
+
+from aat_namespaces import (DEFAULT_NAMESPACE, display_name, load_quotas, make_namespace, namespace_of, qualify,
+                            split_name)
+
+
+def test_split_and_qualify():
+    assert split_name('bert/v2/layer0.bin') == ('bert/v2', 'layer0.bin')
+    assert split_name('bert/layer0.bin') == (DEFAULT_NAMESPACE, 'bert/layer0.bin')
+    assert namespace_of('layer0.bin') == DEFAULT_NAMESPACE
+    assert qualify('bert/v2', 'layer0.bin') == 'bert/v2/layer0.bin'
+    assert qualify(DEFAULT_NAMESPACE, 'layer0.bin') == 'layer0.bin'
+    assert display_name(DEFAULT_NAMESPACE) == 'default'
+
+
+@pytest.mark.parametrize('model, version', [('cas', 'v1'), ('bert', ''), ('-bert', 'v1'), ('bert', 'v 1')])
+def test_invalid_namespace(model, version):
+    with pytest.raises(ValueError):
+        make_namespace(model, version)
+
+
+def test_load_quotas():
+    config = {'models': [{'namespace': 'bert/v1', 'hot_quota_bytes': 100}, {'namespace': 'gpt/v2'}]}
+    assert load_quotas(config) == {'bert/v1': 100, 'gpt/v2': 0}
+    with pytest.raises(ValueError):
+        load_quotas({'models': [{'namespace': 'bert'}]})
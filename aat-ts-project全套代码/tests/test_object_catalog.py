@@ -0,0 +1,122 @@
+"""对象目录：一次构建，文件/模型层/张量/依赖共享查找；推断项有界，登记项常驻"""
+
+from aat_object_catalog import ObjectCatalog
+
+
+class StubLoader:
+    """只提供目录构建需要的接口的模型加载器"""
+
+    layers = {'embedding': 4096, 'encoder_layer_0': 2048}
+
+    def list_available_layers(self):
+        return list(self.layers)
+
+    def get_layer_info(self, layer):
+        if layer not in self.layers:
+            return None
+        return {'size': self.layers[layer]}
+
+    def get_tensor_index(self, layer):
+        return {'dense.weight': (0, 1024), 'dense.bias': (1024, 16)}
+
+
+def test_known_files_are_classified():
+    catalog = ObjectCatalog()
+    assert catalog.layer_of('layer2.bin') == 'encoder_layer_2'
+    assert catalog.layer_type_of('layer2.bin') == 'layer2'
+    assert catalog.layer_type_of('output.bin') == 'output'
+    assert catalog.layer_type_of('checkpoint_v1.ckpt') == 'checkpoint'
+    assert catalog.file_for_layer('encoder_layer_3') == 'layer3.bin'
+
+
+def test_dependencies_resolve_to_files():
+    catalog = ObjectCatalog()
+    assert catalog.next_files('embedding.bin') == ['layer0.bin']
+    assert catalog.next_files('layer3.bin') == ['pooler.bin', 'classifier.bin', 'output.bin']
+    catalog.update_dependencies({'pooler': ['lm_head']})
+    assert catalog.next_files('pooler.bin') == ['output.bin']
+
+
+def test_unknown_file_is_classified_once():
+    catalog = ObjectCatalog()
+    entry = catalog.lookup('encoder_layer_1_weights.bin')
+    assert entry.layer == 'encoder_layer_1'
+    assert catalog.lookup('encoder_layer_1_weights.bin') is entry
+    assert catalog.layer_of('random_blob.bin') == 'other'
+
+
+def test_inferred_entries_are_bounded():
+    catalog = ObjectCatalog(max_inferred=3)
+    for i in range(10):
+        assert catalog.lookup(f"request_{i}.bin").filename == f"request_{i}.bin"
+    assert len(catalog.inferred) == 3
+    assert list(catalog.inferred) == ['request_7.bin', 'request_8.bin', 'request_9.bin']
+    assert 'request_0.bin' not in catalog.entries
+
+
+def test_register_promotes_inferred_entry():
+    catalog = ObjectCatalog(max_inferred=3)
+    catalog.lookup('layer_7.bin')
+    catalog.mark_written('layer_7.bin', size=100)
+    assert 'layer_7.bin' not in catalog.inferred
+    entry = catalog.entries['layer_7.bin']
+    assert entry.written and entry.size == 100
+    for i in range(10):
+        catalog.lookup(f"other_{i}.bin")
+    assert catalog.lookup('layer_7.bin') is entry
+
+
+def test_tensor_object_inherits_file_classification():
+    catalog = ObjectCatalog()
+    catalog.register('layer_3.bin', layer='layer_3')
+    assert catalog.layer_of('layer_3.bin::w0') == 'layer_3'
+    assert catalog.layer_of('layer1.bin::dense.weight') == 'encoder_layer_1'
+
+
+def test_loader_layers_carry_size_and_tensors():
+    catalog = ObjectCatalog(StubLoader())
+    entry = catalog.lookup('embedding.bin')
+    assert entry.real_data and entry.size == 4096
+    assert set(entry.tensors) == {'dense.weight', 'dense.bias'}
+    assert catalog.real_model_mapping['layer0.bin'] == 'encoder_layer_0'
+    assert 'layer1.bin' not in catalog.real_model_mapping
+    assert catalog.model_layer('encoder_layer_0') == 'encoder_layer_0'
+    assert catalog.model_layer('layer1.bin') is None
+
+
+def test_written_file_is_served_from_storage():
+    catalog = ObjectCatalog(StubLoader())
+    catalog.mark_written('embedding.bin', size=10)
+    assert catalog.model_layer('embedding.bin') is None
+    assert 'embedding.bin' not in catalog.real_model_mapping
+    assert catalog.size_of('embedding.bin') == 10
+
+
+def test_namespaced_file_inherits_bare_classification():
+    catalog = ObjectCatalog(StubLoader())
+    assert catalog.layer_of('bert/v2/layer1.bin') == 'encoder_layer_1'
+    assert catalog.next_files('bert/v2/embedding.bin') == ['bert/v2/layer0.bin']
+    assert catalog.model_layer('bert/v2/embedding.bin') is None
+    assert catalog.namespaces() == ['bert/v2']
+
+
+def test_read_namespaces_survive_eviction_and_relinking():
+    catalog = ObjectCatalog(max_inferred=2)
+    catalog.lookup('bert/v1/layer0.bin')
+    for i in range(5):
+        catalog.lookup(f"request_{i}.bin")
+    assert 'bert/v1/layer0.bin' not in catalog.inferred
+    catalog.lookup('gpt/v3/embedding.bin')
+    catalog.update_dependencies({'pooler': []})
+    assert not catalog.inferred
+    assert catalog.namespaces() == ['bert/v1', 'gpt/v3']
+
+
+def test_rebuild_keeps_objects_registered_before_build():
+    catalog = ObjectCatalog()
+    catalog.register('run/v1/step_100.ckpt', size=5)
+    catalog.mark_written('embedding.bin', size=7)
+    catalog.build(StubLoader())
+    assert catalog.size_of('run/v1/step_100.ckpt') == 5
+    assert catalog.model_layer('embedding.bin') is None
+    assert catalog.model_layer('layer0.bin') == 'encoder_layer_0'
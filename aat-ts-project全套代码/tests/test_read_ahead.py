@@ -0,0 +1,79 @@
+"""顺序预读"""
+
+import os
+import threading
+
+import pytest
+
+from aat_read_ahead import ReadAhead
+
+BLOCK = 4096
+
+
+class Source:
+    def __init__(self, size):
+        self.data = os.urandom(size)
+        self.lock = threading.Lock()
+        self.reads = []
+
+    def fetch(self, size, offset):
+        assert 0 <= offset < len(self.data) and size > 0
+        with self.lock:
+            self.reads.append((offset, size))
+        return self.data[offset:offset + size]
+
+
+@pytest.fixture
+def read_ahead():
+    scheduler = ReadAhead(block_size=BLOCK, initial_window=2, max_window=8, trigger_reads=2, max_workers=4)
+    yield scheduler
+    scheduler.close()
+
+
+def test_sequential_reads_hit_prefetched_blocks(read_ahead):
+    source = Source(64 * BLOCK + 100)
+    stream = read_ahead.open(source.fetch, len(source.data), 'seq.bin')
+    out = b''.join(stream.read(1024, offset) for offset in range(0, len(source.data), 1024))
+    stream.close()
+
+    assert out == source.data
+    stats = read_ahead.get_stats()
+    assert stats['hits'] > stats['misses']
+    assert stats['blocks_fetched'] > 0
+
+
+def test_never_fetches_past_eof(read_ahead):
+    source = Source(3 * BLOCK + 10)
+    stream = read_ahead.open(source.fetch, len(source.data), 'short.bin')
+    for offset in range(0, len(source.data), 512):
+        stream.read(512, offset)
+    assert stream.read(512, len(source.data)) == b''
+    stream.close()
+    assert all(offset + size <= len(source.data) for offset, size in source.reads)
+
+
+def test_random_access_resets_window(read_ahead):
+    source = Source(64 * BLOCK)
+    stream = read_ahead.open(source.fetch, len(source.data), 'rand.bin')
+    stream.read(1024, 0)
+    stream.read(1024, 1024)
+    assert stream.read(100, 40 * BLOCK) == source.data[40 * BLOCK:40 * BLOCK + 100]
+    assert read_ahead.get_stats()['resets'] == 1
+    assert stream.window == read_ahead.initial_window
+    stream.close()
+
+
+def test_failed_block_falls_back_to_direct_read(read_ahead):
+    source = Source(16 * BLOCK)
+    failed = []
+
+    def flaky(size, offset):
+        if offset == BLOCK and size == BLOCK and not failed:
+            failed.append(offset)
+            raise IOError('transient')
+        return source.fetch(size, offset)
+
+    stream = read_ahead.open(flaky, len(source.data), 'flaky.bin')
+    out = b''.join(stream.read(1024, offset) for offset in range(0, 4 * BLOCK, 1024))
+    stream.close()
+    assert out == source.data[:4 * BLOCK]
@@ -0,0 +1,63 @@
+"""同键并发调用合并"""
+
+import threading
+import time
+
+import pytest
+
+from aat_single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return 'data'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('k', load))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while flight.get_stats()['coalesced'] < 7:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [('data', False)] + [('data', True)] * 7
+    assert flight.get_stats()['in_flight'] == 0
+
+
+def test_no_wait_skips_in_flight_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def load():
+        started.set()
+        release.wait(5)
+        return 1
+
+    thread = threading.Thread(target=flight.do, args=('k', load))
+    thread.start()
+    started.wait(5)
+    assert flight.do('k', load, wait=False) == (None, True)
+    release.set()
+    thread.join()
+    assert flight.get_stats()['skipped'] == 1
+
+
+def test_error_propagates_and_key_is_released():
+    flight = SingleFlight()
+
+    def fail():
+        raise IOError('backend down')
+
+    with pytest.raises(IOError):
+        flight.do('k', fail)
+    assert flight.do('k', lambda: 2) == (2, False)
+    assert flight.get_stats()['errors'] == 1
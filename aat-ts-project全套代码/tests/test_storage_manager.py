@@ -0,0 +1,289 @@
+"""存储管理器：延迟启动；冷层分片布局与单对象布局的张量索引与范围读取"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+import yaml
+
+import aat_storage_manager_v2
+import aat_tier_backends
+from aat_hot_shards import ShardError
+from aat_storage_manager_v2 import AATStorageManagerV2
+from conftest import random_tensors, write_bin
+
+
+class StubLoader:
+    """只提供一个小嵌入层的真实模型加载器；released 未置位时构造阻塞，模拟缓慢的模型扫描"""
+
+    released = None
+
+    def __init__(self):
+        if self.released is not None:
+            self.released.wait(5)
+
+    def list_available_layers(self):
+        return ['embedding']
+
+    def get_layer_info(self, layer):
+        return {'size': 1024} if layer == 'embedding' else None
+
+    def get_tensor_index(self, layer):
+        return {}
+
+    def get_model_statistics(self):
+        return {'total_layers': 1, 'total_size_mb': 1024 / 1024 / 1024, 'all_real_data': True}
+
+
+@pytest.fixture
+def make_manager(tmp_path, monkeypatch):
+    """用进程内后端创建存储管理器，相对路径都落在临时目录"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(aat_storage_manager_v2, 'RealModelDataLoader', StubLoader)
+    managers = []
+
+    def factory(**sections):
+        config = {
+            'hot_snapshot': {'enabled': False},
+            'migration': {'enabled': False},
+            'backends': {'hot': {'type': 'memory'}, 'cold': {'type': 'localfs'}},
+            **sections
+        }
+        path = tmp_path / f"config_{len(managers)}.yaml"
+        path.write_text(yaml.safe_dump(config), encoding='utf-8')
+        manager = AATStorageManagerV2(str(path))
+        managers.append(manager)
+        return manager
+
+    yield factory
+    for manager in managers:
+        manager.close()
+
+
+@pytest.fixture
+def strict_ranges(monkeypatch):
+    """与S3一致：起点越过对象末尾的范围请求返回 416 InvalidRange"""
+    get_object = aat_tier_backends.ObjectStoreClient.get_object
+
+    def strict(self, bucket_name, object_name, offset=0, length=0):
+        stat = self.backend.stat(self._key(bucket_name, object_name))
+        if stat is not None and offset and offset >= stat[0]:
+            raise aat_tier_backends.BackendKeyError('416 InvalidRange')
+        return get_object(self, bucket_name, object_name, offset, length)
+
+    monkeypatch.setattr(aat_tier_backends.ObjectStoreClient, 'get_object', strict)
+
+
+def clear_fast_tiers(manager, filename):
+    """清掉进程内缓存、温层和热层，使读取落到冷层"""
+    if manager.memory_cache is not None:
+        manager.memory_cache.clear()
+    if manager.warm_cache is not None:
+        manager.warm_cache.delete(filename)
+    manager.evict_from_hot_layer(filename)
+
+
+def test_construction_does_not_wait_for_catalog(make_manager, monkeypatch):
+    monkeypatch.setattr(StubLoader, 'released', threading.Event())
+    started = time.perf_counter()
+    manager = make_manager()
+    assert time.perf_counter() - started < 2
+    assert manager.get_performance_stats()['startup']['catalog_ready'] is False
+
+    StubLoader.released.set()
+    assert isinstance(manager.model_loader, StubLoader)
+    assert manager.get_performance_stats()['startup']['catalog_ready'] is True
+    assert manager.catalog.size_of('embedding.bin') == 1024
+
+
+def test_first_read_waits_for_backends(make_manager):
+    manager = make_manager()
+    data = os.urandom(300 * 1024)
+    assert manager.put_data('model.ckpt', data, keep_hot=True)
+    assert bytes(manager.get_data('model.ckpt', len(data), 0)) == data
+
+
+def test_synchronous_startup(make_manager):
+    manager = make_manager(startup={'background_connect': False, 'background_catalog': False})
+    startup = manager.get_performance_stats()['startup']
+    assert startup['backends_ready'] and startup['catalog_ready']
+    assert {'imports', 'config', 'modules', 'backends', 'catalog', 'background', 'init'} <= set(startup['timings_ms'])
+
+
+@pytest.mark.parametrize('keep_hot', [True, False])
+def test_tensor_index_of_chunked_cold_object(make_manager, keep_hot):
+    manager = make_manager()
+    tensors = random_tensors(count=6, shape=(256, 1024))
+    data = write_bin(tensors)
+    assert manager.put_data('model.ckpt', data, keep_hot=keep_hot)
+    clear_fast_tiers(manager, 'model.ckpt')
+
+    index = manager.get_tensor_index('model.ckpt')
+    assert list(index) == list(tensors)
+    for name, array in tensors.items():
+        assert index[name]['shape'] == array.shape
+        assert np.array_equal(manager.get_tensor('model.ckpt', name), array)
+    assert bytes(manager.get_data('model.ckpt', len(data), 0)) == data
+
+
+def test_chunked_cold_range_past_manifest_size(make_manager, strict_ranges):
+    manager = make_manager()
+    data = write_bin(random_tensors(count=2, shape=(1024, 2048)))
+    assert manager.put_data('model.ckpt', data, keep_hot=False)
+    assert bytes(manager.get_range_from_cold_layer('model.ckpt', 100, len(data) - 50)) == data[-50:]
+    assert bytes(manager.get_range_from_cold_layer('model.ckpt', 100, len(data))) == b''
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_whole_object_cold_range_reads(make_manager, strict_ranges, compress):
+    manager = make_manager(dedup={'cold_enabled': False}, compression={'auto_select': False, 'algorithm': 'zlib'})
+    text = json.dumps({f"k{i}": i for i in range(100000)}).encode()
+    with manager.open_writer('text.ckpt', keep_hot=False, compress=compress) as writer:
+        writer.write(text)
+    assert bytes(manager.get_range_from_cold_layer('text.ckpt', 100, len(text) - 200)) == text[-200:-100]
+    assert bytes(manager.get_range_from_cold_layer('text.ckpt', 100, len(text) - 30)) == text[-30:]
+    assert bytes(manager.get_range_from_cold_layer('text.ckpt', 100, len(text))) == b''
+
+
+def test_failed_catalog_reports_not_ready(make_manager, monkeypatch):
+    class BrokenLoader:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError('no model data')
+
+    monkeypatch.setattr(aat_storage_manager_v2, 'RealModelDataLoader', BrokenLoader)
+    manager = make_manager()
+    assert manager.test_connections()['real_data_available'] is False
+    assert manager.get_storage_info()['real_model_ready'] is False
+    assert len(manager._get_real_fallback_data('x.bin', 100, 0)) == 100
+
+
+
+def test_shard_failures_do_not_trip_the_hot_tier_breaker(make_manager):
+    manager = make_manager()
+
+    def dead_shard():
+        raise ShardError('r2', 'connection refused')
+
+    for _ in range(20):
+        with pytest.raises(ShardError):
+            manager._guarded_call(manager.redis_breaker, dead_shard)
+    assert manager.redis_breaker.state == 'closed'
+    assert manager._redis_available()
+
+def test_writer_keep_hot_goes_through_admission(make_manager):
+    manager = make_manager(warm_tier={'enabled': False}, admission={'capacity_bytes': 8 * 1024 * 1024})
+    small = os.urandom(1024 * 1024)
+    assert manager.put_data('small.ckpt', small, keep_hot=True)
+    assert manager.admission.resident['small.ckpt'][0] == len(small)
+    assert manager.hot_layer_contains('small.ckpt')
+
+    # 超过 max_object_fraction 的对象只写冷层
+    big = os.urandom(4 * 1024 * 1024)
+    assert manager.put_data('big.ckpt', big, keep_hot=True)
+    assert 'big.ckpt' not in manager.admission.resident
+    assert not manager.hot_layer_contains('big.ckpt')
+    assert bytes(manager.get_data('big.ckpt', len(big), 0)) == big
+
+
+
+
+def test_writer_keep_hot_evicts_colder_objects_and_is_admitted_once(make_manager):
+    manager = make_manager(warm_tier={'enabled': False}, admission={'capacity_bytes': 8 * 1024 * 1024})
+    for i in range(4):
+        assert manager.put_data(f"layer_{i}.bin", os.urandom(1792 * 1024), keep_hot=True)
+    assert manager.admission.get_stats()['admitted'] == 4
+
+    with manager.open_writer('latest.ckpt', keep_hot=True) as writer:
+        for _ in range(6):
+            writer.write(os.urandom(256 * 1024))
+    assert manager.hot_layer_contains('latest.ckpt')
+    assert not manager.hot_layer_contains('layer_0.bin')
+    stats = manager.admission.get_stats()
+    assert stats['admitted'] == 5
+    assert stats['victims'] == 1
+    assert stats['resident_bytes'] <= 8 * 1024 * 1024
+
+
+def test_overwritten_checkpoint_chunks_are_collected(make_manager):
+    manager = make_manager(dedup={'cold_gc_grace': 0}, delta={'enabled': False})
+    assert manager.put_data('model.ckpt', os.urandom(1024 * 1024), keep_hot=False)
+    data = os.urandom(1024 * 1024)
+    assert manager.put_data('model.ckpt', data, keep_hot=False)
+    assert manager.collect_cold_garbage() == 1
+    clear_fast_tiers(manager, 'model.ckpt')
+    assert bytes(manager.get_data('model.ckpt', len(data), 0)) == data
+
+def hot_block_keys(manager, filename):
+    """热层中该文件按位置寻址的数据块键"""
+    return [key for key in manager.hot_backend.objects if key.startswith(f"file:{filename}:blk:")]
+
+
+def test_writer_deletes_streamed_blocks_when_a_later_batch_is_rejected(make_manager):
+    manager = make_manager(warm_tier={'enabled': False}, dedup={'hot_enabled': False},
+                           admission={'capacity_bytes': 8 * 1024 * 1024})
+    with manager.open_writer('grow.ckpt', keep_hot=True) as writer:
+        writer.write(os.urandom(1024 * 1024))
+        assert hot_block_keys(manager, 'grow.ckpt')
+        # 累计超过 max_object_fraction，本批准入未通过
+        writer.write(os.urandom(2 * 1024 * 1024))
+    assert hot_block_keys(manager, 'grow.ckpt') == []
+    assert 'grow.ckpt' not in manager.admission.resident
+    assert not manager.hot_layer_contains('grow.ckpt')
+
+
+
+def test_writer_releases_deduplicated_blocks_when_a_later_batch_is_rejected(make_manager):
+    manager = make_manager(warm_tier={'enabled': False}, admission={'capacity_bytes': 8 * 1024 * 1024})
+    with manager.open_writer('grow.ckpt', keep_hot=True) as writer:
+        writer.write(os.urandom(1024 * 1024))
+        assert any(key.startswith('file:cas:') for key in manager.hot_backend.objects)
+        writer.write(os.urandom(2 * 1024 * 1024))
+    assert not any(key.startswith('file:cas:') for key in manager.hot_backend.objects)
+
+def test_writer_deletes_streamed_blocks_when_redis_fails_partway(make_manager, monkeypatch):
+    manager = make_manager(warm_tier={'enabled': False}, dedup={'hot_enabled': False})
+    put_blocks = manager.hot_store.put_blocks
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) > 1:
+            raise ConnectionError('redis went away')
+        return put_blocks(*args)
+
+    monkeypatch.setattr(manager.hot_store, 'put_blocks', flaky)
+    data = os.urandom(2 * 1024 * 1024)
+    with manager.open_writer('flaky.ckpt', keep_hot=True) as writer:
+        writer.write(data[:1024 * 1024])
+        assert hot_block_keys(manager, 'flaky.ckpt')
+        writer.write(data[1024 * 1024:])
+    assert hot_block_keys(manager, 'flaky.ckpt') == []
+    assert bytes(manager.get_data('flaky.ckpt', len(data), 0)) == data
+
+
+def test_fuse_read_ahead_sized_from_stored_object(tmp_path, monkeypatch):
+    pytest.importorskip('fuse')
+    from aat_fuse_v2 import AATFUSEV2
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(aat_storage_manager_v2, 'RealModelDataLoader', StubLoader)
+    (tmp_path / 'aat_strategy_config.yaml').write_text(yaml.safe_dump({
+        'hot_snapshot': {'enabled': False},
+        'migration': {'enabled': False},
+        'backends': {'hot': {'type': 'memory'}, 'cold': {'type': 'localfs'}}
+    }), encoding='utf-8')
+    fs = AATFUSEV2()
+    try:
+        data = os.urandom(3 * 1024 * 1024 + 777)
+        assert fs.storage_manager.put_data('checkpoint.ckpt', data, keep_hot=False)
+        fh = fs.open('/checkpoint.ckpt', 0)
+        step = 128 * 1024
+        out = b''.join(fs.read('/checkpoint.ckpt', step, offset, fh) for offset in range(0, len(data), step))
+        fs.release('/checkpoint.ckpt', fh)
+        assert out == data
+        assert fs.read_ahead.get_stats()['blocks_fetched'] <= 4
+    finally:
+        fs.storage_manager.close()
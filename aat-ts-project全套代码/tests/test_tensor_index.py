@@ -0,0 +1,55 @@
+"""张量索引：只解析张量头，按偏移读取单个张量"""
+
+import numpy as np
+import pytest
+
+from aat_real_model_loader import RealModelDataLoader, parse_tensor_index
+from conftest import write_bin
+
+LAYERS = ["embedding", "encoder_layer_0", "encoder_layer_1", "encoder_layer_2", "encoder_layer_3", "pooler"]
+
+
+def test_parse_tensor_index_reads_only_headers():
+    tensors = {'query': np.ones((4, 8), np.float32), 'bias': np.zeros(8, np.float32),
+               'scalar': np.array(3.0, np.float32)}
+    data = write_bin(tensors)
+    reads = []
+
+    def read_at(offset, length):
+        reads.append(length)
+        return data[offset:offset + length]
+
+    index = parse_tensor_index(read_at, len(data))
+    assert list(index) == ['query', 'bias', 'scalar']
+    assert [index[name]['shape'] for name in index] == [(4, 8), (8,), ()]
+    for name, array in tensors.items():
+        info = index[name]
+        assert info['dtype'] == 'float32' and info['nbytes'] == array.nbytes
+        assert data[info['offset']:info['offset'] + info['nbytes']] == array.tobytes()
+    assert sum(reads) < len(data) - sum(array.nbytes for array in tensors.values()) + 1
+
+
+@pytest.fixture
+def loader(tmp_path):
+    rng = np.random.default_rng(0)
+    layers = {}
+    for layer in LAYERS:
+        layers[layer] = {'dense.weight': rng.normal(size=(16, 32)).astype(np.float32),
+                         'dense.bias': rng.normal(size=32).astype(np.float32)}
+        (tmp_path / f"{layer}.bin").write_bytes(write_bin(layers[layer]))
+    return RealModelDataLoader(str(tmp_path)), layers
+
+
+def test_loader_tensor_index_and_read(loader):
+    loader, layers = loader
+    index = loader.get_tensor_index('encoder_layer_2')
+    assert list(index) == ['dense.weight', 'dense.bias']
+    assert index['dense.weight']['shape'] == (16, 32)
+    raw = loader.read_tensor('encoder_layer_2', 'dense.bias')
+    assert np.array_equal(np.frombuffer(raw, np.float32), layers['encoder_layer_2']['dense.bias'])
+
+
+def test_loader_missing_layer_or_tensor(loader):
+    loader, _ = loader
+    assert loader.get_tensor_index('lm_head') is None
+    assert loader.read_tensor('pooler', 'absent') is None
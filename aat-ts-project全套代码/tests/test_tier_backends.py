@@ -0,0 +1,117 @@
+"""进程内热层/冷层后端与Redis、MinIO客户端外观"""
+
+import io
+import time
+
+import pytest
+
+from aat_block_store import HotBlockStore
+from aat_compression import CompressionAlgorithm, CompressionManager
+from aat_tier_backends import (BackendKeyError, InMemoryBackend, KeyValueClient, LocalFSBackend, ObjectStoreClient,
+                               ShapedBackend, create_backend)
+
+
+@pytest.fixture(params=['memory', 'localfs'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return InMemoryBackend()
+    return LocalFSBackend(str(tmp_path / 'cold'))
+
+
+def test_put_get_range_delete(backend):
+    backend.put('bucket/a.bin', b'0123456789', metadata={'codec': 'none'})
+    assert backend.get('bucket/a.bin') == b'0123456789'
+    assert bytes(backend.get_range('bucket/a.bin', 3, 4)) == b'3456'
+    assert bytes(backend.get_range('bucket/a.bin', 7)) == b'789'
+    assert backend.stat('bucket/a.bin') == (10, {'codec': 'none'})
+    assert backend.delete('bucket/a.bin') == 1
+    assert backend.get('bucket/a.bin') is None and not backend.exists('bucket/a.bin')
+
+
+def test_ttl_expires(backend):
+    backend.put('k', b'v', ttl=0.05)
+    assert backend.get('k') == b'v'
+    time.sleep(0.1)
+    assert backend.get('k') is None and backend.stat('k') is None
+
+
+def test_batch_results_in_order(backend):
+    results = backend.batch([('put', 'a', b'1', None), ('get', 'a'), ('exists', 'b'), ('delete', 'a')])
+    assert results == [True, b'1', False, 1]
+    with pytest.raises(ValueError):
+        backend.batch([('rename', 'a')])
+
+
+
+def test_incrby_counts_from_zero(backend):
+    assert backend.batch([('incrby', 'n', 2), ('incrby', 'n', -3)]) == [2, -1]
+    assert backend.get('n') == b'-1'
+
+
+def test_memory_incrby_keeps_ttl():
+    backend = InMemoryBackend()
+    backend.put('n', b'1', ttl=0.05)
+    assert backend.incrby('n', 1) == 2
+    time.sleep(0.1)
+    assert backend.get('n') is None
+
+def test_memory_lru_cap():
+    backend = InMemoryBackend(max_bytes=30)
+    for key in 'abc':
+        backend.put(key, b'x' * 10)
+    backend.get('a')
+    backend.put('d', b'x' * 10)
+    assert backend.get('b') is None
+    assert all(backend.get(key) is not None for key in 'acd')
+    assert backend.used_bytes() == 30 and backend.evictions == 1
+
+
+def test_localfs_survives_restart(tmp_path):
+    LocalFSBackend(str(tmp_path)).put('bucket/obj', b'data', metadata={'k': 'v'})
+    assert LocalFSBackend(str(tmp_path)).stat('bucket/obj') == (4, {'k': 'v'})
+
+
+def test_shaped_batch_pays_latency_once():
+    backend = ShapedBackend(InMemoryBackend(), latency=0.05)
+    started = time.perf_counter()
+    backend.batch([('put', f"k{i}", b'v', None) for i in range(10)])
+    assert time.perf_counter() - started < 0.25
+
+
+def test_create_backend(tmp_path):
+    assert create_backend({'type': 'redis'}) is None
+    assert isinstance(create_backend({'type': 'localfs', 'path': str(tmp_path)}), LocalFSBackend)
+    assert isinstance(create_backend({'type': 'memory', 'latency_ms': 1}), ShapedBackend)
+    with pytest.raises(ValueError):
+        create_backend({'type': 'tape'})
+
+
+def test_key_value_client_pipeline():
+    client = KeyValueClient(InMemoryBackend())
+    pipe = client.pipeline()
+    pipe.setex('a', 60, b'1').set('b', b'2').mget(['a', 'b', 'c']).delete('a', 'c').exists('a', 'b')
+    assert pipe.execute() == [True, True, [b'1', b'2', None], 1, 1]
+    assert client.info()['used_memory'] == 1
+
+
+def test_object_store_client(tmp_path):
+    client = ObjectStoreClient(LocalFSBackend(str(tmp_path)))
+    client.make_bucket('models')
+    assert client.bucket_exists('models')
+    client.put_object('models', 'a.ckpt', io.BytesIO(b'abcdefgh'), -1, part_size=3, metadata={'codec': 'zlib'})
+    assert client.stat_object('models', 'a.ckpt').size == 8
+    assert client.get_object('models', 'a.ckpt', offset=2, length=3).read() == b'cde'
+    with pytest.raises(BackendKeyError):
+        client.get_object('models', 'missing.ckpt')
+    client.put_object('models', 'cas/ab/abcd', io.BytesIO(b'xy'), 2)
+    assert [obj.object_name for obj in client.list_objects('models', recursive=True)] == ['a.ckpt', 'cas/ab/abcd']
+    assert [obj.size for obj in client.list_objects('models', prefix='cas/')] == [2]
+
+
+def test_hot_block_store_runs_on_memory_backend():
+    store = HotBlockStore(KeyValueClient(InMemoryBackend()), CompressionManager(CompressionAlgorithm.ZLIB),
+                          block_size=4096)
+    data = bytes(range(256)) * 40
+    assert store.put('a.bin', data, 600)
+    assert bytes(store.get('a.bin')) == data
+    assert bytes(store.get_range('a.bin', 100, 5000)) == data[5000:5100]
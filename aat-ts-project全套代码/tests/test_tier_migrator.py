@@ -0,0 +1,137 @@
+"""后台迁移：评分、按字节预算规划放置、限速搬移"""
+
+import time
+
+import pytest
+
+from aat_admission import HotTierAdmission
+from aat_strategy_engine import AdaptiveStrategyEngine, StorageTier
+from aat_tier_migrator import TierMigrator, TokenBucket
+
+KB = 1024
+
+
+class TieredObjects:
+    """只记录各对象所在层级的存储管理器替身，迁移器通过它搬移对象"""
+
+    def __init__(self, tmp_path, sizes, hot_capacity=1024 * KB):
+        self.strategy_engine = AdaptiveStrategyEngine(str(tmp_path / 'absent.yaml'))
+        migration = self.strategy_engine.config['migration']
+        migration['warm_capacity_bytes'] = 0
+        migration['bandwidth_bytes_per_sec'] = 1024 * 1024 * KB
+        self.admission = HotTierAdmission(hot_capacity, ttl=60)
+        self.sizes = dict(sizes)
+        self.hot = set()
+        self.warm_cache = None
+        self.fail = set()
+        self.rejected = set()
+
+    def access(self, filename, times=1):
+        for _ in range(times):
+            self.strategy_engine.select_storage_tier(filename, self.sizes[filename])
+
+    def get_object_size(self, filename):
+        return self.sizes.get(filename)
+
+    def hot_layer_contains(self, filename):
+        return filename in self.hot
+
+    def prefetch_to_hot_layer(self, filename):
+        if filename in self.fail:
+            return None
+        # 准入未通过：数据照常返回，但没有写入热层
+        if filename not in self.rejected:
+            self.hot.add(filename)
+        return b'data'
+
+    def evict_from_hot_layer(self, filename):
+        self.hot.discard(filename)
+
+
+@pytest.fixture
+def objects(tmp_path):
+    return TieredObjects(tmp_path, {'a.bin': 400 * KB, 'b.bin': 400 * KB, 'c.bin': 400 * KB})
+
+
+def test_plan_fills_hot_budget_by_score(objects):
+    objects.access('a.bin', 5)
+    objects.access('b.bin', 1)
+    objects.access('c.bin', 3)
+    objects.admission.capacity_bytes = 800 * KB
+    plan = TierMigrator(objects).plan()
+    assert plan == {'a.bin': StorageTier.HOT, 'c.bin': StorageTier.HOT, 'b.bin': StorageTier.COLD}
+
+
+def test_hot_budget_follows_redis_maxmemory(objects):
+    for filename in objects.sizes:
+        objects.access(filename, 2)
+    objects.admission.redis_max_bytes = 500 * KB
+    plan = TierMigrator(objects).plan()
+    assert list(plan.values()).count(StorageTier.HOT) == 1
+
+
+def test_idle_objects_stay_cold(objects):
+    objects.strategy_engine.config['migration']['rate_decay'] = 1.0
+    objects.access('a.bin')
+    migrator = TierMigrator(objects)
+    assert migrator.plan()['a.bin'] == StorageTier.HOT
+    migrator.last_cycle_time = time.time() - 1000
+    assert migrator.plan()['a.bin'] == StorageTier.COLD
+
+
+def test_unknown_size_is_skipped(objects):
+    objects.sizes['gone.bin'] = 1
+    objects.access('gone.bin')
+    del objects.sizes['gone.bin']
+    assert 'gone.bin' not in TierMigrator(objects).plan()
+
+
+def test_run_cycle_promotes_and_demotes(objects):
+    config = objects.strategy_engine.config['migration']
+    config['rate_decay'] = 1.0
+    config['min_access_rate'] = 0.001
+    objects.access('b.bin')
+    objects.hot.add('b.bin')
+    migrator = TierMigrator(objects)
+    migrator.plan()
+
+    # b.bin 此后不再访问，a.bin 变热
+    objects.access('a.bin', 5)
+    migrator.last_cycle_time = time.time() - 1000
+    moves = migrator.run_cycle()
+    assert moves == [('b.bin', StorageTier.HOT, StorageTier.COLD), ('a.bin', StorageTier.COLD, StorageTier.HOT)]
+    assert objects.hot == {'a.bin'}
+    stats = migrator.get_stats()
+    assert (stats['promotions'], stats['demotions'], stats['bytes_moved']) == (1, 1, 400 * KB)
+
+
+def test_failed_move_is_counted(objects):
+    objects.access('a.bin', 5)
+    objects.fail.add('a.bin')
+    migrator = TierMigrator(objects)
+    migrator.run_cycle()
+    assert migrator.get_stats()['failed_moves'] == 1
+    assert migrator.get_stats()['promotions'] == 0
+
+
+def test_promotion_rejected_by_admission_is_not_counted(objects):
+    objects.access('a.bin', 5)
+    objects.rejected.add('a.bin')
+    migrator = TierMigrator(objects)
+    migrator.run_cycle()
+    stats = migrator.get_stats()
+    assert (stats['promotions'], stats['failed_moves'], stats['recent_moves']) == (0, 1, [])
+
+
+def test_moves_per_cycle_are_capped(objects):
+    for filename in objects.sizes:
+        objects.access(filename, 2)
+    objects.strategy_engine.config['migration']['max_moves_per_cycle'] = 2
+    assert len(TierMigrator(objects).run_cycle()) == 2
+
+
+def test_token_bucket_throttles_overdraft():
+    bucket = TokenBucket(1000)
+    assert bucket.consume(500) == 0
+    waited = bucket.consume(600)
+    assert 0.05 < waited <= 0.11
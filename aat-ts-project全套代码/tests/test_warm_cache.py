@@ -0,0 +1,67 @@
+"""温层：本地目录 + mmap 读取 + 字节预算LRU"""
+
+import os
+
+import pytest
+
+from aat_warm_cache import WarmTierCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    warm = WarmTierCache(str(tmp_path / 'warm'), capacity_bytes=10000)
+    yield warm
+    warm.close()
+
+
+def test_put_get_range(cache):
+    data = os.urandom(4000)
+    assert cache.put('layers/model.bin', data)
+    assert cache.contains('layers/model.bin')
+    assert bytes(cache.get('layers/model.bin')) == data
+    assert bytes(cache.get_range('layers/model.bin', 100, 3950)) == data[3950:]
+    assert cache.get_range('layers/model.bin', 10, 4000) == b''
+
+
+def test_miss(cache):
+    assert cache.get('absent.bin') is None
+    assert cache.get_range('absent.bin', 10, 0) is None
+    assert cache.get_stats()['misses'] == 2
+
+
+def test_lru_eviction_within_budget(cache):
+    cache.put('a.bin', b'a' * 4000)
+    cache.put('b.bin', b'b' * 4000)
+    cache.get('a.bin')
+    cache.put('c.bin', b'c' * 4000)
+    assert cache.contains('a.bin') and cache.contains('c.bin')
+    assert not cache.contains('b.bin')
+    assert cache.used_bytes == 8000
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_oversized_file_skipped(cache):
+    assert not cache.put('huge.bin', b'x' * 10001)
+    assert not cache.contains('huge.bin')
+
+
+def test_overwrite_replaces_content(cache):
+    cache.put('a.bin', b'old' * 100)
+    cache.get('a.bin')
+    cache.put('a.bin', b'new' * 50)
+    assert bytes(cache.get('a.bin')) == b'new' * 50
+    assert cache.used_bytes == 150
+
+
+def test_index_survives_restart(tmp_path):
+    directory = str(tmp_path / 'warm')
+    first = WarmTierCache(directory, capacity_bytes=10000)
+    first.put('a.bin', b'a' * 3000)
+    first.put('b.bin', b'b' * 3000)
+    first.close()
+    open(os.path.join(directory, 'partial.bin.123.tmp'), 'wb').write(b'junk')
+
+    second = WarmTierCache(directory, capacity_bytes=5000)
+    assert second.used_bytes == 3000 and len(second.index) == 1
+    assert not any(name.endswith('.tmp') for name in os.listdir(directory))
+    second.close()